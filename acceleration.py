@@ -0,0 +1,150 @@
+"""
+Speed settings
+Launch profiles choose the ComfyUI flags that trade precision or memory for
+speed (attention backend, --fast, VRAM mode) for the whole worker; accel modes
+insert a step cache node into the model chain of a single request's workflow
+"""
+
+import os
+import shlex
+
+# Named set of launch options; COMFYUI_ATTENTION, COMFYUI_FAST and COMFYUI_VRAM_MODE override its fields
+COMFYUI_PROFILE = os.environ.get("COMFYUI_PROFILE", "default")
+COMFYUI_ATTENTION = os.environ.get("COMFYUI_ATTENTION", "")
+COMFYUI_FAST = os.environ.get("COMFYUI_FAST", "")
+COMFYUI_VRAM_MODE = os.environ.get("COMFYUI_VRAM_MODE", "")
+# Appended verbatim after the profile's flags
+COMFYUI_EXTRA_ARGS = os.environ.get("COMFYUI_EXTRA_ARGS", "")
+# Accel mode for requests that don't send "accel"
+ACCEL_DEFAULT = os.environ.get("ACCEL_DEFAULT", "off")
+
+ATTENTION_FLAGS = {
+    "pytorch": "--use-pytorch-cross-attention",
+    "sage": "--use-sage-attention",
+    "flash": "--use-flash-attention",
+    "split": "--use-split-cross-attention",
+    "quad": "--use-quad-cross-attention",
+}
+VRAM_FLAGS = {
+    "gpu_only": "--gpu-only",
+    "high": "--highvram",
+    "normal": "--normalvram",
+    "low": "--lowvram",
+    "no": "--novram",
+}
+
+# Unset fields leave the choice to ComfyUI
+PROFILES = {
+    "default": {},
+    "fast": {"attention": "sage", "fast": True},
+    "highvram": {"vram": "high"},
+    "max": {"attention": "sage", "fast": True, "vram": "high"},
+    "lowvram": {"vram": "low"},
+}
+
+# Per-request step caching: node inserted after ModelSamplingSD3, with its settings
+ACCEL_MODES = {
+    "easycache": {
+        "class_type": "EasyCache",
+        "inputs": {"reuse_threshold": 0.2, "start_percent": 0.15, "end_percent": 0.95, "verbose": False},
+    },
+    "easycache_aggressive": {
+        "class_type": "EasyCache",
+        "inputs": {"reuse_threshold": 0.4, "start_percent": 0.1, "end_percent": 0.95, "verbose": False},
+    },
+    "lazycache": {
+        "class_type": "LazyCache",
+        "inputs": {"reuse_threshold": 0.2, "start_percent": 0.15, "end_percent": 0.95, "verbose": False},
+    },
+    # First-block cache from the Comfy-WaveSpeed custom node
+    "fbcache": {
+        "class_type": "ApplyFBCacheOnModel",
+        "inputs": {"object_to_patch": "diffusion_model", "residual_diff_threshold": 0.1, "start": 0.0, "end": 1.0,
+                   "max_consecutive_cache_hits": -1},
+    },
+}
+
+
+def _flag(value):
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class LaunchProfile:
+    """Resolved ComfyUI launch options"""
+
+    def __init__(self, name=COMFYUI_PROFILE, attention=COMFYUI_ATTENTION, fast=COMFYUI_FAST, vram=COMFYUI_VRAM_MODE,
+                 extra_args=COMFYUI_EXTRA_ARGS):
+        if name not in PROFILES:
+            raise ValueError(f"Unknown COMFYUI_PROFILE '{name}'; available: {', '.join(PROFILES)}")
+        self.name = name
+        options = dict(PROFILES[name])
+        if attention:
+            options["attention"] = attention
+        if fast:
+            options["fast"] = _flag(fast)
+        if vram:
+            options["vram"] = vram
+
+        if options.get("attention") and options["attention"] not in ATTENTION_FLAGS:
+            raise ValueError(f"Unknown attention backend '{options['attention']}'; "
+                             f"available: {', '.join(ATTENTION_FLAGS)}")
+        if options.get("vram") and options["vram"] not in VRAM_FLAGS:
+            raise ValueError(f"Unknown VRAM mode '{options['vram']}'; available: {', '.join(VRAM_FLAGS)}")
+        self.attention = options.get("attention")
+        self.fast = options.get("fast", False)
+        self.vram = options.get("vram")
+        self.extra_args = shlex.split(extra_args)
+
+    @property
+    def args(self):
+        """ComfyUI main.py flags for this profile"""
+        args = []
+        if self.attention:
+            args.append(ATTENTION_FLAGS[self.attention])
+        if self.fast:
+            args.append("--fast")
+        if self.vram:
+            args.append(VRAM_FLAGS[self.vram])
+        return args + self.extra_args
+
+    @property
+    def label(self):
+        """Short description of the options, "default" when ComfyUI decides everything"""
+        parts = []
+        if self.attention:
+            parts.append(f"attention={self.attention}")
+        if self.fast:
+            parts.append("fast")
+        if self.vram:
+            parts.append(f"vram={self.vram}")
+        if self.extra_args:
+            parts.append(" ".join(self.extra_args))
+        return ",".join(parts) or "default"
+
+
+def accel_mode(value):
+    """Validate a request's accel mode; None when caching is off"""
+    mode = value or ACCEL_DEFAULT
+    if mode == "off":
+        return None
+    if mode not in ACCEL_MODES:
+        raise ValueError(f"Unknown accel mode '{mode}'; expected off or one of {', '.join(ACCEL_MODES)}")
+    return mode
+
+
+def apply_accel(workflow, mode):
+    """Insert mode's cache node after every ModelSamplingSD3 node; returns how many were inserted"""
+    spec = ACCEL_MODES[mode]
+    samplers = [node_id for node_id, node in workflow.items() if node.get("class_type") == "ModelSamplingSD3"]
+    for node_id in samplers:
+        cache_id = f"{node_id}_accel"
+        for node in workflow.values():
+            for name, value in node.get("inputs", {}).items():
+                if isinstance(value, list) and value == [node_id, 0]:
+                    node["inputs"][name] = [cache_id, 0]
+        workflow[cache_id] = {
+            "inputs": {**spec["inputs"], "model": [node_id, 0]},
+            "class_type": spec["class_type"],
+            "_meta": {"title": f"Accel ({mode})"},
+        }
+    return len(samplers)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+End-to-end load benchmark for the handler against the fake ComfyUI server
+Drives handler() at a fixed concurrency and reports latency percentiles,
+throughput and the handler's own overhead per job. Needs no GPU, so it runs on CI.
+With --comfyui-url it drives a real ComfyUI instead, e.g. to compare accel modes
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import handler
+from cancellation import PromptCanceller
+from comfy_client import ComfyUIClient
+from cost_model import CostModel
+from fake_comfyui import FakeComfyUI
+from model_catalog import ModelScheduler
+from residency import ResidencyManager
+from timings import Metrics
+from workflow_validation import ObjectInfoCache
+
+SAMPLE_IMAGE = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8DwHwAFBQIAX8jx0gAAAABJRU5ErkJggg=="
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def point_handler_at(url, root, comfyui_path=None):
+    """Swap the handler's ComfyUI client and state for ones backed by the server at url"""
+    handler.comfy = ComfyUIClient(url)
+    handler.COMFYUI_PATH = comfyui_path or root
+    handler.result_cache = None
+    handler.cost_model = CostModel(path=f"{root}/cost_model.jsonl")
+    handler.gpu_name = None if comfyui_path else "fake"
+    handler.object_info = ObjectInfoCache(handler.comfy)
+    handler.canceller = PromptCanceller(handler.comfy, confirm_timeout=5)
+    handler.metrics = Metrics(jsonl_path="")
+    handler.residency = ResidencyManager(handler.comfy, sample_interval=0)
+    handler.model_scheduler = ModelScheduler()
+
+
+def make_job(index, job_input):
+    return {"id": f"bench-{index}", "input": {"image": SAMPLE_IMAGE, "seed": index, **job_input}}
+
+
+def run_job(job):
+    started = time.perf_counter()
+    result = handler.handler(job)
+    return time.perf_counter() - started, result
+
+
+def run_benchmark(jobs=20, concurrency=4, job_input=None, verbose=False, comfyui_url=None, comfyui_path=None,
+                  **fake_options):
+    """Run jobs through handler() against a fresh fake server (or comfyui_url) and return the summary"""
+    job_input = job_input or {"num_frames": 16, "steps": 4}
+    with tempfile.TemporaryDirectory() as root:
+        server = None
+        if comfyui_url is None:
+            server = FakeComfyUI(output_dir=f"{root}/output", **fake_options)
+            server.start()
+        try:
+            point_handler_at(comfyui_url or server.url, root, comfyui_path)
+            # The handler's per-job banners would drown out the summary
+            output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+            started = time.perf_counter()
+            with output, ThreadPoolExecutor(max_workers=concurrency) as pool:
+                runs = list(pool.map(run_job, (make_job(i, job_input) for i in range(jobs))))
+            wall = time.perf_counter() - started
+        finally:
+            if server is not None:
+                server.stop()
+
+    latencies = [seconds for seconds, _ in runs]
+    succeeded = [result for _, result in runs if result.get("status") == "success"]
+    # Handler overhead is whatever the job spent outside ComfyUI's queue and execution
+    overhead = [
+        (result["timings"]["total"] - result["timings"].get("queue", 0) - result["timings"].get("execute", 0)) / 1000
+        for _, result in runs if "timings" in result
+    ]
+    execute = [result["timings"]["execute"] / 1000 for result in succeeded if "execute" in result["timings"]]
+    return {
+        "jobs": jobs,
+        "job_input": job_input,
+        "concurrency": concurrency,
+        "succeeded": len(succeeded),
+        "failed": jobs - len(succeeded),
+        "wall_seconds": round(wall, 3),
+        "throughput": round(jobs / wall, 3),
+        "latency": {name: round(percentile(latencies, p), 4) for name, p in (("p50", 50), ("p95", 95), ("p99", 99))},
+        "execute_mean": round(statistics.mean(execute), 4) if execute else None,
+        "overhead": {
+            "mean": round(statistics.mean(overhead), 4) if overhead else None,
+            "p95": round(percentile(overhead, 95), 4) if overhead else None,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test handler() against a fake (or real) ComfyUI")
+    parser.add_argument("--jobs", type=int, default=20, help="Jobs to run")
+    parser.add_argument("--concurrency", type=int, default=4, help="Jobs in flight at once")
+    parser.add_argument("--render-seconds", type=float, default=0.5, help="Fake render time per prompt")
+    parser.add_argument("--node-seconds", action="append", default=[], metavar="NODE=SECONDS",
+                        help="Latency for a node ID or class_type, e.g. SamplerCustomAdvanced=2 (repeatable)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of prompts that fail at a random node")
+    parser.add_argument("--reject-rate", type=float, default=0.0, help="Fraction of /prompt calls refused")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for failure injection")
+    parser.add_argument("--num-frames", type=int, default=16, help="num_frames sent with each job")
+    parser.add_argument("--steps", type=int, default=4, help="steps sent with each job")
+    parser.add_argument("--accel", default="off", help="accel mode sent with each job")
+    parser.add_argument("--model", help="Model variant sent with each job")
+    parser.add_argument("--comfyui-url", help="Benchmark a running ComfyUI instead of the fake, e.g. http://127.0.0.1:8188")
+    parser.add_argument("--comfyui-path", default="/app/ComfyUI", help="That ComfyUI's directory (outputs are read from it)")
+    parser.add_argument("--verbose", action="store_true", help="Show the handler's own output")
+    parser.add_argument("--output", help="Also write the summary as JSON to this file")
+    args = parser.parse_args()
+
+    node_seconds = {}
+    for item in args.node_seconds:
+        node, seconds = item.split("=", 1)
+        node_seconds[node] = float(seconds)
+
+    job_input = {"num_frames": args.num_frames, "steps": args.steps, "accel": args.accel}
+    if args.model:
+        job_input["model"] = args.model
+    target = {}
+    if args.comfyui_url:
+        target = {"comfyui_url": args.comfyui_url, "comfyui_path": args.comfyui_path}
+    summary = run_benchmark(
+        jobs=args.jobs,
+        concurrency=args.concurrency,
+        job_input=job_input,
+        render_seconds=args.render_seconds,
+        node_seconds=node_seconds,
+        fail_rate=args.fail_rate,
+        reject_rate=args.reject_rate,
+        seed=args.seed,
+        verbose=args.verbose,
+        **target,
+    )
+
+    latency = summary["latency"]
+    overhead = summary["overhead"]
+    print(f"{summary['jobs']} jobs at concurrency {summary['concurrency']}: "
+          f"{summary['succeeded']} ok, {summary['failed']} failed in {summary['wall_seconds']:.2f}s")
+    print(f"Throughput: {summary['throughput']:.2f} jobs/s")
+    print(f"Latency: p50 {latency['p50'] * 1000:.0f}ms, p95 {latency['p95'] * 1000:.0f}ms, "
+          f"p99 {latency['p99'] * 1000:.0f}ms")
+    if summary["execute_mean"] is not None:
+        print(f"ComfyUI execution: mean {summary['execute_mean']:.2f}s")
+    if overhead["mean"] is not None:
+        print(f"Handler overhead: mean {overhead['mean'] * 1000:.1f}ms, p95 {overhead['p95'] * 1000:.1f}ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
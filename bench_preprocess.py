@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+CPU benchmark for input image preprocessing
+Times a plain full decode + resize against preprocess_image() for a range of
+JPEG input sizes, and reports the size of what ends up in ComfyUI's input dir
+"""
+
+import argparse
+import io
+import statistics
+import sys
+import time
+
+from PIL import Image
+
+from image_preprocess import preprocess_image
+
+# (label, width, height)
+SIZES = [
+    ("1MP", 1280, 800),
+    ("4MP", 2560, 1600),
+    ("12MP", 4032, 3024),
+    ("24MP", 6000, 4000),
+]
+
+
+def make_jpeg(width, height):
+    """A noisy photo-like JPEG, so the encoded size is realistic"""
+    noise = Image.effect_noise((width, height), 64).convert("RGB")
+    gradient = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    image = Image.blend(noise, gradient, 0.5)
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+def naive(data, width, height):
+    """Full-resolution decode and a single high-quality resize, the unoptimized path"""
+    image = Image.open(io.BytesIO(data)).convert("RGB")
+    image = image.resize((width, height), Image.Resampling.LANCZOS)
+    out = io.BytesIO()
+    image.save(out, format="PNG")
+    return out.getvalue()
+
+
+def measure(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark input image preprocessing")
+    parser.add_argument("--width", type=int, default=720, help="Target width")
+    parser.add_argument("--height", type=int, default=1280, help="Target height")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (median is reported)")
+    parser.add_argument("--format", default="png", choices=["png", "webp"], help="Preprocessed output format")
+    parser.add_argument("--output", help="Also write the results table to this file")
+    args = parser.parse_args()
+
+    lines = [
+        f"Target {args.width}x{args.height}, {args.format}, median of {args.repeat} runs",
+        f"{'input':>6} {'jpeg MB':>8} {'naive ms':>9} {'naive MB':>9} {'prep ms':>8} {'prep MB':>8} {'speedup':>8}",
+    ]
+    print(lines[0])
+    print(lines[1])
+
+    for label, width, height in SIZES:
+        data = make_jpeg(width, height)
+        naive_s, naive_out = measure(lambda: naive(data, args.width, args.height), args.repeat)
+        prep_s, (prep_out, _) = measure(
+            lambda: preprocess_image(data, args.width, args.height, fmt=args.format), args.repeat
+        )
+        line = (f"{label:>6} {len(data) / 1e6:>8.2f} {naive_s * 1000:>9.1f} {len(naive_out) / 1e6:>9.2f} "
+                f"{prep_s * 1000:>8.1f} {len(prep_out) / 1e6:>8.2f} {naive_s / prep_s:>7.1f}x")
+        print(line)
+        lines.append(line)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write("\n".join(lines) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,28 @@ echo "Starting ComfyUI setup for Hunyuan 1.5 Video"
 echo "=========================================="
 
 COMFYUI_PATH="/app/ComfyUI"
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
+
+# Cold-start phase timings, one JSON line per phase; handler.py adds its own and prints the total
+: ${COLD_START_TIMINGS:="/tmp/cold_start_timings.jsonl"}
+: > "$COLD_START_TIMINGS"
+PHASE_NAME=""
+PHASE_START=0
+
+# End the running phase (if any) and start the named one; "phase" alone just ends it
+phase() {
+    local now
+    now=$(date +%s%N)
+    if [ -n "$PHASE_NAME" ]; then
+        local ms=$(( (now - PHASE_START) / 1000000 ))
+        echo "⏱ ${PHASE_NAME}: ${ms}ms"
+        echo "{\"phase\": \"${PHASE_NAME}\", \"ms\": ${ms}}" >> "$COLD_START_TIMINGS"
+    fi
+    PHASE_NAME=${1:-}
+    PHASE_START=$now
+}
+
+phase "volume_setup"
 
 # Check if RunPod network volume is mounted
 NETWORK_VOLUME=""
@@ -35,128 +57,190 @@ if [ -n "$NETWORK_VOLUME" ]; then
     mkdir -p "${NETWORK_VOLUME}/clip_vision"
 fi
 
-# Function to download file with retries
-download_with_retry() {
-    local url=$1
-    local output=$2
-    local max_attempts=3
-    local attempt=1
-    
-    while [ $attempt -le $max_attempts ]; do
-        echo "Downloading (attempt $attempt/$max_attempts): $url"
-        if wget -c --no-check-certificate -O "$output" "$url"; then
-            echo "Download successful: $output"
-            return 0
-        else
-            echo "Download failed, retrying..."
-            attempt=$((attempt + 1))
-            sleep 5
-        fi
-    done
-    
-    echo "Failed to download after $max_attempts attempts: $url"
-    return 1
-}
+# Default URLs live in models_manifest.json; HUNYUAN_UNET_URL, HUNYUAN_VAE_URL,
+# CLIP1_URL, CLIP2_URL and CLIP_VISION_URL override them
+MODEL_MANIFEST="${SCRIPT_DIR}/models_manifest.json"
 
-# Set default URLs from Hugging Face if not provided
-: ${HUNYUAN_UNET_URL:="https://huggingface.co/Comfy-Org/HunyuanVideo_1.5_repackaged/resolve/main/split_files/diffusion_models/hunyuanvideo1.5_720p_i2v_cfg_distilled_fp8_scaled.safetensors"}
-: ${HUNYUAN_VAE_URL:="https://huggingface.co/Comfy-Org/HunyuanVideo_1.5_repackaged/resolve/main/split_files/vae/hunyuanvideo15_vae_fp16.safetensors"}
-: ${CLIP1_URL:="https://huggingface.co/Comfy-Org/HunyuanVideo_1.5_repackaged/resolve/main/split_files/text_encoders/qwen_2.5_vl_7b_fp8_scaled.safetensors"}
-: ${CLIP2_URL:="https://huggingface.co/Comfy-Org/HunyuanVideo_1.5_repackaged/resolve/main/split_files/text_encoders/byt5_small_glyphxl_fp16.safetensors"}
-: ${CLIP_VISION_URL:="https://huggingface.co/Comfy-Org/HunyuanVideo_1.5_repackaged/resolve/main/split_files/clip_vision/sigclip_vision_patch14_384.safetensors"}
+# Extra diffusion model variants to provision and serve ("480p_step_distilled", "all", ...);
+# the manifest's default variant is always included. Exported so provision_models.py sees it
+export MODEL_VARIANTS="${MODEL_VARIANTS:-}"
+echo "Model variants: ${MODEL_VARIANTS:-default only}"
 
 echo "=========================================="
 echo "Checking and downloading models"
 echo "=========================================="
+phase "models"
+
+# How models on the network volume are made visible to ComfyUI:
+#   symlink     - link each volume file into ComfyUI/models (no copy, ComfyUI mmaps from the volume)
+#   extra_paths - write extra_model_paths.yaml pointing ComfyUI at the volume
+#   copy        - copy each file into the container disk (old behaviour)
+#   auto        - symlink, unless a quick read probe shows the volume is too slow
+: ${MODEL_PROVISION_MODE:="auto"}
+: ${MIN_VOLUME_MBPS:="200"}
+: ${VOLUME_PROBE_MB:="256"}
+
+# Read the start of a file, bypassing the page cache where possible, and print MB/s
+probe_read_mbps() {
+    local file=$1
+    local size_mb=$(( $(stat -c %s "$file") / 1048576 ))
+    local mb=$VOLUME_PROBE_MB
+    if [ "$size_mb" -lt "$mb" ]; then
+        mb=$size_mb
+    fi
+    if [ "$mb" -lt 1 ]; then
+        echo 0
+        return
+    fi
+
+    local start end elapsed_ms
+    start=$(date +%s%N)
+    dd if="$file" of=/dev/null bs=1M count="$mb" iflag=direct 2>/dev/null \
+        || dd if="$file" of=/dev/null bs=1M count="$mb" 2>/dev/null
+    end=$(date +%s%N)
+    elapsed_ms=$(( (end - start) / 1000000 ))
+    if [ "$elapsed_ms" -lt 1 ]; then
+        elapsed_ms=1
+    fi
+    echo $(( mb * 1000 / elapsed_ms ))
+}
+
+# Settle "auto" into a concrete mode once, before touching any model
+resolve_provision_mode() {
+    if [ -z "$NETWORK_VOLUME" ]; then
+        PROVISION_MODE="copy"
+        return
+    fi
+
+    PROVISION_MODE="$MODEL_PROVISION_MODE"
+    if [ "$PROVISION_MODE" != "auto" ]; then
+        return
+    fi
+
+    local probe_file
+    probe_file=$(find "${NETWORK_VOLUME}/diffusion_models" "${NETWORK_VOLUME}/text_encoders" \
+        -maxdepth 1 -name "*.safetensors" -size +100M 2>/dev/null | head -n 1)
+    if [ -z "$probe_file" ]; then
+        echo "No models on the network volume yet to probe, using symlinks"
+        PROVISION_MODE="symlink"
+        return
+    fi
+
+    local mbps
+    mbps=$(probe_read_mbps "$probe_file")
+    echo "Network volume read throughput: ${mbps} MB/s (threshold ${MIN_VOLUME_MBPS} MB/s)"
+    if [ "$mbps" -ge "$MIN_VOLUME_MBPS" ]; then
+        PROVISION_MODE="symlink"
+    else
+        echo "⚠ Network volume is slow, copying models to local disk instead"
+        PROVISION_MODE="copy"
+    fi
+}
+
+# Point ComfyUI at the volume's model folders without touching ComfyUI/models
+write_extra_model_paths() {
+    cat > "${COMFYUI_PATH}/extra_model_paths.yaml" <<YAML
+runpod_volume:
+    base_path: ${NETWORK_VOLUME}
+    diffusion_models: diffusion_models
+    unet: diffusion_models
+    text_encoders: text_encoders
+    clip: text_encoders
+    vae: vae
+    clip_vision: clip_vision
+YAML
+    echo "✓ Wrote ${COMFYUI_PATH}/extra_model_paths.yaml"
+}
 
-# Function to check and download model if needed
-download_model_if_needed() {
-    local url=$1
-    local filename=$2
-    local subdir=$3
-    local name=$4
+# Make a model that lives on the network volume available to ComfyUI
+link_from_volume() {
+    local network_path=$1
+    local comfyui_path=$2
+    local name=$3
+
+    case "$PROVISION_MODE" in
+        symlink)
+            echo "✓ $name found in network volume, linking into ComfyUI..."
+            ln -sfn "$network_path" "$comfyui_path"
+            ;;
+        extra_paths)
+            echo "✓ $name found in network volume (via extra_model_paths.yaml)"
+            ;;
+        *)
+            echo "✓ $name found in network volume, copying to ComfyUI..."
+            cp "$network_path" "$comfyui_path"
+            ;;
+    esac
+}
+
+# Save a model that was baked into the image to the volume for next time
+seed_volume_from_local() {
+    local filename=$1
+    local subdir=$2
+    local name=$3
     
     local comfyui_path="${MODELS_DIR}/${subdir}/${filename}"
     local network_path="${NETWORK_VOLUME}/${subdir}/${filename}"
     
-    # Check if model exists in network volume first
-    if [ -n "$NETWORK_VOLUME" ] && [ -f "$network_path" ]; then
-        echo "✓ $name found in network volume, copying to ComfyUI..."
-        cp "$network_path" "$comfyui_path"
-        return 0
-    fi
-    
-    # Check if model already exists in ComfyUI
-    if [ -f "$comfyui_path" ]; then
+    if [ -f "$comfyui_path" ] && [ ! -L "$comfyui_path" ] && [ ! -f "$network_path" ]; then
         echo "✓ $name already exists in ComfyUI"
-        # Copy to network volume for next time
-        if [ -n "$NETWORK_VOLUME" ]; then
-            echo "  Saving to network volume for future use..."
-            cp "$comfyui_path" "$network_path"
-        fi
-        return 0
-    fi
-    
-    # Download to ComfyUI and save to network volume
-    echo "Downloading $name..."
-    mkdir -p "$(dirname "$comfyui_path")"
-    if download_with_retry "$url" "$comfyui_path"; then
-        if [ -n "$NETWORK_VOLUME" ]; then
-            echo "  Saving to network volume..."
-            cp "$comfyui_path" "$network_path"
-        fi
+        echo "  Saving to network volume for future use..."
+        cp "$comfyui_path" "${network_path}.part"
+        mv "${network_path}.part" "$network_path"
     fi
 }
 
-# Download each model if it doesn't exist
-download_model_if_needed "$HUNYUAN_UNET_URL" "hunyuanvideo1.5_720p_i2v_cfg_distilled_fp8_scaled.safetensors" "diffusion_models" "Hunyuan Video UNet model (~16GB)"
-download_model_if_needed "$HUNYUAN_VAE_URL" "hunyuanvideo15_vae_fp16.safetensors" "vae" "VAE model (~2GB)"
-download_model_if_needed "$CLIP1_URL" "qwen_2.5_vl_7b_fp8_scaled.safetensors" "text_encoders" "CLIP model 1 (Qwen, ~8GB)"
-download_model_if_needed "$CLIP2_URL" "byt5_small_glyphxl_fp16.safetensors" "text_encoders" "CLIP model 2 (ByT5, ~500MB)"
-download_model_if_needed "$CLIP_VISION_URL" "sigclip_vision_patch14_384.safetensors" "clip_vision" "CLIP Vision model (~1GB)"
+resolve_provision_mode
+echo "Model provisioning mode: ${PROVISION_MODE}"
+if [ "$PROVISION_MODE" = "extra_paths" ]; then
+    write_extra_model_paths
+fi
 
-echo ""
-echo "✅ All models ready!"
+# Models are downloaded once, onto the volume when there is one
+DOWNLOAD_ROOT="${NETWORK_VOLUME:-$MODELS_DIR}"
 
-echo "=========================================="
-echo "Setting up custom nodes"
-echo "=========================================="
+if [ -n "$NETWORK_VOLUME" ]; then
+    while IFS='|' read -r filename subdir name; do
+        seed_volume_from_local "$filename" "$subdir" "$name"
+    done < <(python "${SCRIPT_DIR}/provision_models.py" --manifest "$MODEL_MANIFEST" --list)
+fi
 
-# Update ComfyUI Manager if it exists
-if [ -d "${COMFYUI_PATH}/custom_nodes/ComfyUI-Manager" ]; then
-    echo "Updating ComfyUI Manager..."
-    cd "${COMFYUI_PATH}/custom_nodes/ComfyUI-Manager"
-    git pull || echo "Failed to update ComfyUI Manager, continuing..."
+# Parallel, resumable, checksum-verified downloads of anything missing
+if ! python "${SCRIPT_DIR}/provision_models.py" --manifest "$MODEL_MANIFEST" --dest "$DOWNLOAD_ROOT"; then
+    echo "❌ Model provisioning failed, refusing to start a broken worker"
+    exit 1
 fi
 
-# Update Hunyuan Video Wrapper
-if [ -d "${COMFYUI_PATH}/custom_nodes/ComfyUI-HunyuanVideoWrapper" ]; then
-    echo "Updating Hunyuan Video Wrapper..."
-    cd "${COMFYUI_PATH}/custom_nodes/ComfyUI-HunyuanVideoWrapper"
-    git pull || echo "Failed to update Hunyuan Video Wrapper, continuing..."
-    
-    # Install/update dependencies
-    if [ -f requirements.txt ]; then
-        pip install -r requirements.txt
-    fi
+if [ -n "$NETWORK_VOLUME" ]; then
+    while IFS='|' read -r filename subdir name; do
+        link_from_volume "${NETWORK_VOLUME}/${subdir}/${filename}" "${MODELS_DIR}/${subdir}/${filename}" "$name"
+    done < <(python "${SCRIPT_DIR}/provision_models.py" --manifest "$MODEL_MANIFEST" --list)
 fi
 
-# Install Video Helper Suite for video handling
-if [ ! -d "${COMFYUI_PATH}/custom_nodes/ComfyUI-VideoHelperSuite" ]; then
-    echo "Installing Video Helper Suite..."
-    cd "${COMFYUI_PATH}/custom_nodes"
-    git clone https://github.com/Kosinkadink/ComfyUI-VideoHelperSuite.git
-    cd ComfyUI-VideoHelperSuite
-    if [ -f requirements.txt ]; then
-        pip install -r requirements.txt
-    fi
+echo ""
+echo "✅ All models ready!"
+
+echo "=========================================="
+echo "Checking custom nodes and packages"
+echo "=========================================="
+phase "integrity_check"
+
+# Custom nodes and their requirements are installed and pinned at image build
+# time (see Dockerfile); here we only confirm nothing drifted from the lock
+LOCK_ARGS=""
+if [ "${ENV_LOCK_STRICT:-0}" = "1" ]; then
+    LOCK_ARGS="--strict"
 fi
+python "${SCRIPT_DIR}/env_lock.py" --check --comfyui "$COMFYUI_PATH" $LOCK_ARGS
 
 echo "=========================================="
 echo "Checking Python environment"
 echo "=========================================="
+phase "python_env"
 python -c "import torch; print(f'PyTorch version: {torch.__version__}'); print(f'CUDA available: {torch.cuda.is_available()}'); print(f'CUDA version: {torch.version.cuda if torch.cuda.is_available() else \"N/A\"}')"
 
+phase
+
 echo "=========================================="
 echo "Setup complete!"
 echo "=========================================="
@@ -168,8 +252,11 @@ echo "  CLIP 1: ${MODELS_DIR}/text_encoders/qwen_2.5_vl_7b_fp8_scaled.safetensor
 echo "  CLIP 2: ${MODELS_DIR}/text_encoders/byt5_small_glyphxl_fp16.safetensors"
 echo "  CLIP Vision: ${MODELS_DIR}/clip_vision/sigclip_vision_patch14_384.safetensors"
 echo ""
+echo "Models were provisioned with mode: ${PROVISION_MODE} (set MODEL_PROVISION_MODE to change)"
+echo ""
 echo "To download models automatically, set these environment variables:"
 echo "  - HUNYUAN_UNET_URL: URL to UNet model"
+echo "  - HUNYUAN_UNET_480P_URL / HUNYUAN_UNET_480P_STEP_URL: URLs to the 480p UNets (with MODEL_VARIANTS)"
 echo "  - HUNYUAN_VAE_URL: URL to VAE model"
 echo "  - CLIP1_URL: URL to Qwen CLIP model"
 echo "  - CLIP2_URL: URL to ByT5 CLIP model"
@@ -0,0 +1,105 @@
+"""
+Prompt cancellation
+Removes an abandoned prompt from ComfyUI's queue or interrupts it if it is
+already rendering, then confirms it is gone so the next job doesn't queue
+behind a zombie render. Restarts ComfyUI as a last resort
+"""
+
+import os
+import threading
+import time
+
+from comfy_client import queued_prompt_ids
+
+CANCEL_CONFIRM_TIMEOUT = float(os.environ.get("CANCEL_CONFIRM_TIMEOUT", "30"))
+
+CONFIRM_DELAY_MIN = 0.05
+CONFIRM_DELAY_MAX = 1.0
+
+
+class PromptCanceller:
+    """Track each job's prompt and cancel it on timeout, job cancellation or shutdown"""
+
+    def __init__(self, client, supervisor=None, confirm_timeout=CANCEL_CONFIRM_TIMEOUT):
+        self.client = client
+        self.supervisor = supervisor
+        self.confirm_timeout = confirm_timeout
+        self._lock = threading.Lock()
+        self._active = {}
+        self._unconfirmed = set()
+
+    def track(self, job_id, prompt_id):
+        with self._lock:
+            self._active[job_id] = prompt_id
+
+    def untrack(self, job_id):
+        with self._lock:
+            self._active.pop(job_id, None)
+
+    def cancel(self, prompt_id, reason):
+        """Dequeue or interrupt prompt_id and wait until ComfyUI has dropped it; returns True once gone"""
+        print(f"Cancelling prompt {prompt_id}: {reason}")
+        try:
+            running, pending = queued_prompt_ids(self.client.get_queue())
+            if prompt_id in pending:
+                self.client.delete_queued([prompt_id])
+            if prompt_id in running:
+                # Only interrupt our own prompt, never another job's render
+                self.client.interrupt(prompt_id)
+        except Exception as e:
+            print(f"Could not cancel prompt {prompt_id}: {str(e)}")
+
+        if self._wait_gone({prompt_id}):
+            print(f"Prompt {prompt_id} cancelled")
+            return True
+
+        if self.supervisor is not None and self.supervisor.managed:
+            print(f"Prompt {prompt_id} still in ComfyUI's queue after {self.confirm_timeout}s")
+            if self.supervisor.restart(f"prompt {prompt_id} would not cancel"):
+                return True
+
+        with self._lock:
+            self._unconfirmed.add(prompt_id)
+        return False
+
+    def cancel_job(self, job_id, reason):
+        """Cancel the prompt a job is waiting on, if any"""
+        with self._lock:
+            prompt_id = self._active.get(job_id)
+        if prompt_id is None:
+            return True
+        return self.cancel(prompt_id, reason)
+
+    def cancel_all(self, reason):
+        with self._lock:
+            prompt_ids = list(self._active.values())
+        for prompt_id in prompt_ids:
+            self.cancel(prompt_id, reason)
+
+    def confirm(self):
+        """True once no earlier cancelled prompt is still queued or running"""
+        with self._lock:
+            unconfirmed = set(self._unconfirmed)
+        if not unconfirmed:
+            return True
+        gone = self._wait_gone(unconfirmed)
+        if gone:
+            with self._lock:
+                self._unconfirmed -= unconfirmed
+        return gone
+
+    def _wait_gone(self, prompt_ids):
+        """Poll /queue with backoff until none of prompt_ids is queued or running"""
+        deadline = time.time() + self.confirm_timeout
+        delay = CONFIRM_DELAY_MIN
+        while True:
+            try:
+                running, pending = queued_prompt_ids(self.client.get_queue())
+                if not prompt_ids & (running | pending):
+                    return True
+            except Exception as e:
+                print(f"Could not read ComfyUI queue: {str(e)}")
+            if time.time() + delay > deadline:
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, CONFIRM_DELAY_MAX)
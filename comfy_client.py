@@ -0,0 +1,307 @@
+"""
+HTTP client for the local ComfyUI API
+Keeps pooled keep-alive connections, enforces timeouts, retries with backoff
+and counts requests/latency so per-job overhead is visible
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+DEFAULT_TIMEOUT = 30
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.25
+RETRY_STATUSES = (502, 503, 504)
+
+
+class ComfyUIError(Exception):
+    """Raised when ComfyUI can't be reached or keeps failing"""
+
+
+class RequestStats:
+    """Thread-safe request counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds, retried=False, failed=False):
+        with self._lock:
+            self.requests += 1
+            self.retries += int(retried)
+            self.errors += int(failed)
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def snapshot(self):
+        """Return the counters as a JSON-friendly dict"""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "errors": self.errors,
+                "total_ms": round(self.total_seconds * 1000, 1),
+                "max_ms": round(self.max_seconds * 1000, 1),
+            }
+
+
+def _backoff_delay(backoff, attempt):
+    return backoff * (2 ** attempt)
+
+
+def _never_sent(error):
+    """True if the request failed before reaching the server, so even a POST is safe to retry"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def queued_prompt_ids(queue):
+    """(running, pending) prompt ID sets from a /queue payload"""
+    running = {item[1] for item in queue.get("queue_running", [])}
+    pending = {item[1] for item in queue.get("queue_pending", [])}
+    return running, pending
+
+
+class ComfyUIClient:
+    """Synchronous ComfyUI API client on a pooled requests.Session"""
+
+    def __init__(self, base_url, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, pool_size=16):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = RequestStats()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        self.session.close()
+
+    def request(self, method, path, stats=None, timeout=None, retries=None, idempotent=True, **kwargs):
+        """Send a request, retrying transient failures; returns the Response"""
+        timeout = self.timeout if timeout is None else timeout
+        retries = self.retries if retries is None else retries
+        url = f"{self.base_url}{path}"
+
+        for attempt in range(retries + 1):
+            started = time.perf_counter()
+            retryable = False
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+                retryable = response.status_code in RETRY_STATUSES and idempotent
+                if not retryable or attempt == retries:
+                    self._record(stats, time.perf_counter() - started, attempt > 0, response.status_code >= 500)
+                    return response
+                error = ComfyUIError(f"{method} {path} returned HTTP {response.status_code}")
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+                retryable = idempotent or _never_sent(e)
+
+            self._record(stats, time.perf_counter() - started, attempt > 0, True)
+            if not retryable or attempt == retries:
+                raise ComfyUIError(f"{method} {path} failed: {error}") from error
+            time.sleep(_backoff_delay(self.backoff, attempt))
+
+    def _record(self, stats, seconds, retried, failed):
+        self.stats.record(seconds, retried, failed)
+        if stats is not None:
+            stats.record(seconds, retried, failed)
+
+    def queue_prompt(self, workflow, client_id=None, stats=None):
+        """Queue a workflow; returns ComfyUI's JSON reply (including validation errors)"""
+        payload = {"prompt": workflow}
+        if client_id:
+            payload["client_id"] = client_id
+        # Not idempotent: only retried if the request never left this process
+        response = self.request("POST", "/prompt", stats=stats, idempotent=False, json=payload)
+        return response.json()
+
+    def get_history(self, prompt_id, stats=None):
+        """Get execution history for a prompt"""
+        response = self.request("GET", f"/history/{prompt_id}", stats=stats)
+        response.raise_for_status()
+        return response.json()
+
+    def get_queue(self, stats=None):
+        """Return ComfyUI's /queue payload: queue_running and queue_pending lists"""
+        response = self.request("GET", "/queue", stats=stats)
+        response.raise_for_status()
+        return response.json()
+
+    def delete_queued(self, prompt_ids, stats=None):
+        """Remove prompts that haven't started yet from the queue"""
+        response = self.request("POST", "/queue", stats=stats, json={"delete": list(prompt_ids)})
+        response.raise_for_status()
+
+    def interrupt(self, prompt_id=None, stats=None):
+        """Interrupt the running prompt; with prompt_id, only if that prompt is the one running"""
+        payload = {"prompt_id": prompt_id} if prompt_id else {}
+        response = self.request("POST", "/interrupt", stats=stats, json=payload)
+        response.raise_for_status()
+
+    def system_stats(self, timeout=None, retries=None):
+        """Return ComfyUI's /system_stats payload"""
+        response = self.request("GET", "/system_stats", timeout=timeout, retries=retries)
+        response.raise_for_status()
+        return response.json()
+
+    def free(self, unload_models=False, free_memory=False, stats=None):
+        """Ask ComfyUI to unload models and/or release cached memory once it is idle"""
+        payload = {"unload_models": unload_models, "free_memory": free_memory}
+        response = self.request("POST", "/free", stats=stats, json=payload)
+        response.raise_for_status()
+
+    def object_info(self, stats=None):
+        """Return ComfyUI's /object_info payload: every node type's inputs and outputs"""
+        response = self.request("GET", "/object_info", stats=stats)
+        response.raise_for_status()
+        return response.json()
+
+    def is_ready(self, timeout=2):
+        """Single cheap readiness probe, no retries"""
+        try:
+            self.system_stats(timeout=timeout, retries=0)
+            return True
+        except (ComfyUIError, requests.exceptions.HTTPError):
+            return False
+
+
+class AsyncComfyUIClient:
+    """asyncio ComfyUI API client on a pooled aiohttp session"""
+
+    def __init__(self, base_url, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, pool_size=16):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.stats = RequestStats()
+        self._session = None
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def request(self, method, path, stats=None, timeout=None, retries=None, idempotent=True, **kwargs):
+        """Send a request, retrying transient failures; returns (status, parsed JSON)"""
+        session = await self._get_session()
+        timeout = aiohttp.ClientTimeout(total=self.timeout if timeout is None else timeout)
+        retries = self.retries if retries is None else retries
+        url = f"{self.base_url}{path}"
+
+        for attempt in range(retries + 1):
+            started = time.perf_counter()
+            retryable = False
+            try:
+                async with session.request(method, url, timeout=timeout, **kwargs) as response:
+                    try:
+                        body = json.loads(await response.read())
+                    except ValueError:
+                        body = None
+                    retryable = response.status in RETRY_STATUSES and idempotent
+                    if not retryable or attempt == retries:
+                        self._record(stats, time.perf_counter() - started, attempt > 0, response.status >= 500)
+                        return response.status, body
+                    error = ComfyUIError(f"{method} {path} returned HTTP {response.status}")
+            except aiohttp.ClientConnectorError as e:
+                error = e
+                retryable = True
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+                retryable = idempotent
+
+            self._record(stats, time.perf_counter() - started, attempt > 0, True)
+            if not retryable or attempt == retries:
+                raise ComfyUIError(f"{method} {path} failed: {error}") from error
+            await asyncio.sleep(_backoff_delay(self.backoff, attempt))
+
+    def _record(self, stats, seconds, retried, failed):
+        self.stats.record(seconds, retried, failed)
+        if stats is not None:
+            stats.record(seconds, retried, failed)
+
+    async def queue_prompt(self, workflow, client_id=None, stats=None):
+        """Queue a workflow; returns ComfyUI's JSON reply (including validation errors)"""
+        payload = {"prompt": workflow}
+        if client_id:
+            payload["client_id"] = client_id
+        _, body = await self.request("POST", "/prompt", stats=stats, idempotent=False, json=payload)
+        return body
+
+    async def get_history(self, prompt_id, stats=None):
+        """Get execution history for a prompt"""
+        status, body = await self.request("GET", f"/history/{prompt_id}", stats=stats)
+        if status >= 400:
+            raise ComfyUIError(f"GET /history/{prompt_id} returned HTTP {status}")
+        return body
+
+    async def get_queue(self, stats=None):
+        """Return ComfyUI's /queue payload: queue_running and queue_pending lists"""
+        status, body = await self.request("GET", "/queue", stats=stats)
+        if status >= 400:
+            raise ComfyUIError(f"GET /queue returned HTTP {status}")
+        return body
+
+    async def delete_queued(self, prompt_ids, stats=None):
+        """Remove prompts that haven't started yet from the queue"""
+        status, _ = await self.request("POST", "/queue", stats=stats, json={"delete": list(prompt_ids)})
+        if status >= 400:
+            raise ComfyUIError(f"POST /queue returned HTTP {status}")
+
+    async def interrupt(self, prompt_id=None, stats=None):
+        """Interrupt the running prompt; with prompt_id, only if that prompt is the one running"""
+        payload = {"prompt_id": prompt_id} if prompt_id else {}
+        status, _ = await self.request("POST", "/interrupt", stats=stats, json=payload)
+        if status >= 400:
+            raise ComfyUIError(f"POST /interrupt returned HTTP {status}")
+
+    async def system_stats(self, timeout=None, retries=None):
+        """Return ComfyUI's /system_stats payload"""
+        status, body = await self.request("GET", "/system_stats", timeout=timeout, retries=retries)
+        if status >= 400:
+            raise ComfyUIError(f"GET /system_stats returned HTTP {status}")
+        return body
+
+    async def free(self, unload_models=False, free_memory=False, stats=None):
+        """Ask ComfyUI to unload models and/or release cached memory once it is idle"""
+        payload = {"unload_models": unload_models, "free_memory": free_memory}
+        status, _ = await self.request("POST", "/free", stats=stats, json=payload)
+        if status >= 400:
+            raise ComfyUIError(f"POST /free returned HTTP {status}")
+
+    async def object_info(self, stats=None):
+        """Return ComfyUI's /object_info payload: every node type's inputs and outputs"""
+        status, body = await self.request("GET", "/object_info", stats=stats)
+        if status >= 400:
+            raise ComfyUIError(f"GET /object_info returned HTTP {status}")
+        return body
+
+    async def is_ready(self, timeout=2):
+        """Single cheap readiness probe, no retries"""
+        try:
+            await self.system_stats(timeout=timeout, retries=0)
+            return True
+        except ComfyUIError:
+            return False
@@ -0,0 +1,228 @@
+"""
+ComfyUI execution tracking over the /ws event stream
+Returns as soon as ComfyUI reports a prompt finished, falling back to polling /history
+"""
+
+import json
+import time
+import uuid
+
+import websocket
+
+# Polling fallback: start fast, back off towards the old fixed 2s interval
+POLL_INTERVAL_MIN = 0.1
+POLL_INTERVAL_MAX = 2.0
+POLL_BACKOFF = 1.5
+
+# How long the socket may stay silent before we double-check /history
+IDLE_CHECK_SECONDS = 5.0
+
+
+class WorkflowError(Exception):
+    """A prompt failed inside ComfyUI; node_id is the failing node when known"""
+
+    def __init__(self, message, node_id=None):
+        super().__init__(message)
+        self.node_id = node_id
+
+
+class CompletionTracker:
+    """Track completion of prompts queued with this tracker's client_id"""
+
+    def __init__(self, base_url, get_history, client_id=None, connect_timeout=5):
+        self.client_id = client_id or uuid.uuid4().hex
+        self.ws_url = base_url.replace("http", "ws", 1) + f"/ws?clientId={self.client_id}"
+        self.get_history = get_history
+        self.connect_timeout = connect_timeout
+        self.ws = None
+
+    def connect(self):
+        """Open the websocket. Must happen before queueing so no events are missed"""
+        try:
+            self.ws = websocket.create_connection(self.ws_url, timeout=self.connect_timeout)
+        except (OSError, websocket.WebSocketException) as e:
+            print(f"ComfyUI websocket unavailable, will poll history instead: {e}")
+            self.ws = None
+        return self.ws is not None
+
+    def close(self):
+        """Close the websocket if open"""
+        if self.ws is not None:
+            try:
+                self.ws.close()
+            except (OSError, websocket.WebSocketException):
+                pass
+            self.ws = None
+
+    def wait(self, prompt_id, timeout=600):
+        """Block until the prompt finishes and return its history entry"""
+        for event in self.events(prompt_id, timeout=timeout):
+            if event["type"] == "completed":
+                return event["data"]["history"]
+
+    def events(self, prompt_id, timeout=600):
+        """Yield ComfyUI events for the prompt, ending with a "completed" event carrying the history entry"""
+        deadline = time.time() + timeout
+
+        if self.ws is not None:
+            try:
+                yield from self._ws_events(prompt_id, deadline)
+            except (OSError, websocket.WebSocketException) as e:
+                print(f"ComfyUI websocket dropped, falling back to polling: {e}")
+                self.close()
+
+        entry = self._poll(prompt_id, deadline, timeout)
+        yield {"type": "completed", "data": {"prompt_id": prompt_id, "history": entry}}
+
+    def _ws_events(self, prompt_id, deadline):
+        """Yield socket messages until the prompt is done executing"""
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return
+
+            self.ws.settimeout(min(remaining, IDLE_CHECK_SECONDS))
+            try:
+                message = self.ws.recv()
+            except websocket.WebSocketTimeoutException:
+                # Quiet socket - make sure we didn't miss the final message
+                if self._check_history(prompt_id) is not None:
+                    return
+                continue
+
+            # Binary frames are latent previews, not status
+            if not isinstance(message, str):
+                continue
+
+            try:
+                event = json.loads(message)
+            except ValueError:
+                continue
+
+            event_type = event.get("type")
+            data = event.get("data") or {}
+            if data.get("prompt_id") != prompt_id:
+                continue
+
+            if event_type == "executing" and data.get("node") is None:
+                return
+            if event_type == "execution_success":
+                return
+            if event_type == "execution_error":
+                raise WorkflowError(f"Workflow failed: {data.get('exception_message', data)}", data.get("node_id"))
+            if event_type == "execution_interrupted":
+                raise WorkflowError("Workflow failed: execution was interrupted", data.get("node_id"))
+
+            yield {"type": event_type, "data": data}
+
+    def _check_history(self, prompt_id):
+        """Return the finished history entry, or None if still running"""
+        history = self.get_history(prompt_id)
+
+        if prompt_id in history:
+            status = history[prompt_id].get("status", {})
+
+            if status.get("completed", False):
+                return history[prompt_id]
+
+            if "error" in status:
+                raise WorkflowError(f"Workflow failed: {status['error']}")
+
+            if status.get("status_str") == "error":
+                message, node_id = _history_error(status)
+                raise WorkflowError(f"Workflow failed: {message}", node_id)
+
+        return None
+
+    def _poll(self, prompt_id, deadline, timeout):
+        """Poll history with a growing interval until the prompt finishes"""
+        interval = POLL_INTERVAL_MIN
+
+        while True:
+            entry = self._check_history(prompt_id)
+            if entry is not None:
+                return entry
+
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            time.sleep(min(interval, remaining))
+            interval = min(interval * POLL_BACKOFF, POLL_INTERVAL_MAX)
+
+        raise TimeoutError(f"Workflow execution timed out after {timeout}s")
+
+
+def _history_error(status):
+    """Pull the exception message and failing node out of a failed history status"""
+    for message_type, data in status.get("messages", []):
+        if message_type == "execution_error":
+            return data.get("exception_message", data), data.get("node_id")
+    return "unknown error", None
+
+
+class ProgressReporter:
+    """Turn raw ComfyUI events into progress updates for clients"""
+
+    def __init__(self, workflow, prompt_id):
+        self.workflow = workflow or {}
+        self.prompt_id = prompt_id
+        self.started = time.time()
+        self.done_nodes = set()
+        self.node = None
+        self.node_started = None
+        self.node_seconds = {}
+
+    def update(self, event):
+        """Return a progress dict for the event, or None if it isn't worth reporting"""
+        event_type = event["type"]
+        data = event["data"]
+
+        if event_type == "execution_cached":
+            self.done_nodes.update(data.get("nodes", []))
+            return None
+
+        if event_type == "executing":
+            self._finish_node()
+            self.node = data.get("node")
+            self.node_started = time.time()
+            return self._progress()
+
+        if event_type == "progress":
+            return self._progress(step=data.get("value"), total_steps=data.get("max"))
+
+        return None
+
+    def finish(self):
+        """Close out the last running node; returns {node_id: seconds}"""
+        self._finish_node()
+        self.node = None
+        return self.node_seconds
+
+    def _finish_node(self):
+        if self.node is not None:
+            self.done_nodes.add(self.node)
+            self.node_seconds[self.node] = round(time.time() - self.node_started, 3)
+
+    def _progress(self, step=None, total_steps=None):
+        now = time.time()
+        node = self.workflow.get(self.node, {})
+        progress = {
+            "type": "progress",
+            "prompt_id": self.prompt_id,
+            "node": self.node,
+            "class_type": node.get("class_type"),
+            "node_title": node.get("_meta", {}).get("title"),
+            "nodes_done": len(self.done_nodes),
+            "nodes_total": len(self.workflow),
+            "step": step,
+            "total_steps": total_steps,
+            "elapsed": round(now - self.started, 2),
+            "eta": None,
+        }
+
+        # Only sampler steps give a reliable rate to extrapolate from
+        if step and total_steps and self.node_started:
+            per_step = (now - self.node_started) / step
+            progress["eta"] = round(per_step * (total_steps - step), 2)
+
+        return progress
@@ -0,0 +1,163 @@
+"""
+ComfyUI process supervisor
+Drains the child's output into a ring buffer so it can never block on a full
+pipe, detects readiness from the log or fast backoff probes, and restarts
+ComfyUI if it dies between jobs
+"""
+
+import collections
+import subprocess
+import threading
+import time
+
+# ComfyUI prints this once its HTTP server is listening
+READY_LINE = "To see the GUI go to"
+
+PROBE_DELAY_MIN = 0.05
+PROBE_DELAY_MAX = 1.0
+
+
+class ComfyUISupervisor:
+    """Start, watch and restart the ComfyUI server process"""
+
+    def __init__(self, comfyui_path, port, client, command=None, log_lines=1000,
+                 ready_timeout=120, max_restarts=5, restart_window=600, echo=False, extra_args=()):
+        self.comfyui_path = comfyui_path
+        self.port = port
+        self.client = client
+        self.command = (command or ["python", "main.py", "--listen", "0.0.0.0", "--port", str(port)]) + list(extra_args)
+        self.ready_timeout = ready_timeout
+        self.max_restarts = max_restarts
+        self.restart_window = restart_window
+        self.echo = echo
+
+        self.process = None
+        self.restarts = []
+        self._log = collections.deque(maxlen=log_lines)
+        self._log_lock = threading.Lock()
+        self._ready_line = threading.Event()
+        self._lock = threading.RLock()
+        self._stopping = False
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process else None
+
+    @property
+    def managed(self):
+        """True once start() has been called"""
+        return self.process is not None
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def log_tail(self, lines=50):
+        """Last lines of ComfyUI output, for error responses"""
+        with self._log_lock:
+            return list(self._log)[-lines:]
+
+    def start(self):
+        """Launch ComfyUI and block until it is ready; returns True on success"""
+        with self._lock:
+            self._stopping = False
+            self._ready_line.clear()
+            print(f"Starting ComfyUI server: {' '.join(self.command)}")
+            self.process = subprocess.Popen(
+                self.command,
+                cwd=self.comfyui_path,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                bufsize=1,
+                text=True,
+                errors="replace",
+            )
+            process = self.process
+            threading.Thread(target=self._drain, args=(process,), daemon=True).start()
+            threading.Thread(target=self._watch, args=(process,), daemon=True).start()
+            return self._wait_ready(process)
+
+    def stop(self, timeout=10):
+        """Stop ComfyUI without triggering a restart"""
+        with self._lock:
+            self._stopping = True
+            if self.is_alive():
+                print("Stopping ComfyUI server...")
+                self.process.terminate()
+                try:
+                    self.process.wait(timeout=timeout)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+                    self.process.wait()
+
+    def restart(self, reason):
+        """Kill and relaunch ComfyUI, e.g. when it won't let go of a cancelled prompt"""
+        with self._lock:
+            print(f"Restarting ComfyUI: {reason}")
+            self.stop()
+            return self.start()
+
+    def ensure_running(self):
+        """Make sure ComfyUI is up before a job, restarting it if it crashed"""
+        with self._lock:
+            if self.is_alive():
+                return True
+            if self._stopping:
+                return False
+            return self._restart("not running at job start")
+
+    def _wait_ready(self, process):
+        """Wait for the ready log line or a successful probe, backing off between probes"""
+        deadline = time.time() + self.ready_timeout
+        delay = PROBE_DELAY_MIN
+
+        while time.time() < deadline:
+            if process.poll() is not None:
+                print(f"ComfyUI exited during startup with code {process.returncode}")
+                for line in self.log_tail(20):
+                    print(f"  {line}")
+                return False
+
+            # The log line wakes us immediately; otherwise probe on a growing interval
+            line_seen = self._ready_line.wait(timeout=delay)
+            if self.client.is_ready(timeout=2):
+                print("ComfyUI server is ready!")
+                return True
+            if line_seen:
+                # The event stays set, so wait() no longer blocks while the port is still refusing
+                time.sleep(delay)
+            delay = min(delay * 2, PROBE_DELAY_MAX)
+
+        print(f"ComfyUI not ready after {self.ready_timeout}s")
+        return False
+
+    def _drain(self, process):
+        """Read the child's output until EOF so the pipe never fills"""
+        for line in process.stdout:
+            line = line.rstrip()
+            with self._log_lock:
+                self._log.append(line)
+            if READY_LINE in line:
+                self._ready_line.set()
+            if self.echo:
+                print(f"[ComfyUI] {line}")
+
+    def _watch(self, process):
+        """Restart ComfyUI as soon as it dies unexpectedly"""
+        process.wait()
+        with self._lock:
+            if self._stopping or process is not self.process:
+                return
+            self._restart(f"exited with code {process.returncode}")
+
+    def _restart(self, reason):
+        now = time.time()
+        self.restarts = [t for t in self.restarts if now - t < self.restart_window]
+        if len(self.restarts) >= self.max_restarts:
+            print(f"ComfyUI {reason}; restart limit reached ({self.max_restarts} in {self.restart_window}s)")
+            return False
+
+        print(f"ComfyUI {reason}, restarting. Last output:")
+        for line in self.log_tail(20):
+            print(f"  {line}")
+        self.restarts.append(now)
+        return self.start()
@@ -0,0 +1,121 @@
+"""
+ComfyUI custom node: text conditioning cache
+Copied into ComfyUI/custom_nodes at build time. CachedCLIPTextEncode behaves
+like CLIPTextEncode but stores each encoding on disk, keyed by the text and
+the text encoder files. Its clip input is lazy, so on a hit the text encoders
+are never even loaded
+"""
+
+import collections
+import hashlib
+import os
+import threading
+import uuid
+
+import torch
+
+_default_dir = "/runpod-volume/cache/conditioning" if os.path.isdir("/runpod-volume") else "/app/cache/conditioning"
+CONDITIONING_CACHE_DIR = os.environ.get("CONDITIONING_CACHE_DIR", _default_dir)
+# Recently used encodings kept in RAM as well, to skip the disk read
+CONDITIONING_CACHE_MEMORY = int(os.environ.get("CONDITIONING_CACHE_MEMORY", "32"))
+
+
+class ConditioningStore:
+    """Conditioning lists saved with torch.save, plus a small in-memory LRU"""
+
+    def __init__(self, root, memory_entries=CONDITIONING_CACHE_MEMORY):
+        self.root = root
+        self.memory_entries = memory_entries
+        self._memory = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text, encoder):
+        return hashlib.sha256(f"{encoder}\0{text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.pt")
+
+    def _remember(self, key, conditioning):
+        with self._lock:
+            self._memory[key] = conditioning
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            conditioning = torch.load(path, map_location="cpu", weights_only=True)
+        except Exception as e:
+            print(f"[ConditioningCache] Ignoring unreadable {path}: {e}")
+            return None
+        self._remember(key, conditioning)
+        return conditioning
+
+    def put(self, key, conditioning):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        cpu = [[tensor.cpu(), {k: v.cpu() if torch.is_tensor(v) else v for k, v in extra.items()}]
+               for tensor, extra in conditioning]
+        # Write then rename so a concurrent reader never loads a partial file
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        torch.save(cpu, tmp_path)
+        os.replace(tmp_path, path)
+        self._remember(key, cpu)
+
+
+store = ConditioningStore(CONDITIONING_CACHE_DIR)
+
+
+class CachedCLIPTextEncode:
+    """CLIPTextEncode that reuses conditioning saved by earlier jobs"""
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "text": ("STRING", {"multiline": True, "dynamicPrompts": True}),
+                "clip": ("CLIP", {"lazy": True}),
+                "encoder": ("STRING", {"default": ""}),
+            }
+        }
+
+    RETURN_TYPES = ("CONDITIONING",)
+    FUNCTION = "encode"
+    CATEGORY = "conditioning"
+
+    def check_lazy_status(self, text, encoder, clip=None):
+        """Only ask ComfyUI to load the text encoder when the cache misses"""
+        if clip is None and store.get(store.key(text, encoder)) is None:
+            return ["clip"]
+        return []
+
+    def encode(self, text, encoder, clip=None):
+        key = store.key(text, encoder)
+        conditioning = store.get(key)
+        if conditioning is not None:
+            print(f"[ConditioningCache] hit {key[:12]}")
+            return (conditioning,)
+
+        if clip is None:
+            raise RuntimeError("Conditioning cache entry disappeared and no CLIP model was loaded")
+        print(f"[ConditioningCache] miss {key[:12]}, encoding")
+        tokens = clip.tokenize(text)
+        conditioning = clip.encode_from_tokens_scheduled(tokens)
+        try:
+            store.put(key, conditioning)
+        except OSError as e:
+            print(f"[ConditioningCache] Could not save {key[:12]}: {e}")
+        return (conditioning,)
+
+
+NODE_CLASS_MAPPINGS = {"CachedCLIPTextEncode": CachedCLIPTextEncode}
+NODE_DISPLAY_NAME_MAPPINGS = {"CachedCLIPTextEncode": "CLIP Text Encode (Cached)"}
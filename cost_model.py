@@ -0,0 +1,141 @@
+"""
+Render cost model
+Predicts execution time as a + b * (frames x width x height x steps), fitted
+per GPU class from recorded runs. Drives per-job timeouts and admission control
+"""
+
+import json
+import os
+import threading
+import time
+
+_default_path = "/runpod-volume/cache/cost_model.jsonl" if os.path.isdir("/runpod-volume") else "/tmp/cost_model.jsonl"
+COST_MODEL_PATH = os.environ.get("COST_MODEL_PATH", _default_path)
+# Runs needed for a GPU class before its fit replaces the prior
+COST_MODEL_MIN_SAMPLES = int(os.environ.get("COST_MODEL_MIN_SAMPLES", "5"))
+# Only the most recent runs per GPU class are fitted, so driver/model changes age out
+COST_MODEL_WINDOW = int(os.environ.get("COST_MODEL_WINDOW", "200"))
+# Prior used until enough runs are recorded: generous, roughly a 24GB-class GPU
+COST_PRIOR_FIXED = float(os.environ.get("COST_PRIOR_FIXED", "30"))
+COST_PRIOR_PER_UNIT = float(os.environ.get("COST_PRIOR_PER_UNIT", "1e-6"))
+# timeout = estimate * factor + padding, clamped
+TIMEOUT_FACTOR = float(os.environ.get("TIMEOUT_FACTOR", "2.0"))
+TIMEOUT_PADDING = float(os.environ.get("TIMEOUT_PADDING", "60"))
+TIMEOUT_MIN = float(os.environ.get("TIMEOUT_MIN", "120"))
+TIMEOUT_MAX = float(os.environ.get("TIMEOUT_MAX", "3600"))
+# Reject jobs estimated to take longer than this (seconds); 0 disables
+JOB_BUDGET_SECONDS = float(os.environ.get("JOB_BUDGET_SECONDS", "0"))
+
+
+def work_units(frames, width, height, steps):
+    """Pixels sampled over the whole job: the quantity render time scales with"""
+    return frames * width * height * steps
+
+
+def gpu_class(system_stats):
+    """Short GPU name from /system_stats, e.g. "NVIDIA A100-SXM4-80GB" """
+    devices = (system_stats or {}).get("devices") or []
+    if not devices:
+        return "unknown"
+    name = devices[0].get("name", "unknown")
+    # ComfyUI reports "cuda:0 NVIDIA A100-SXM4-80GB : cudaMallocAsync"
+    name = name.split(" : ")[0]
+    if name.startswith("cuda:"):
+        name = name.split(" ", 1)[-1]
+    return name.strip() or "unknown"
+
+
+def fit(samples):
+    """Least-squares (a, b) for seconds = a + b * units; None if the data can't support a fit"""
+    n = len(samples)
+    if n < 2:
+        return None
+    mean_x = sum(x for x, _ in samples) / n
+    mean_y = sum(y for _, y in samples) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in samples)
+    if var_x == 0:
+        # Every run was the same size: all we know is its average time
+        return 0.0, mean_y / mean_x if mean_x else 0.0
+    b = sum((x - mean_x) * (y - mean_y) for x, y in samples) / var_x
+    a = mean_y - b * mean_x
+    if b <= 0:
+        return None
+    return max(a, 0.0), b
+
+
+class CostModel:
+    """Per-GPU-class linear cost model backed by a JSONL log of runs"""
+
+    def __init__(self, path=COST_MODEL_PATH, min_samples=COST_MODEL_MIN_SAMPLES, window=COST_MODEL_WINDOW,
+                 prior=(COST_PRIOR_FIXED, COST_PRIOR_PER_UNIT)):
+        self.path = path
+        self.min_samples = min_samples
+        self.window = window
+        self.prior = prior
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._coefficients = {}
+        # Estimated seconds of work admitted but not finished on this worker
+        self.pending = 0.0
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    run = json.loads(line)
+                    self._samples.setdefault(run["gpu"], []).append((run["units"], run["seconds"]))
+                except (ValueError, KeyError):
+                    continue
+        for gpu in self._samples:
+            self._refit(gpu)
+
+    def _refit(self, gpu):
+        samples = self._samples[gpu][-self.window:]
+        self._samples[gpu] = samples
+        coefficients = fit(samples) if len(samples) >= self.min_samples else None
+        if coefficients:
+            self._coefficients[gpu] = coefficients
+        else:
+            self._coefficients.pop(gpu, None)
+
+    def coefficients(self, gpu):
+        """(a, b, source) where source is "fitted" or "prior" """
+        with self._lock:
+            if gpu in self._coefficients:
+                return (*self._coefficients[gpu], "fitted")
+        return (*self.prior, "prior")
+
+    def estimate(self, gpu, units):
+        a, b, _ = self.coefficients(gpu)
+        return a + b * units
+
+    def timeout(self, estimate):
+        return min(max(estimate * TIMEOUT_FACTOR + TIMEOUT_PADDING, TIMEOUT_MIN), TIMEOUT_MAX)
+
+    def begin(self, estimate):
+        """Admit a job; returns the estimated seconds of work queued ahead of it"""
+        with self._lock:
+            ahead = self.pending
+            self.pending += estimate
+        return ahead
+
+    def end(self, estimate):
+        with self._lock:
+            self.pending = max(self.pending - estimate, 0.0)
+
+    def record(self, gpu, units, seconds):
+        """Add a finished run and refit that GPU class"""
+        with self._lock:
+            self._samples.setdefault(gpu, []).append((units, seconds))
+            self._refit(gpu)
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"gpu": gpu, "units": units, "seconds": round(seconds, 3), "time": time.time()}) + "\n")
+        except OSError as e:
+            print(f"Warning: could not record run in cost model: {str(e)}")
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Environment lock manifest
+sources.lock.json, committed with the repo, pins the commit of ComfyUI and
+every custom node; the image build clones exactly those. At build time the
+lock also records installed package versions. At container start, checks
+nothing has drifted from either, without running git or pip
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from importlib import metadata
+
+DEFAULT_LOCK = os.environ.get("ENV_LOCK_PATH", "/app/env.lock.json")
+DEFAULT_COMFYUI = os.environ.get("COMFYUI_PATH", "/app/ComfyUI")
+DEFAULT_SOURCES = os.environ.get(
+    "ENV_SOURCES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sources.lock.json")
+)
+
+
+def git_head(repo):
+    """Return the checked-out commit of a repo by reading .git directly, or None"""
+    git_dir = os.path.join(repo, ".git")
+    head_path = os.path.join(git_dir, "HEAD")
+    if not os.path.isfile(head_path):
+        return None
+
+    with open(head_path) as f:
+        head = f.read().strip()
+    if not head.startswith("ref: "):
+        return head
+
+    ref = head[5:]
+    ref_path = os.path.join(git_dir, ref)
+    if os.path.isfile(ref_path):
+        with open(ref_path) as f:
+            return f.read().strip()
+
+    packed = os.path.join(git_dir, "packed-refs")
+    if os.path.isfile(packed):
+        with open(packed) as f:
+            for line in f:
+                parts = line.strip().split(" ")
+                if len(parts) == 2 and parts[1] == ref:
+                    return parts[0]
+    return None
+
+
+def find_repos(comfyui_path):
+    """Map repo name -> path for ComfyUI and each git-cloned custom node"""
+    repos = {"ComfyUI": comfyui_path}
+    nodes_dir = os.path.join(comfyui_path, "custom_nodes")
+    if os.path.isdir(nodes_dir):
+        for name in sorted(os.listdir(nodes_dir)):
+            path = os.path.join(nodes_dir, name)
+            if os.path.isdir(os.path.join(path, ".git")):
+                repos[name] = path
+    return repos
+
+
+def installed_packages():
+    packages = {}
+    for dist in metadata.distributions():
+        name = dist.metadata["Name"]
+        if name:
+            packages[name.lower()] = dist.version
+    return packages
+
+
+def load_sources(path=DEFAULT_SOURCES):
+    """Pinned repos: {name: {"url", "ref", "commit"}}; ComfyUI itself is named ComfyUI"""
+    with open(path) as f:
+        return json.load(f)
+
+
+def source_path(name, comfyui_path):
+    return comfyui_path if name == "ComfyUI" else os.path.join(comfyui_path, "custom_nodes", name)
+
+
+def unpinned(sources):
+    return [name for name, source in sources.items() if not source.get("commit")]
+
+
+def pin_sources(path=DEFAULT_SOURCES):
+    """Resolve each source's ref to its current commit and write the pins back"""
+    sources = load_sources(path)
+    for name, source in sources.items():
+        result = subprocess.run(["git", "ls-remote", source["url"], source.get("ref", "HEAD")],
+                                check=True, capture_output=True, text=True)
+        lines = result.stdout.split()
+        if not lines:
+            raise RuntimeError(f"{source['url']} has no ref {source.get('ref')}")
+        source["commit"] = lines[0]
+        print(f"  {name}: {source['commit']}")
+    with open(path, "w") as f:
+        json.dump(sources, f, indent=2)
+        f.write("\n")
+    return sources
+
+
+def clone_sources(sources, comfyui_path, require_pinned=False):
+    """Clone every source at its pinned commit, or at its ref while it has none"""
+    missing = unpinned(sources)
+    if missing and require_pinned:
+        raise RuntimeError(f"Unpinned sources: {', '.join(missing)}; run `python env_lock.py --pin` and commit "
+                           f"sources.lock.json")
+    # ComfyUI first: the custom nodes are cloned inside it
+    for name in sorted(sources, key=lambda name: name != "ComfyUI"):
+        source = sources[name]
+        dest = source_path(name, comfyui_path)
+        revision = source.get("commit") or source.get("ref", "HEAD")
+        if not source.get("commit"):
+            print(f"⚠ {name} is not pinned, building from {revision}")
+        subprocess.run(["git", "clone", "-q", source["url"], dest], check=True)
+        subprocess.run(["git", "-C", dest, "checkout", "-q", revision], check=True)
+
+
+def check_sources(sources, comfyui_path):
+    """Differences between the checked-out repos and their pinned commits"""
+    problems = []
+    for name, source in sources.items():
+        # Unpinned sources were built from their ref; env.lock.json still records that commit
+        if not source.get("commit"):
+            continue
+        actual = git_head(source_path(name, comfyui_path))
+        if actual != source["commit"]:
+            problems.append(f"repo {name} is at {actual}, sources lock pins {source['commit']}")
+    return problems
+
+
+def write_lock(lock_path, comfyui_path):
+    """Record repo commits and package versions"""
+    lock = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "repos": {name: git_head(path) for name, path in find_repos(comfyui_path).items()},
+        "packages": installed_packages(),
+    }
+    with open(lock_path, "w") as f:
+        json.dump(lock, f, indent=2, sort_keys=True)
+        f.write("\n")
+    return lock
+
+
+def check_lock(lock_path, comfyui_path):
+    """Return a list of human-readable differences from the lock manifest"""
+    with open(lock_path) as f:
+        lock = json.load(f)
+
+    problems = []
+    repos = find_repos(comfyui_path)
+    for name, commit in lock.get("repos", {}).items():
+        if name not in repos:
+            problems.append(f"repo {name} is missing")
+            continue
+        actual = git_head(repos[name])
+        if actual != commit:
+            problems.append(f"repo {name} is at {actual}, lock has {commit}")
+    for name in repos:
+        if name not in lock.get("repos", {}):
+            problems.append(f"repo {name} is not in the lock")
+
+    packages = installed_packages()
+    for name, version in lock.get("packages", {}).items():
+        actual = packages.get(name)
+        if actual is None:
+            problems.append(f"package {name} is missing")
+        elif actual != version:
+            problems.append(f"package {name} is {actual}, lock has {version}")
+
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write or check the environment lock manifest")
+    parser.add_argument("--lock", default=DEFAULT_LOCK, help="Path to the lock manifest")
+    parser.add_argument("--comfyui", default=DEFAULT_COMFYUI, help="ComfyUI install to inspect")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--write", action="store_true", help="Record the current environment (image build time)")
+    mode.add_argument("--check", action="store_true", help="Compare against the lock (container start)")
+    mode.add_argument("--clone", action="store_true", help="Clone the pinned sources into --comfyui (image build)")
+    mode.add_argument("--pin", action="store_true", help="Pin every source to its ref's current commit")
+    parser.add_argument("--sources", default=DEFAULT_SOURCES, help="Path to the committed sources lock")
+    parser.add_argument("--require-pinned", action="store_true", help="With --clone, fail on sources without a commit")
+    parser.add_argument("--strict", action="store_true", help="Exit non-zero if anything drifted")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+
+    if args.pin:
+        pin_sources(args.sources)
+        print(f"Pinned {args.sources}; commit it to use these revisions")
+        return 0
+
+    if args.clone:
+        sources = load_sources(args.sources)
+        try:
+            clone_sources(sources, args.comfyui, require_pinned=args.require_pinned)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            return 1
+        problems = check_sources(sources, args.comfyui)
+        for problem in problems:
+            print(f"❌ {problem}")
+        return 1 if problems else 0
+
+    if args.write:
+        lock = write_lock(args.lock, args.comfyui)
+        for name, commit in lock["repos"].items():
+            print(f"  {name}: {commit}")
+        print(f"Wrote {args.lock} ({len(lock['packages'])} packages)")
+        return 0
+
+    if not os.path.exists(args.lock):
+        print(f"⚠ No lock manifest at {args.lock}, skipping integrity check")
+        return 1 if args.strict else 0
+
+    problems = check_lock(args.lock, args.comfyui)
+    if os.path.exists(args.sources):
+        problems += check_sources(load_sources(args.sources), args.comfyui)
+    elapsed = time.perf_counter() - started
+    if not problems:
+        print(f"✓ Environment matches {args.lock} ({elapsed * 1000:.0f}ms)")
+        return 0
+
+    print(f"⚠ Environment differs from {args.lock}:")
+    for problem in problems:
+        print(f"  - {problem}")
+    return 1 if args.strict else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
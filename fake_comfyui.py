@@ -0,0 +1,425 @@
+"""
+Minimal stand-in for the ComfyUI HTTP/websocket API, for tests without a GPU
+Runs an aiohttp server in a background thread, like ComfyUI's own server
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import threading
+import time
+import uuid
+
+from aiohttp import web
+
+
+# Node types the handler's workflows use: (required inputs, outputs), in /object_info's layout
+NODE_DEFINITIONS = {
+    "LoadImage": ({"image": [[], {"image_upload": True}]}, ["IMAGE", "MASK"]),
+    "VAELoader": ({"vae_name": [["hunyuanvideo15_vae_fp16.safetensors"]]}, ["VAE"]),
+    "UNETLoader": ({
+        "unet_name": [[
+            "hunyuanvideo1.5_720p_i2v_cfg_distilled_fp8_scaled.safetensors",
+            "hunyuanvideo1.5_480p_i2v_cfg_distilled_fp8_scaled.safetensors",
+            "hunyuanvideo1.5_480p_i2v_step_distilled_fp8_scaled.safetensors",
+        ]],
+        "weight_dtype": [["default", "fp8_e4m3fn", "fp8_e4m3fn_fast", "fp8_e5m2"]],
+    }, ["MODEL"]),
+    "DualCLIPLoader": ({
+        "clip_name1": [["qwen_2.5_vl_7b_fp8_scaled.safetensors"]],
+        "clip_name2": [["byt5_small_glyphxl_fp16.safetensors"]],
+        "type": [["hunyuan_video", "hunyuan_video_15"]],
+        "device": [["default", "cpu"]],
+    }, ["CLIP"]),
+    "CLIPVisionLoader": ({"clip_name": [["sigclip_vision_patch14_384.safetensors"]]}, ["CLIP_VISION"]),
+    "CLIPTextEncode": ({"text": ["STRING", {"multiline": True}], "clip": ["CLIP"]}, ["CONDITIONING"]),
+    "CachedCLIPTextEncode": ({"text": ["STRING", {"multiline": True}], "clip": ["CLIP", {"lazy": True}],
+                              "encoder": ["STRING", {}]}, ["CONDITIONING"]),
+    "CLIPVisionEncode": ({"clip_vision": ["CLIP_VISION"], "image": ["IMAGE"], "crop": [["center", "none"]]},
+                         ["CLIP_VISION_OUTPUT"]),
+    "HunyuanVideo15ImageToVideo": ({
+        "positive": ["CONDITIONING"], "negative": ["CONDITIONING"], "vae": ["VAE"],
+        "width": ["INT", {}], "height": ["INT", {}], "length": ["INT", {}], "batch_size": ["INT", {}],
+    }, ["CONDITIONING", "CONDITIONING", "LATENT"]),
+    "ModelSamplingSD3": ({"model": ["MODEL"], "shift": ["FLOAT", {}]}, ["MODEL"]),
+    "EasyCache": ({"model": ["MODEL"], "reuse_threshold": ["FLOAT", {}], "start_percent": ["FLOAT", {}],
+                   "end_percent": ["FLOAT", {}], "verbose": ["BOOLEAN", {}]}, ["MODEL"]),
+    "LazyCache": ({"model": ["MODEL"], "reuse_threshold": ["FLOAT", {}], "start_percent": ["FLOAT", {}],
+                   "end_percent": ["FLOAT", {}], "verbose": ["BOOLEAN", {}]}, ["MODEL"]),
+    "CFGGuider": ({"model": ["MODEL"], "positive": ["CONDITIONING"], "negative": ["CONDITIONING"],
+                   "cfg": ["FLOAT", {}]}, ["GUIDER"]),
+    "BasicScheduler": ({"model": ["MODEL"], "scheduler": [["simple", "normal", "karras", "beta"]],
+                        "steps": ["INT", {}], "denoise": ["FLOAT", {}]}, ["SIGMAS"]),
+    "RandomNoise": ({"noise_seed": ["INT", {}]}, ["NOISE"]),
+    "KSamplerSelect": ({"sampler_name": [["euler", "euler_ancestral", "dpmpp_2m", "res_multistep"]]}, ["SAMPLER"]),
+    "SamplerCustomAdvanced": ({"noise": ["NOISE"], "guider": ["GUIDER"], "sampler": ["SAMPLER"],
+                               "sigmas": ["SIGMAS"], "latent_image": ["LATENT"]}, ["LATENT", "LATENT"]),
+    "VAEDecode": ({"samples": ["LATENT"], "vae": ["VAE"]}, ["IMAGE"]),
+    "VAEDecodeTiled": ({"samples": ["LATENT"], "vae": ["VAE"], "tile_size": ["INT", {}], "overlap": ["INT", {}],
+                        "temporal_size": ["INT", {}], "temporal_overlap": ["INT", {}]}, ["IMAGE"]),
+    "CreateVideo": ({"images": ["IMAGE"], "fps": ["FLOAT", {}]}, ["VIDEO"]),
+    "SaveVideo": ({"video": ["VIDEO"], "filename_prefix": ["STRING", {}], "format": [["auto", "mp4"]],
+                   "codec": [["auto", "h264"]]}, ["*"]),
+}
+
+OPTIONAL_INPUTS = {
+    "HunyuanVideo15ImageToVideo": {"start_image": ["IMAGE"], "clip_vision_output": ["CLIP_VISION_OUTPUT"]},
+}
+
+
+def object_info():
+    """/object_info payload for NODE_DEFINITIONS"""
+    return {
+        class_type: {
+            "input": {"required": required, "optional": OPTIONAL_INPUTS.get(class_type, {})},
+            "output": outputs,
+            "name": class_type,
+        }
+        for class_type, (required, outputs) in NODE_DEFINITIONS.items()
+    }
+
+
+def execution_order(prompt):
+    """Node IDs with every node after its inputs, walking outputs in order like ComfyUI"""
+    order = []
+    seen = set()
+
+    def visit(node_id):
+        if node_id in seen or node_id not in prompt:
+            return
+        seen.add(node_id)
+        for value in prompt[node_id].get("inputs", {}).values():
+            if isinstance(value, list) and len(value) == 2:
+                visit(str(value[0]))
+        order.append(node_id)
+
+    for node_id in prompt:
+        visit(node_id)
+    return order
+
+
+class FakeComfyUI:
+    """
+    Fake ComfyUI server that "renders" each queued prompt by sleeping
+
+    render_seconds is split evenly over the prompt's nodes unless node_seconds
+    gives a node ID or class_type its own latency. fail_rate and reject_rate
+    inject execution errors and refused /prompt calls at random (seeded).
+    Memory figures in /system_stats follow whether models are loaded
+    (model_vram_mb) and whether a prompt is running (job_vram_mb); /free unloads.
+    """
+
+    def __init__(self, render_seconds=0.5, fail_node=None, drop_websocket=False, sampler_steps=4, output_dir=None,
+                 node_seconds=None, fail_rate=0.0, reject_rate=0.0, seed=None, port=0,
+                 vram_total_mb=24576, model_vram_mb=0, job_vram_mb=0, ram_total_mb=65536, ram_used_mb=8192):
+        self.render_seconds = render_seconds
+        self.fail_node = fail_node
+        self.drop_websocket = drop_websocket
+        self.sampler_steps = sampler_steps
+        self.output_dir = output_dir
+        self.node_seconds = node_seconds or {}
+        self.fail_rate = fail_rate
+        self.reject_rate = reject_rate
+        self.port = port
+        self._random = random.Random(seed)
+        self.vram_total_mb = vram_total_mb
+        self.model_vram_mb = model_vram_mb
+        self.job_vram_mb = job_vram_mb
+        self.ram_total_mb = ram_total_mb
+        self.ram_used_mb = ram_used_mb
+        self.models_loaded = False
+        self.frees = []
+        self._unload_pending = False
+
+        self.history = {}
+        self.finished_at = {}
+        self.prompts = {}
+        self.pending = []
+        self.running = None
+        self.interrupts = 0
+        self.rejected = 0
+        self.url = None
+        self._interrupted = False
+
+        self._sockets = {}
+        self._queue_lock = None
+        self._loop = None
+        self._runner = None
+        self._thread = None
+
+    def start(self):
+        """Start serving on a free local port and return the base URL"""
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._serve, args=(ready,), daemon=True)
+        self._thread.start()
+        ready.wait(timeout=10)
+        return self.url
+
+    def stop(self):
+        """Shut the server down"""
+        if self._loop is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop)
+        future.result(timeout=10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+        self._loop = None
+
+    def _serve(self, ready):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._queue_lock = asyncio.Lock()
+
+        app = web.Application()
+        app.router.add_get("/ws", self._ws)
+        app.router.add_post("/prompt", self._prompt)
+        app.router.add_get("/queue", self._get_queue)
+        app.router.add_post("/queue", self._post_queue)
+        app.router.add_post("/interrupt", self._interrupt)
+        app.router.add_get("/history/{prompt_id}", self._history)
+        app.router.add_get("/system_stats", self._system_stats)
+        app.router.add_get("/object_info", self._object_info)
+        app.router.add_post("/free", self._free)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, "127.0.0.1", self.port)
+        self._loop.run_until_complete(site.start())
+
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        ready.set()
+        self._loop.run_forever()
+
+    async def _ws(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        client_id = request.query.get("clientId") or uuid.uuid4().hex
+        self._sockets[client_id] = ws
+        await ws.send_json({"type": "status", "data": {"sid": client_id}})
+        try:
+            async for _ in ws:
+                pass
+        finally:
+            self._sockets.pop(client_id, None)
+        return ws
+
+    async def _prompt(self, request):
+        body = await request.json()
+        prompt = body.get("prompt") or {}
+        if self.reject_rate and self._random.random() < self.reject_rate:
+            self.rejected += 1
+            return web.json_response({"error": {"type": "fake_rejection", "message": "injected /prompt failure"},
+                                      "node_errors": {}}, status=400)
+        prompt_id = uuid.uuid4().hex
+        self.prompts[prompt_id] = prompt
+        self.pending.append(prompt_id)
+        asyncio.ensure_future(self._execute(prompt_id, prompt, body.get("client_id")))
+        return web.json_response({"prompt_id": prompt_id, "number": len(self.prompts), "node_errors": {}})
+
+    async def _get_queue(self, request):
+        running = [[0, self.running, {}, {}, []]] if self.running else []
+        pending = [[i + 1, prompt_id, {}, {}, []] for i, prompt_id in enumerate(self.pending)]
+        return web.json_response({"queue_running": running, "queue_pending": pending})
+
+    async def _post_queue(self, request):
+        body = await request.json()
+        if body.get("clear"):
+            self.pending.clear()
+        for prompt_id in body.get("delete", []):
+            if prompt_id in self.pending:
+                self.pending.remove(prompt_id)
+        return web.Response()
+
+    async def _interrupt(self, request):
+        try:
+            body = await request.json()
+        except ValueError:
+            body = {}
+        # Like current ComfyUI, a prompt_id only interrupts that prompt if it's the one running
+        target = body.get("prompt_id")
+        if self.running and (target is None or target == self.running):
+            self._interrupted = True
+            self.interrupts += 1
+        return web.Response()
+
+    async def _history(self, request):
+        prompt_id = request.match_info["prompt_id"]
+        if prompt_id in self.history:
+            return web.json_response({prompt_id: self.history[prompt_id]})
+        return web.json_response({})
+
+    def vram_used_mb(self):
+        used = self.model_vram_mb if self.models_loaded else 0
+        if self.running:
+            used += self.job_vram_mb
+        return used
+
+    async def _system_stats(self, request):
+        mb = 1024 * 1024
+        vram_free = (self.vram_total_mb - self.vram_used_mb()) * mb
+        return web.json_response({
+            "system": {
+                "comfyui_version": "fake",
+                "ram_total": self.ram_total_mb * mb,
+                "ram_free": (self.ram_total_mb - self.ram_used_mb) * mb,
+            },
+            "devices": [{
+                "name": "cuda:0 Fake GPU : native",
+                "type": "cuda",
+                "vram_total": self.vram_total_mb * mb,
+                "vram_free": vram_free,
+                "torch_vram_total": self.vram_used_mb() * mb,
+                "torch_vram_free": 0,
+            }],
+        })
+
+    async def _free(self, request):
+        body = await request.json()
+        self.frees.append(body)
+        # Like ComfyUI, unload_models defaults to free_memory and waits for the running prompt
+        if body.get("unload_models", body.get("free_memory", False)):
+            if self.running:
+                self._unload_pending = True
+            else:
+                self.models_loaded = False
+        return web.Response()
+
+    async def _object_info(self, request):
+        return web.json_response(object_info())
+
+    def _write_output(self, subfolder, filename):
+        """Write a placeholder output file where the handler will look for it"""
+        if not self.output_dir:
+            return
+        folder = os.path.join(self.output_dir, subfolder)
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, filename), "wb") as f:
+            f.write(b"\x00\x00\x00\x18ftypmp42fake video")
+
+    async def _send(self, client_id, event_type, data):
+        ws = self._sockets.get(client_id)
+        if ws is None or ws.closed:
+            return
+        await ws.send_json({"type": event_type, "data": data})
+
+    async def _execute(self, prompt_id, prompt, client_id):
+        # Like ComfyUI, run one prompt at a time in queue order
+        async with self._queue_lock:
+            if prompt_id not in self.pending:
+                return  # deleted from the queue before it started
+            self.pending.remove(prompt_id)
+            self.running = prompt_id
+            self.models_loaded = True
+            self._interrupted = False
+            try:
+                await self._run_prompt(prompt_id, prompt, client_id)
+            finally:
+                self.running = None
+                if self._unload_pending:
+                    self.models_loaded = False
+                    self._unload_pending = False
+
+    async def _run_prompt(self, prompt_id, prompt, client_id):
+        if self.drop_websocket:
+            ws = self._sockets.get(client_id)
+            if ws is not None:
+                await ws.close()
+
+        await self._send(client_id, "execution_start", {"prompt_id": prompt_id})
+
+        node_ids = execution_order(prompt) or ["1"]
+        per_node = self.render_seconds / len(node_ids)
+        fail_node = self.fail_node
+        if self.fail_rate and self._random.random() < self.fail_rate:
+            fail_node = self._random.choice(node_ids)
+        outputs = {}
+        for node_id in node_ids:
+            await self._send(client_id, "executing", {"node": node_id, "prompt_id": prompt_id})
+            class_type = prompt.get(node_id, {}).get("class_type")
+            latency = self.node_seconds.get(node_id, self.node_seconds.get(class_type, per_node))
+
+            if class_type == "SamplerCustomAdvanced" and self.sampler_steps:
+                for step in range(1, self.sampler_steps + 1):
+                    await asyncio.sleep(latency / self.sampler_steps)
+                    if self._interrupted:
+                        break
+                    await self._send(client_id, "progress", {
+                        "value": step, "max": self.sampler_steps, "prompt_id": prompt_id, "node": node_id,
+                    })
+            else:
+                await asyncio.sleep(latency)
+
+            if self._interrupted:
+                data = {"prompt_id": prompt_id, "node_id": node_id, "node_type": class_type}
+                self.history[prompt_id] = {
+                    "prompt": prompt,
+                    "outputs": outputs,
+                    "status": {"status_str": "error", "completed": False, "messages": [["execution_interrupted", data]]},
+                }
+                self.finished_at[prompt_id] = time.time()
+                await self._send(client_id, "execution_interrupted", data)
+                return
+
+            if node_id == fail_node:
+                error = {
+                    "prompt_id": prompt_id,
+                    "node_id": node_id,
+                    "exception_message": f"fake failure in node {node_id}",
+                }
+                self.history[prompt_id] = {
+                    "prompt": prompt,
+                    "outputs": outputs,
+                    "status": {"status_str": "error", "completed": False, "messages": [["execution_error", error]]},
+                }
+                self.finished_at[prompt_id] = time.time()
+                await self._send(client_id, "execution_error", error)
+                return
+
+            if class_type == "SaveVideo":
+                filename = f"{prompt_id}_{node_id}.mp4"
+                self._write_output("video", filename)
+                outputs[node_id] = {
+                    "images": [{"filename": filename, "subfolder": "video", "type": "output"}],
+                    "animated": [True],
+                }
+
+        self.history[prompt_id] = {
+            "prompt": prompt,
+            "outputs": outputs,
+            "status": {"status_str": "success", "completed": True, "messages": []},
+        }
+        self.finished_at[prompt_id] = time.time()
+        await self._send(client_id, "execution_success", {"prompt_id": prompt_id})
+        await self._send(client_id, "executing", {"node": None, "prompt_id": prompt_id})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake ComfyUI server")
+    parser.add_argument("--port", type=int, default=8188, help="Port to listen on")
+    parser.add_argument("--output-dir", help="Write placeholder outputs here (ComfyUI's output folder)")
+    parser.add_argument("--render-seconds", type=float, default=0.5, help="Render time split over a prompt's nodes")
+    parser.add_argument("--node-seconds", action="append", default=[], metavar="NODE=SECONDS",
+                        help="Latency for a node ID or class_type, e.g. SamplerCustomAdvanced=2 (repeatable)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of prompts that fail at a random node")
+    parser.add_argument("--reject-rate", type=float, default=0.0, help="Fraction of /prompt calls refused with HTTP 400")
+    parser.add_argument("--seed", type=int, help="Seed for failure injection")
+    args = parser.parse_args()
+
+    node_seconds = {}
+    for item in args.node_seconds:
+        node, seconds = item.split("=", 1)
+        node_seconds[node] = float(seconds)
+
+    server = FakeComfyUI(render_seconds=args.render_seconds, output_dir=args.output_dir, node_seconds=node_seconds,
+                         fail_rate=args.fail_rate, reject_rate=args.reject_rate, seed=args.seed, port=args.port)
+    print(f"Fake ComfyUI listening on {server.start()}")
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
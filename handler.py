@@ -7,115 +7,245 @@ import os
 import json
 import time
 import base64
-import requests
+import asyncio
+import functools
+import hashlib
+import random
+import signal
+import uuid
 import runpod
 from pathlib import Path
-import subprocess
-import signal
 import sys
 
+from comfy_client import ComfyUIClient, RequestStats
+from comfy_events import CompletionTracker, ProgressReporter, WorkflowError
+from comfy_supervisor import ComfyUISupervisor
+from output_sink import InlineSink, create_output_sink
+from result_cache import create_result_cache
+from retention import RetentionManager
+from cancellation import PromptCanceller
+from cost_model import JOB_BUDGET_SECONDS, CostModel, gpu_class, work_units
+from image_fetch import FetchError, ImageFetcher
+from image_preprocess import PREPROCESS_IMAGES, ImageError, preprocess_image, validate_image
+from timings import METRICS_PORT, JobTimer, Metrics
+from residency import ResidencyManager
+from model_catalog import RENDER_DEFAULTS, ModelCatalog, ModelError, ModelScheduler, workflow_unet
+from vae_tiling import apply_decode_plan, plan_decode
+from acceleration import ACCEL_MODES, LaunchProfile, accel_mode, apply_accel
+from workflow_templates import TemplateError, TemplateRegistry, WorkflowTemplate
+from workflow_validation import ObjectInfoCache, summarize_errors
+
 # Configuration
 COMFYUI_PATH = os.environ.get("COMFYUI_PATH", "/app/ComfyUI")
 COMFYUI_PORT = 8188
 COMFYUI_URL = f"http://127.0.0.1:{COMFYUI_PORT}"
+STREAM_PROGRESS = os.environ.get("STREAM_PROGRESS", "0") == "1"
+# Jobs a worker runs at once. Sampling is still serialized by ComfyUI's queue,
+# but image download/decode and output encoding overlap with it
+MAX_CONCURRENCY = int(os.environ.get("MAX_CONCURRENCY", "1"))
+# ComfyUI process supervision
+COMFYUI_READY_TIMEOUT = int(os.environ.get("COMFYUI_READY_TIMEOUT", "120"))
+COMFYUI_LOG_ECHO = os.environ.get("COMFYUI_LOG_ECHO", "0") == "1"
+COMFYUI_LOG_TAIL = int(os.environ.get("COMFYUI_LOG_TAIL", "40"))
+# Warm-up render at boot so the first job doesn't pay model load time
+WARMUP = os.environ.get("WARMUP", "1") == "1"
+WARMUP_MARKER = os.environ.get("WARMUP_MARKER", "/tmp/comfyui_warm.json")
+WARMUP_TIMEOUT = int(os.environ.get("WARMUP_TIMEOUT", "900"))
+# 1x1 PNG; HunyuanVideo15ImageToVideo scales it to the warm-up size
+WARMUP_IMAGE = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8DwHwAFBQIAX8jx0gAAAABJRU5ErkJggg=="
+# Encode prompts through the conditioning_cache.py node so repeats skip the text encoders
+CONDITIONING_CACHE = os.environ.get("CONDITIONING_CACHE", "1") == "1"
+# Most seed/prompt variants rendered from one image in a single job
+MAX_VARIANTS = int(os.environ.get("MAX_VARIANTS", "8"))
+# Check custom workflows against ComfyUI's /object_info before queueing them
+VALIDATE_WORKFLOWS = os.environ.get("VALIDATE_WORKFLOWS", "1") == "1"
+# Phase timings written by builder.sh; the handler appends its own
+COLD_START_TIMINGS = os.environ.get("COLD_START_TIMINGS", "/tmp/cold_start_timings.jsonl")
+
+# Shared keep-alive client for every call into ComfyUI
+comfy = ComfyUIClient(COMFYUI_URL)
+
+# Where rendered files go: inline base64 or S3 (see output_sink.py)
+output_sink = create_output_sink()
+
+# Deletes job files once responses are built and sweeps old ones in the background
+retention = RetentionManager([os.path.join(COMFYUI_PATH, "input"), os.path.join(COMFYUI_PATH, "output")])
+
+# Render time estimates per GPU class, fitted from this endpoint's own runs
+cost_model = CostModel()
+gpu_name = None
+
+# Pooled, size-capped image_url downloads with an ETag/Last-Modified cache
+image_fetcher = ImageFetcher()
+
+# Rendered outputs keyed on input image + resolved workflow (see result_cache.py)
+result_cache = create_result_cache()
+
+# ComfyUI flags from COMFYUI_PROFILE: attention backend, --fast, VRAM mode
+launch_profile = LaunchProfile()
+
+# Owns the ComfyUI process: drains its logs, restarts it if it crashes
+supervisor = ComfyUISupervisor(
+    COMFYUI_PATH,
+    COMFYUI_PORT,
+    comfy,
+    ready_timeout=COMFYUI_READY_TIMEOUT,
+    echo=COMFYUI_LOG_ECHO,
+    extra_args=launch_profile.args
+)
+
+# Per-stage timing histograms across jobs, served on METRICS_PORT and/or METRICS_JSONL
+metrics = Metrics()
+
+# ComfyUI's node definitions, fetched once, for validating custom workflows
+object_info = ObjectInfoCache(comfy)
+
+# Keeps models hot or frees them per RESIDENCY_POLICY, and measures each job's memory
+residency = ResidencyManager(comfy)
 
-# Global process holder
-comfyui_process = None
+# Diffusion model variants this worker serves (MODEL_VARIANTS), and the order
+# concurrent jobs reach ComfyUI in so UNets aren't swapped back and forth
+model_catalog = ModelCatalog()
+model_scheduler = ModelScheduler()
+
+# Interrupts or dequeues prompts whose job timed out, was cancelled or is shutting down
+canceller = PromptCanceller(comfy, supervisor)
 
 
 def start_comfyui():
-    """Start ComfyUI server in background"""
-    global comfyui_process
-    
-    print("Starting ComfyUI server...")
-    comfyui_process = subprocess.Popen(
-        ["python", "main.py", "--listen", "0.0.0.0", "--port", str(COMFYUI_PORT)],
-        cwd=COMFYUI_PATH,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
-    )
-    
-    # Wait for server to be ready
-    max_retries = 60
-    for i in range(max_retries):
-        try:
-            response = requests.get(f"{COMFYUI_URL}/system_stats", timeout=2)
-            if response.status_code == 200:
-                print("ComfyUI server is ready!")
-                return True
-        except requests.exceptions.RequestException:
-            pass
-        
-        if i % 10 == 0:
-            print(f"Waiting for ComfyUI server... ({i}/{max_retries})")
-        time.sleep(1)
-    
-    print("Failed to start ComfyUI server")
-    return False
+    """Start ComfyUI server in background and wait until it is ready"""
+    return supervisor.start()
 
 
 def stop_comfyui():
     """Stop ComfyUI server"""
-    global comfyui_process
-    if comfyui_process:
-        print("Stopping ComfyUI server...")
-        comfyui_process.send_signal(signal.SIGTERM)
-        comfyui_process.wait(timeout=10)
+    supervisor.stop()
 
 
-def upload_image(image_data, filename="input_image.png"):
-    """Upload image to ComfyUI"""
-    input_dir = os.path.join(COMFYUI_PATH, "input")
-    os.makedirs(input_dir, exist_ok=True)
+def comfy_error(message):
+    """Error response with the tail of ComfyUI's log attached"""
+    response = {"error": message}
+    if supervisor.managed:
+        response["comfyui_log"] = supervisor.log_tail(COMFYUI_LOG_TAIL)
+    return response
+
+
+def record_cold_start_phase(phase, seconds):
+    """Append a cold-start phase timing next to the ones builder.sh wrote"""
+    try:
+        with open(COLD_START_TIMINGS, "a") as f:
+            f.write(json.dumps({"phase": phase, "ms": int(seconds * 1000)}) + "\n")
+    except OSError as e:
+        print(f"Could not record cold-start timing: {e}")
+
+
+def report_cold_start():
+    """Print every recorded cold-start phase and the total"""
+    phases = []
+    try:
+        with open(COLD_START_TIMINGS) as f:
+            for line in f:
+                if line.strip():
+                    phases.append(json.loads(line))
+    except (OSError, ValueError):
+        return phases
     
-    # Handle base64 encoded images
+    total_ms = sum(p["ms"] for p in phases)
+    print("Cold start phases: " + ", ".join(f"{p['phase']} {p['ms'] / 1000:.1f}s" for p in phases))
+    print(f"Cold start total: {total_ms / 1000:.1f}s")
+    return phases
+
+
+def image_extension(image_bytes):
+    """Guess a file extension from the image's magic bytes"""
+    if image_bytes.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return ".webp"
+    return ".png"
+
+
+def decode_image(image_data):
+    """Raw bytes of an image given as bytes, base64 or a data URI"""
     if isinstance(image_data, str):
         if image_data.startswith("data:image"):
             # Remove data:image/png;base64, prefix
             image_data = image_data.split(",", 1)[1]
-        image_bytes = base64.b64decode(image_data)
-    else:
-        image_bytes = image_data
+        return base64.b64decode(image_data)
+    return image_data
+
+
+def content_filename(image_bytes):
+    """Content-addressed name for an input image"""
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    return f"{digest[:32]}{image_extension(image_bytes)}"
+
+
+# LoadImage values in a custom workflow that stand for the job's input image
+INPUT_IMAGE_PLACEHOLDERS = ("$INPUT_IMAGE", "input_image.png", "")
+
+
+def bind_input_image(workflow, filename):
+    """Copy of a custom workflow with placeholder LoadImage inputs pointing at the uploaded image"""
+    bound = {}
+    for node_id, node in workflow.items():
+        if (isinstance(node, dict) and node.get("class_type") == "LoadImage"
+                and node.get("inputs", {}).get("image") in INPUT_IMAGE_PLACEHOLDERS):
+            node = {**node, "inputs": {**node["inputs"], "image": filename}}
+        bound[node_id] = node
+    return bound
+
+
+def upload_image(image_data, filename=None):
+    """
+    Upload image to ComfyUI
+    
+    Files are named after a hash of their content unless a filename is given,
+    so concurrent jobs never overwrite each other's input and resubmitting
+    the same image reuses the file already on disk.
+    """
+    input_dir = os.path.join(COMFYUI_PATH, "input")
+    os.makedirs(input_dir, exist_ok=True)
+    
+    image_bytes = decode_image(image_data)
+    
+    if filename is None:
+        filename = content_filename(image_bytes)
     
-    # Save image
     image_path = os.path.join(input_dir, filename)
-    with open(image_path, "wb") as f:
+    if os.path.exists(image_path):
+        return filename
+    
+    # Write then rename so a concurrent job never sees a partial file
+    tmp_path = f"{image_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
         f.write(image_bytes)
+    os.replace(tmp_path, image_path)
     
     return filename
 
 
-def queue_prompt(workflow):
-    """Queue a workflow in ComfyUI"""
-    response = requests.post(f"{COMFYUI_URL}/prompt", json={"prompt": workflow})
-    return response.json()
-
-
-def get_history(prompt_id):
-    """Get execution history for a prompt"""
-    response = requests.get(f"{COMFYUI_URL}/history/{prompt_id}")
-    return response.json()
+def current_gpu():
+    """GPU class ComfyUI is running on, looked up once; non-default launch profiles are part of it"""
+    global gpu_name
+    if gpu_name is None:
+        try:
+            gpu_name = gpu_class(comfy.system_stats())
+            if launch_profile.label != "default":
+                # Render speed depends on the flags too, so they get their own cost fit
+                gpu_name = f"{gpu_name} [{launch_profile.label}]"
+        except Exception as e:
+            print(f"Could not read GPU from ComfyUI: {str(e)}")
+            return "unknown"
+    return gpu_name
 
 
-def wait_for_completion(prompt_id, timeout=600):
+def wait_for_completion(prompt_id, timeout=600, tracker=None):
     """Wait for workflow execution to complete"""
-    start_time = time.time()
-    
-    while time.time() - start_time < timeout:
-        history = get_history(prompt_id)
-        
-        if prompt_id in history:
-            status = history[prompt_id].get("status", {})
-            
-            if status.get("completed", False):
-                return history[prompt_id]
-            
-            if "error" in status:
-                raise Exception(f"Workflow failed: {status['error']}")
-        
-        time.sleep(2)
-    
-    raise TimeoutError(f"Workflow execution timed out after {timeout}s")
+    if tracker is None:
+        # No socket subscribed for this prompt, so this polls history
+        tracker = CompletionTracker(comfy.base_url, comfy.get_history)
+    return tracker.wait(prompt_id, timeout=timeout)
 
 
 def get_output_files(history_entry):
@@ -130,6 +260,7 @@ def get_output_files(history_entry):
             for video in node_output["videos"]:
                 outputs.append({
                     "type": "video",
+                    "node_id": node_id,
                     "filename": video["filename"],
                     "subfolder": video.get("subfolder", ""),
                     "type_name": video.get("type", "output")
@@ -139,6 +270,7 @@ def get_output_files(history_entry):
             for image in node_output["images"]:
                 outputs.append({
                     "type": "image",
+                    "node_id": node_id,
                     "filename": image["filename"],
                     "subfolder": image.get("subfolder", ""),
                     "type_name": image.get("type", "output")
@@ -147,192 +279,483 @@ def get_output_files(history_entry):
     return outputs
 
 
+def get_output_path(filename, subfolder="", file_type="output"):
+    """Resolve where ComfyUI wrote an output file"""
+    if subfolder:
+        return os.path.join(COMFYUI_PATH, file_type, subfolder, filename)
+    return os.path.join(COMFYUI_PATH, file_type, filename)
+
+
 def get_file_as_base64(filename, subfolder="", file_type="output"):
     """Get file content as base64"""
-    if subfolder:
-        filepath = os.path.join(COMFYUI_PATH, file_type, subfolder, filename)
-    else:
-        filepath = os.path.join(COMFYUI_PATH, file_type, filename)
+    filepath = get_output_path(filename, subfolder, file_type)
     
     if not os.path.exists(filepath):
         return None
     
-    with open(filepath, "rb") as f:
-        file_bytes = f.read()
-        return base64.b64encode(file_bytes).decode("utf-8")
+    return InlineSink().store(filepath)["data"]
 
 
-def create_default_workflow(input_image, prompt="", negative_prompt="", seed=None, num_frames=25, fps=24, steps=20, cfg=1, width=720, height=1280, shift=7):
-    """Create a default Hunyuan 1.5 Video workflow based on actual workflow structure"""
-    if seed is None:
-        import random
-        seed = random.randint(0, 2**32 - 1)
-    
-    # Actual Hunyuan 1.5 workflow structure from video_workflow.json
-    workflow = {
-        "8": {
-            "inputs": {
-                "samples": ["125", 0],
-                "vae": ["10", 0]
-            },
-            "class_type": "VAEDecode",
-            "_meta": {"title": "VAE Decode"}
+# The built-in image-to-video graph, registered as the "hunyuan_i2v" template
+DEFAULT_TEMPLATE = "hunyuan_i2v"
+DEFAULT_PROMPT = "high quality, smooth motion, cinematic"
+
+# Actual Hunyuan 1.5 workflow structure from video_workflow.json
+DEFAULT_WORKFLOW = {
+    "8": {
+        "inputs": {
+            "samples": ["125", 0],
+            "vae": ["10", 0]
         },
-        "10": {
-            "inputs": {
-                "vae_name": "hunyuanvideo15_vae_fp16.safetensors"
-            },
-            "class_type": "VAELoader",
-            "_meta": {"title": "Load VAE"}
+        "class_type": "VAEDecode",
+        "_meta": {"title": "VAE Decode"}
+    },
+    "10": {
+        "inputs": {
+            "vae_name": "hunyuanvideo15_vae_fp16.safetensors"
         },
-        "11": {
-            "inputs": {
-                "clip_name1": "qwen_2.5_vl_7b_fp8_scaled.safetensors",
-                "clip_name2": "byt5_small_glyphxl_fp16.safetensors",
-                "type": "hunyuan_video_15",
-                "device": "default"
-            },
-            "class_type": "DualCLIPLoader",
-            "_meta": {"title": "DualCLIPLoader"}
+        "class_type": "VAELoader",
+        "_meta": {"title": "Load VAE"}
+    },
+    "11": {
+        "inputs": {
+            "clip_name1": "qwen_2.5_vl_7b_fp8_scaled.safetensors",
+            "clip_name2": "byt5_small_glyphxl_fp16.safetensors",
+            "type": "hunyuan_video_15",
+            "device": "default"
         },
-        "12": {
-            "inputs": {
-                "unet_name": "hunyuanvideo1.5_720p_i2v_cfg_distilled_fp8_scaled.safetensors",
-                "weight_dtype": "default"
-            },
-            "class_type": "UNETLoader",
-            "_meta": {"title": "Load Diffusion Model"}
+        "class_type": "DualCLIPLoader",
+        "_meta": {"title": "DualCLIPLoader"}
+    },
+    "12": {
+        "inputs": {
+            "unet_name": "hunyuanvideo1.5_720p_i2v_cfg_distilled_fp8_scaled.safetensors",
+            "weight_dtype": "default"
         },
-        "44": {
-            "inputs": {
-                "text": prompt if prompt else "high quality, smooth motion, cinematic",
-                "clip": ["11", 0]
-            },
-            "class_type": "CLIPTextEncode",
-            "_meta": {"title": "CLIP Text Encode (Positive Prompt)"}
+        "class_type": "UNETLoader",
+        "_meta": {"title": "Load Diffusion Model"}
+    },
+    "44": {
+        "inputs": {
+            "text": DEFAULT_PROMPT,
+            "clip": ["11", 0]
         },
-        "78": {
-            "inputs": {
-                "width": width,
-                "height": height,
-                "length": num_frames,
-                "batch_size": 1,
-                "positive": ["44", 0],
-                "negative": ["93", 0],
-                "vae": ["10", 0],
-                "start_image": ["80", 0],
-                "clip_vision_output": ["79", 0]
-            },
-            "class_type": "HunyuanVideo15ImageToVideo",
-            "_meta": {"title": "HunyuanVideo15ImageToVideo"}
+        "class_type": "CLIPTextEncode",
+        "_meta": {"title": "CLIP Text Encode (Positive Prompt)"}
+    },
+    "78": {
+        "inputs": {
+            "width": 720,
+            "height": 1280,
+            "length": 25,
+            "batch_size": 1,
+            "positive": ["44", 0],
+            "negative": ["93", 0],
+            "vae": ["10", 0],
+            "start_image": ["80", 0],
+            "clip_vision_output": ["79", 0]
         },
-        "79": {
-            "inputs": {
-                "crop": "center",
-                "clip_vision": ["81", 0],
-                "image": ["80", 0]
-            },
-            "class_type": "CLIPVisionEncode",
-            "_meta": {"title": "CLIP Vision Encode"}
+        "class_type": "HunyuanVideo15ImageToVideo",
+        "_meta": {"title": "HunyuanVideo15ImageToVideo"}
+    },
+    "79": {
+        "inputs": {
+            "crop": "center",
+            "clip_vision": ["81", 0],
+            "image": ["80", 0]
         },
-        "80": {
-            "inputs": {
-                "image": input_image
-            },
-            "class_type": "LoadImage",
-            "_meta": {"title": "Load Image"}
+        "class_type": "CLIPVisionEncode",
+        "_meta": {"title": "CLIP Vision Encode"}
+    },
+    "80": {
+        "inputs": {
+            "image": ""
         },
-        "81": {
-            "inputs": {
-                "clip_name": "sigclip_vision_patch14_384.safetensors"
-            },
-            "class_type": "CLIPVisionLoader",
-            "_meta": {"title": "Load CLIP Vision"}
+        "class_type": "LoadImage",
+        "_meta": {"title": "Load Image"}
+    },
+    "81": {
+        "inputs": {
+            "clip_name": "sigclip_vision_patch14_384.safetensors"
         },
-        "93": {
-            "inputs": {
-                "text": negative_prompt,
-                "clip": ["11", 0]
-            },
-            "class_type": "CLIPTextEncode",
-            "_meta": {"title": "CLIP Text Encode (Negative Prompt)"}
+        "class_type": "CLIPVisionLoader",
+        "_meta": {"title": "Load CLIP Vision"}
+    },
+    "93": {
+        "inputs": {
+            "text": "",
+            "clip": ["11", 0]
         },
-        "101": {
-            "inputs": {
-                "fps": fps,
-                "images": ["8", 0]
-            },
-            "class_type": "CreateVideo",
-            "_meta": {"title": "Create Video"}
+        "class_type": "CLIPTextEncode",
+        "_meta": {"title": "CLIP Text Encode (Negative Prompt)"}
+    },
+    "101": {
+        "inputs": {
+            "fps": 24,
+            "images": ["8", 0]
         },
-        "102": {
-            "inputs": {
-                "filename_prefix": "video/hunyuan_video_1.5",
-                "format": "auto",
-                "codec": "h264",
-                "video": ["101", 0]
-            },
-            "class_type": "SaveVideo",
-            "_meta": {"title": "Save Video"}
+        "class_type": "CreateVideo",
+        "_meta": {"title": "Create Video"}
+    },
+    "102": {
+        "inputs": {
+            "filename_prefix": "video/hunyuan_video_1.5",
+            "format": "auto",
+            "codec": "h264",
+            "video": ["101", 0]
         },
-        "125": {
-            "inputs": {
-                "noise": ["127", 0],
-                "guider": ["129", 0],
-                "sampler": ["128", 0],
-                "sigmas": ["126", 0],
-                "latent_image": ["78", 2]
-            },
-            "class_type": "SamplerCustomAdvanced",
-            "_meta": {"title": "SamplerCustomAdvanced"}
+        "class_type": "SaveVideo",
+        "_meta": {"title": "Save Video"}
+    },
+    "125": {
+        "inputs": {
+            "noise": ["127", 0],
+            "guider": ["129", 0],
+            "sampler": ["128", 0],
+            "sigmas": ["126", 0],
+            "latent_image": ["78", 2]
         },
-        "126": {
-            "inputs": {
-                "scheduler": "simple",
-                "steps": steps,
-                "denoise": 1,
-                "model": ["12", 0]
-            },
-            "class_type": "BasicScheduler",
-            "_meta": {"title": "BasicScheduler"}
+        "class_type": "SamplerCustomAdvanced",
+        "_meta": {"title": "SamplerCustomAdvanced"}
+    },
+    "126": {
+        "inputs": {
+            "scheduler": "simple",
+            "steps": 20,
+            "denoise": 1,
+            "model": ["12", 0]
         },
-        "127": {
-            "inputs": {
-                "noise_seed": seed
-            },
-            "class_type": "RandomNoise",
-            "_meta": {"title": "RandomNoise"}
+        "class_type": "BasicScheduler",
+        "_meta": {"title": "BasicScheduler"}
+    },
+    "127": {
+        "inputs": {
+            "noise_seed": 0
         },
-        "128": {
-            "inputs": {
-                "sampler_name": "euler"
-            },
-            "class_type": "KSamplerSelect",
-            "_meta": {"title": "KSamplerSelect"}
+        "class_type": "RandomNoise",
+        "_meta": {"title": "RandomNoise"}
+    },
+    "128": {
+        "inputs": {
+            "sampler_name": "euler"
         },
-        "129": {
-            "inputs": {
-                "cfg": cfg,
-                "model": ["130", 0],
-                "positive": ["78", 0],
-                "negative": ["78", 1]
-            },
-            "class_type": "CFGGuider",
-            "_meta": {"title": "CFGGuider"}
+        "class_type": "KSamplerSelect",
+        "_meta": {"title": "KSamplerSelect"}
+    },
+    "129": {
+        "inputs": {
+            "cfg": 1,
+            "model": ["130", 0],
+            "positive": ["78", 0],
+            "negative": ["78", 1]
         },
-        "130": {
-            "inputs": {
-                "shift": shift,
-                "model": ["12", 0]
-            },
-            "class_type": "ModelSamplingSD3",
-            "_meta": {"title": "ModelSamplingSD3"}
-        }
+        "class_type": "CFGGuider",
+        "_meta": {"title": "CFGGuider"}
+    },
+    "130": {
+        "inputs": {
+            "shift": 7,
+            "model": ["12", 0]
+        },
+        "class_type": "ModelSamplingSD3",
+        "_meta": {"title": "ModelSamplingSD3"}
     }
+}
+
+# Request parameters and the node inputs they are written to
+DEFAULT_PARAMS = {
+    "image": {"inputs": [["80", "image"]]},
+    "prompt": {"default": DEFAULT_PROMPT, "inputs": [["44", "text"]]},
+    "negative_prompt": {"default": "", "inputs": [["93", "text"]]},
+    "seed": {"default": None, "inputs": [["127", "noise_seed"]]},
+    "num_frames": {"default": 25, "inputs": [["78", "length"]]},
+    "fps": {"default": 24, "inputs": [["101", "fps"]]},
+    "steps": {"default": 20, "inputs": [["126", "steps"]]},
+    "cfg": {"default": 1, "inputs": [["129", "cfg"]]},
+    "width": {"default": 720, "inputs": [["78", "width"]]},
+    "height": {"default": 1280, "inputs": [["78", "height"]]},
+    "shift": {"default": 7, "inputs": [["130", "shift"]]},
+    "unet": {"default": DEFAULT_WORKFLOW["12"]["inputs"]["unet_name"], "inputs": [["12", "unet_name"]]},
+}
+
+# Named workflow templates: the default graph plus any JSON files in WORKFLOW_TEMPLATE_DIR
+workflow_templates = TemplateRegistry()
+workflow_templates.register(WorkflowTemplate(
+    DEFAULT_TEMPLATE, 1, DEFAULT_WORKFLOW, DEFAULT_PARAMS, "Hunyuan 1.5 image-to-video (720p, CFG-distilled)"
+))
+workflow_templates.load_directory()
+
+
+def render_template(template, overrides, conditioning_cache=True):
+    """Render a template, picking a random seed when it has one and none was given"""
+    overrides = dict(overrides)
+    if "seed" in template.params and overrides.get("seed") is None:
+        overrides["seed"] = random.randint(0, 2**32 - 1)
+    workflow = template.render(overrides)
+    
+    if CONDITIONING_CACHE and conditioning_cache and conditioning_cache_available():
+        use_conditioning_cache(workflow)
     
     return workflow
 
 
+def create_default_workflow(input_image, prompt="", negative_prompt="", seed=None, num_frames=25, fps=24, steps=20, cfg=1, width=720, height=1280, shift=7, unet=None, conditioning_cache=True):
+    """Create a default Hunyuan 1.5 Video workflow based on actual workflow structure"""
+    # Pinned: variants rely on this version's node IDs
+    template = workflow_templates.get(DEFAULT_TEMPLATE, 1)
+    return render_template(template, {
+        "image": input_image,
+        "prompt": prompt or DEFAULT_PROMPT,
+        "negative_prompt": negative_prompt,
+        "seed": seed,
+        "num_frames": num_frames,
+        "fps": fps,
+        "steps": steps,
+        "cfg": cfg,
+        "width": width,
+        "height": height,
+        "shift": shift,
+        "unet": unet or template.params["unet"]["default"]
+    }, conditioning_cache)
+
+
+# Default-workflow nodes that depend on the prompt pair, and on the seed as well;
+# everything else (model loaders, image load, CLIP vision) is shared by all variants
+PROMPT_NODES = ("44", "93", "78", "129")
+SEED_NODES = ("127", "125", "8", "101", "102")
+
+
+def get_variants(job_input):
+    """Normalize "variants" or "seeds"/"prompts" lists into per-variant inputs, or None for a single render"""
+    variants = job_input.get("variants")
+    if variants is None and ("seeds" in job_input or "prompts" in job_input):
+        seeds = job_input.get("seeds") or [job_input.get("seed")]
+        prompts = job_input.get("prompts") or [job_input.get("prompt", "")]
+        if len(seeds) > 1 and len(prompts) > 1 and len(seeds) != len(prompts):
+            raise ValueError("'seeds' and 'prompts' must have the same length when both have several entries")
+        count = max(len(seeds), len(prompts))
+        variants = [
+            {"seed": seeds[i if len(seeds) > 1 else 0], "prompt": prompts[i if len(prompts) > 1 else 0]}
+            for i in range(count)
+        ]
+    if variants is None:
+        return None
+    
+    if not isinstance(variants, list) or not variants or not all(isinstance(v, dict) for v in variants):
+        raise ValueError("'variants' must be a non-empty list of objects")
+    if len(variants) > MAX_VARIANTS:
+        raise ValueError(f"At most {MAX_VARIANTS} variants per job")
+    if job_input.get("workflow") or job_input.get("template"):
+        raise ValueError("Variants can't be combined with a custom workflow or template")
+    
+    return [
+        {
+            "seed": variant.get("seed"),
+            "prompt": variant.get("prompt", job_input.get("prompt", "")),
+            "negative_prompt": variant.get("negative_prompt", job_input.get("negative_prompt", ""))
+        }
+        for variant in variants
+    ]
+
+
+def create_variant_workflow(input_image, variants, **params):
+    """
+    One graph rendering every variant
+    
+    Returns (workflow, variant_nodes) where variant_nodes[i] is the set of node
+    IDs variant i depends on, so a failing node can be traced to its variants.
+    """
+    workflow = {}
+    variant_nodes = []
+    prompt_groups = {}
+    
+    for index, variant in enumerate(variants):
+        base = create_default_workflow(input_image, prompt=variant["prompt"],
+                                       negative_prompt=variant["negative_prompt"],
+                                       seed=variant["seed"], **params)
+        # Variants with the same prompt pair share its text encodes and guider
+        texts = (base["44"]["inputs"]["text"], base["93"]["inputs"]["text"])
+        group = prompt_groups.setdefault(texts, f"p{len(prompt_groups)}")
+        rename = {node_id: f"{group}_{node_id}" for node_id in PROMPT_NODES}
+        rename.update({node_id: f"v{index}_{node_id}" for node_id in SEED_NODES})
+        
+        for node_id, node in base.items():
+            new_id = rename.get(node_id, node_id)
+            node["inputs"] = {
+                name: [rename.get(value[0], value[0]), value[1]] if isinstance(value, list) else value
+                for name, value in node["inputs"].items()
+            }
+            workflow.setdefault(new_id, node)
+        
+        workflow[f"v{index}_102"]["inputs"]["filename_prefix"] = f"video/hunyuan_video_1.5_v{index}"
+        variant["seed"] = workflow[f"v{index}_127"]["inputs"]["noise_seed"]
+        variant_nodes.append({rename.get(node_id, node_id) for node_id in base})
+    
+    return workflow, variant_nodes
+
+
+def variant_of(node_id):
+    """Index of the variant a per-variant node ID like "v2_102" belongs to"""
+    prefix = node_id.split("_", 1)[0]
+    if prefix.startswith("v") and prefix[1:].isdigit():
+        return int(prefix[1:])
+    return None
+
+
+def summarize_variants(variants, results, failure=None, variant_nodes=None):
+    """Per-variant status: success if it produced outputs, else the error that stopped it"""
+    produced = {result.get("variant") for result in results}
+    summary = []
+    for index, variant in enumerate(variants):
+        entry = {"index": index, **variant}
+        if index in produced:
+            entry["status"] = "success"
+        elif failure is not None and variant_nodes and failure.node_id in variant_nodes[index]:
+            entry["status"] = "error"
+            entry["error"] = str(failure)
+        elif failure is not None:
+            entry["status"] = "error"
+            entry["error"] = "Not rendered: the job stopped when another variant failed"
+        else:
+            entry["status"] = "error"
+            entry["error"] = "No output files generated"
+        summary.append(entry)
+    return summary
+
+
+# Nodes whose CLIP output depends only on their own inputs (the files they load)
+CLIP_LOADERS = ("CLIPLoader", "DualCLIPLoader", "TripleCLIPLoader", "QuadrupleCLIPLoader", "CheckpointLoaderSimple")
+
+
+def canonical_subgraph(workflow, link):
+    """JSON-able form of the output a link points at, with everything upstream of it inlined"""
+    node_id, output = link
+    node = workflow[node_id]
+    inputs = {
+        name: canonical_subgraph(workflow, value) if is_link(value) and value[0] in workflow else value
+        for name, value in sorted(node.get("inputs", {}).items())
+    }
+    return {"class_type": node["class_type"], "inputs": inputs, "output": output}
+
+
+def is_link(value):
+    return isinstance(value, list) and len(value) == 2 and isinstance(value[0], str) and isinstance(value[1], int)
+
+
+def use_conditioning_cache(workflow):
+    """
+    Swap CLIPTextEncode nodes fed straight from a CLIP loader for CachedCLIPTextEncode,
+    keyed by a hash of that loader; nodes behind LoRAs or other CLIP modifiers are left alone
+    """
+    for node in workflow.values():
+        if node.get("class_type") != "CLIPTextEncode":
+            continue
+        clip = node["inputs"].get("clip")
+        if not is_link(clip) or workflow.get(clip[0], {}).get("class_type") not in CLIP_LOADERS:
+            continue
+        canonical = json.dumps(canonical_subgraph(workflow, clip), sort_keys=True)
+        node["class_type"] = "CachedCLIPTextEncode"
+        node["inputs"]["encoder"] = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return workflow
+
+
+def conditioning_cache_available():
+    """Whether ComfyUI has CachedCLIPTextEncode; a bind-mounted custom_nodes folder can hide it"""
+    try:
+        return "CachedCLIPTextEncode" in object_info.get()
+    except Exception as e:
+        print(f"Could not check for the CachedCLIPTextEncode node: {str(e)}")
+        return False
+
+
+def check_templates():
+    """Validate every registered template against ComfyUI's node definitions; returns the broken ones"""
+    broken = {}
+    try:
+        for template in workflow_templates.templates():
+            node_errors = object_info.validate(template.base_workflow())
+            if node_errors:
+                broken[template.key] = node_errors
+                print(f"Workflow template {template.key} is invalid: {summarize_errors(node_errors)}")
+    except Exception as e:
+        print(f"Could not check workflow templates against /object_info: {str(e)}")
+    return broken
+
+
+def warm_up():
+    """
+    Run a minimal render so every loader node has its model in memory
+    
+    Skipped when the marker shows this ComfyUI process was already warmed.
+    Returns {node_id: seconds} for the warm-up run, or None if skipped/failed.
+    """
+    pid = supervisor.pid
+    try:
+        with open(WARMUP_MARKER) as f:
+            if json.load(f).get("comfyui_pid") == pid:
+                print("ComfyUI already warm, skipping warm-up")
+                return None
+    except (OSError, ValueError):
+        pass
+    
+    print("Warming up models...")
+    started = time.time()
+    workflow = create_default_workflow(
+        input_image=upload_image(WARMUP_IMAGE),
+        prompt="warm-up",
+        seed=0,
+        num_frames=1,
+        fps=1,
+        steps=1,
+        width=64,
+        height=64,
+        # A cached warm-up prompt would skip the lazy clip input and leave the text encoders unloaded
+        conditioning_cache=False
+    )
+    
+    tracker = CompletionTracker(comfy.base_url, comfy.get_history)
+    tracker.connect()
+    try:
+        queue_result = comfy.queue_prompt(workflow, client_id=tracker.client_id)
+        prompt_id = queue_result.get("prompt_id")
+        if not prompt_id:
+            print(f"Warm-up could not be queued: {queue_result.get('error', queue_result)}")
+            return None
+        
+        progress = ProgressReporter(workflow, prompt_id)
+        for event in tracker.events(prompt_id, timeout=WARMUP_TIMEOUT):
+            if event["type"] == "completed":
+                history_entry = event["data"]["history"]
+            else:
+                progress.update(event)
+        node_seconds = progress.finish()
+    except Exception as e:
+        print(f"Warm-up failed, first job will load models instead: {e}")
+        return None
+    finally:
+        tracker.close()
+    
+    # The warm-up video itself is of no use
+    for output in get_output_files(history_entry):
+        path = get_output_path(output["filename"], output["subfolder"], output["type_name"])
+        if os.path.exists(path):
+            os.remove(path)
+    
+    elapsed = time.time() - started
+    for node_id, seconds in sorted(node_seconds.items(), key=lambda item: -item[1]):
+        title = workflow.get(node_id, {}).get("_meta", {}).get("title", node_id)
+        print(f"  {title}: {seconds:.1f}s")
+    print(f"Warm-up complete in {elapsed:.1f}s")
+    
+    try:
+        with open(WARMUP_MARKER, "w") as f:
+            json.dump({"comfyui_pid": pid, "seconds": round(elapsed, 1), "nodes": node_seconds}, f)
+    except OSError as e:
+        print(f"Could not write warm-up marker: {e}")
+    
+    return node_seconds
+
+
 def handler(job):
     """
     RunPod Serverless Handler Function
@@ -355,20 +778,109 @@ def handler(job):
             "cfg": 1,  # Optional, default 1 (for distilled model)
             "width": 720,  # Optional, default 720
             "height": 1280,  # Optional, default 1280
-            "shift": 7  # Optional, default 7
+            "shift": 7,  # Optional, default 7
+            "model": "720p_cfg_distilled",  # Optional, a variant from models_manifest.json
+            "accel": "off"  # Optional, step caching mode (see acceleration.py)
         }
     }
     
     Returns:
     - Success: {"status": "success", "prompt_id": str, "outputs": list}
     - Error: {"error": str}
+    
+    See stream_handler() for the streaming variant that also yields progress.
     """
+    events = run_job(job)
+    while True:
+        try:
+            next(events)
+        except StopIteration as done:
+            return done.value
+
+
+def stream_handler(job):
+    """
+    Streaming RunPod handler
+    
+    Yields progress events while the workflow runs, then the same final
+    result handler() would return. Enable with STREAM_PROGRESS=1.
+    """
+    result = yield from run_job(job)
+    yield result
+
+
+async def async_handler(job):
+    """Concurrency-safe handler: runs handler() on a worker thread"""
+    try:
+        return await asyncio.to_thread(handler, job)
+    except asyncio.CancelledError:
+        # The worker thread can't be killed, but it returns as soon as ComfyUI drops the prompt
+        await asyncio.to_thread(canceller.cancel_job, job.get("id"), "job cancelled")
+        raise
+
+
+async def async_stream_handler(job):
+    """Concurrency-safe streaming handler: drives stream_handler() on worker threads"""
+    events = stream_handler(job)
+    done = object()
+    while True:
+        try:
+            event = await asyncio.to_thread(next, events, done)
+        except asyncio.CancelledError:
+            await asyncio.to_thread(canceller.cancel_job, job.get("id"), "job cancelled")
+            raise
+        if event is done:
+            break
+        yield event
+
+
+def concurrency_modifier(current_concurrency):
+    """Tell RunPod how many jobs this worker may run at once"""
+    return MAX_CONCURRENCY
+
+
+def worker_config():
+    """
+    runpod.serverless.start config. The handlers are always the async ones,
+    even for one job at a time: a sync handler blocks RunPod's event loop, so
+    a cancelled job's task.cancel() would never reach it and it would render on
+    """
+    config = {"handler": async_handler}
+    if STREAM_PROGRESS:
+        # Progress goes to /stream; /run and /runsync get the aggregated list
+        config = {"handler": async_stream_handler, "return_aggregate_stream": True}
+    if MAX_CONCURRENCY > 1:
+        config["concurrency_modifier"] = concurrency_modifier
+    return config
+
+
+def run_job(job):
+    """Run a job, yielding progress events and returning the final result with its timings"""
+    timer = JobTimer()
+    job_memory = residency.begin()
+    try:
+        result = yield from process_job(job, timer)
+    finally:
+        memory = residency.end(job_memory)
+    timer.finish()
+    result["timings"] = timer.snapshot()
+    if memory:
+        result["memory"] = memory
+    metrics.observe(timer, result.get("status", "error"), job_id=job.get("id"))
+    return result
+
+
+def process_job(job, timer):
+    """Run a job, recording each stage's duration on timer"""
     print("=" * 60)
     print("HANDLER CALLED - NEW REQUEST RECEIVED")
     print(f"Job ID: {job.get('id', 'unknown')}")
     print("=" * 60)
     
     job_input = job.get("input", {})
+    # Files this job holds; released (and deleted if unshared) when it ends
+    job_files = []
+    estimate = None
     
     try:
         # Validate input
@@ -378,108 +890,360 @@ def handler(job):
         if not image_input and not image_url:
             return {"error": "No image or image_url provided. Please provide either 'image' (base64) or 'image_url' (URL string)."}
         
+        try:
+            variants = get_variants(job_input)
+        except ValueError as e:
+            return {"error": str(e)}
+        
+        # Step caching; custom workflows add their own cache nodes
+        if job_input.get("accel", "off") != "off" and job_input.get("workflow"):
+            return {"error": "'accel' can't be combined with a custom workflow; add the cache node to it instead"}
+        try:
+            accel = None if job_input.get("workflow") else accel_mode(job_input.get("accel"))
+        except ValueError as e:
+            return {"error": str(e)}
+        
+        # Model variant: its size, steps, cfg and shift are the defaults for this job
+        if job_input.get("model") and job_input.get("workflow"):
+            return {"error": "'model' can't be combined with a custom workflow; set its UNETLoader instead"}
+        try:
+            model = model_catalog.get(job_input.get("model"))
+        except ModelError as e:
+            return {"error": str(e)}
+        
+        # Named template: check the overrides now, before any download or upload
+        template = None
+        if job_input.get("template"):
+            if job_input.get("workflow"):
+                return {"error": "Send either 'workflow' or 'template', not both"}
+            if not isinstance(job_input.get("params", {}), dict):
+                return {"error": "'params' must be an object of template parameter overrides"}
+            try:
+                template = workflow_templates.get(job_input["template"], job_input.get("template_version"))
+                # Only an explicit model overrides the template's own defaults
+                template_overrides = {}
+                if job_input.get("model"):
+                    if "unet" not in template.params:
+                        raise TemplateError(f"{template.key} has no 'unet' parameter, so it can't select a model")
+                    template_overrides = {key: model[key] for key in RENDER_DEFAULTS if key in template.params}
+                    template_overrides["unet"] = model["unet"]
+                template_overrides.update(job_input.get("params", {}))
+                template_params = template.resolve({**template_overrides, "image": ""})
+            except TemplateError as e:
+                return {"error": str(e)}
+        
+        # Built-in workflow parameters: request values over the model's defaults
+        params = None
+        if template is None and not job_input.get("workflow"):
+            params = {
+                "num_frames": job_input.get("num_frames", 25),
+                "fps": job_input.get("fps", 24),
+                **{key: job_input.get(key, model[key]) for key in RENDER_DEFAULTS},
+                "unet": model["unet"]
+            }
+        
         print(f"Processing job: {job.get('id', 'unknown')}")
         
+        # Render parameters of the built-in workflow or template; custom workflows have none
+        sizing = template_params if template is not None else params
+        
+        # Reject broken custom graphs from the cached /object_info before doing any work for them
+        if job_input.get("workflow") and VALIDATE_WORKFLOWS:
+            try:
+                with timer.span("validate"):
+                    node_errors = object_info.validate(job_input["workflow"])
+            except Exception as e:
+                # ComfyUI will still validate it when it's queued
+                print(f"Could not validate workflow against /object_info: {str(e)}")
+                node_errors = {}
+            if node_errors:
+                return {"error": f"Invalid workflow: {summarize_errors(node_errors)}", "node_errors": node_errors}
+        
+        # Some accel modes come from custom nodes that may not be installed
+        if accel:
+            cache_node = ACCEL_MODES[accel]["class_type"]
+            try:
+                installed = cache_node in object_info.get() or cache_node in object_info.get(refresh=True)
+            except Exception as e:
+                print(f"Could not check for the {cache_node} node: {str(e)}")
+                installed = True
+            if not installed:
+                return {"error": f"Accel mode '{accel}' needs the {cache_node} node, which ComfyUI doesn't have"}
+        
+        # Estimate render time before touching the GPU: it sets the timeout and
+        # rejects jobs over budget. Custom workflows and templates without size
+        # parameters can't be sized, so they keep the fixed timeout
+        job_timeout = 600
+        if sizing and all(key in sizing for key in ("num_frames", "width", "height", "steps")):
+            gpu = current_gpu()
+            units = work_units(
+                sizing["num_frames"], sizing["width"], sizing["height"], sizing["steps"]
+            ) * (len(variants) if variants else 1)
+            estimate = cost_model.estimate(gpu, units)
+            if JOB_BUDGET_SECONDS and estimate > JOB_BUDGET_SECONDS:
+                result = {
+                    "error": f"Job is estimated to take {estimate:.0f}s on {gpu}, over the {JOB_BUDGET_SECONDS:.0f}s budget",
+                    "estimated_seconds": round(estimate, 1)
+                }
+                estimate = None
+                return result
+            # Jobs already admitted on this worker run first in ComfyUI's queue
+            ahead = cost_model.begin(estimate)
+            job_timeout = cost_model.timeout(estimate + ahead)
+            print(f"Estimated {estimate:.0f}s on {gpu} ({ahead:.0f}s queued ahead), timeout {job_timeout:.0f}s")
+        
         # Handle URL or base64 image
+        fetch_info = None
+        if not image_url and isinstance(image_input, str) and (image_input.startswith("http://") or image_input.startswith("https://")):
+            # Fallback to image field if it's a URL
+            image_url = image_input
         if image_url:
             print(f"Downloading image from URL: {image_url}")
             try:
-                response = requests.get(image_url, timeout=30)
-                response.raise_for_status()
-                image_data = response.content
-            except requests.RequestException as e:
-                return {"error": f"Failed to download image from URL: {str(e)}"}
-        elif isinstance(image_input, str) and (image_input.startswith("http://") or image_input.startswith("https://")):
-            # Fallback to image field if it's a URL
-            print(f"Downloading image from URL (image field): {image_input}")
-            try:
-                response = requests.get(image_input, timeout=30)
-                response.raise_for_status()
-                image_data = response.content
-            except requests.RequestException as e:
-                return {"error": f"Failed to download image from URL: {str(e)}"}
+                with timer.span("fetch"):
+                    image_data, fetch_info = image_fetcher.fetch(image_url)
+                print(f"Fetched image ({fetch_info['source']}, {fetch_info['bytes']} bytes, {fetch_info['ms']}ms)")
+            except FetchError as e:
+                return {"error": str(e)}
         else:
             # Base64 encoded image
             image_data = image_input
         
-        # Upload image to ComfyUI
+        # Decode and validate once on the CPU; workflows with a known render size
+        # also get the image cropped to it so ComfyUI doesn't have to scale it
         try:
-            input_filename = upload_image(image_data)
-            print(f"Uploaded image: {input_filename}")
-        except Exception as e:
-            return {"error": f"Failed to upload image: {str(e)}"}
+            with timer.span("decode"):
+                image_bytes = decode_image(image_data)
+                if PREPROCESS_IMAGES and sizing and "width" in sizing and "height" in sizing:
+                    image_bytes, image_info = preprocess_image(image_bytes, sizing["width"], sizing["height"])
+                    print(f"Preprocessed image {image_info['source_size']} -> {image_info['size']}")
+                elif PREPROCESS_IMAGES:
+                    validate_image(image_bytes)
+        except (ImageError, ValueError) as e:
+            return {"error": f"Invalid input image: {str(e)}"}
+        
+        # Uploads are named after their content, so the graph and its cache key
+        # don't need the file to be in ComfyUI's input folder yet
+        input_filename = content_filename(image_bytes)
         
         # Get or create workflow
         workflow = job_input.get("workflow")
-        if not workflow:
+        variant_nodes = None
+        if template is not None:
+            overrides = {**template_overrides, "image": input_filename}
+            explicit_seed = "seed" not in template.params or overrides.get("seed") is not None
             try:
-                workflow = create_default_workflow(
-                    input_image=input_filename,
-                    prompt=job_input.get("prompt", ""),
-                    negative_prompt=job_input.get("negative_prompt", ""),
-                    seed=job_input.get("seed"),
-                    num_frames=job_input.get("num_frames", 25),
-                    fps=job_input.get("fps", 24),
-                    steps=job_input.get("steps", 20),
-                    cfg=job_input.get("cfg", 1),
-                    width=job_input.get("width", 720),
-                    height=job_input.get("height", 1280),
-                    shift=job_input.get("shift", 7)
-                )
+                workflow = render_template(template, overrides)
+            except TemplateError as e:
+                return {"error": f"Failed to create workflow: {str(e)}"}
+            print(f"Rendered template {template.key} ({len(workflow)} nodes)")
+        elif not workflow:
+            try:
+                if variants:
+                    explicit_seed = all(variant["seed"] is not None for variant in variants)
+                    workflow, variant_nodes = create_variant_workflow(input_filename, variants, **params)
+                    print(f"Rendering {len(variants)} variants in one workflow ({len(workflow)} nodes)")
+                else:
+                    explicit_seed = job_input.get("seed") is not None
+                    workflow = create_default_workflow(
+                        input_image=input_filename,
+                        prompt=job_input.get("prompt", ""),
+                        negative_prompt=job_input.get("negative_prompt", ""),
+                        seed=job_input.get("seed"),
+                        **params
+                    )
             except Exception as e:
                 return {"error": f"Failed to create workflow: {str(e)}"}
+        else:
+            # Uploads are content-addressed, so the graph can't know the name in advance
+            workflow = bind_input_image(workflow, input_filename)
+            explicit_seed = True
+        
+        if accel and not apply_accel(workflow, accel):
+            return {"error": f"Accel mode '{accel}' needs a ModelSamplingSD3 node to attach to"}
+        
+        # Long or high-resolution clips get a tiled VAE decode sized to this GPU's memory
+        decode_plan = None
+        if sizing and all(key in sizing for key in ("num_frames", "width", "height")):
+            vram_total = residency.last["vram_total"] if residency.last else None
+            decode_plan = plan_decode(sizing["width"], sizing["height"], sizing["num_frames"], vram_total)
+            if apply_decode_plan(workflow, decode_plan):
+                print(f"Tiled VAE decode: {decode_plan['tile_size']}px x {decode_plan['temporal_size']} frames "
+                      f"(full decode ~{decode_plan['estimated_mb']}MB, budget {decode_plan.get('budget_mb')}MB)")
+        
+        # Identical input, graph and explicit seed render identical frames, so a
+        # cached result is returned before ComfyUI is started, checked or written to
+        cache_key = None
+        cache_status = "disabled"
+        if result_cache is not None:
+            if job_input.get("cache", True) is False:
+                cache_status = "bypass"
+            elif not explicit_seed:
+                cache_status = "random_seed"
+            else:
+                cache_key = result_cache.key(image_bytes, workflow)
+                cached = result_cache.get(cache_key)
+                cache_status = "hit" if cached else "miss"
+                print(f"Result cache {cache_status}: {cache_key[:16]}")
+                if cached:
+                    results = []
+                    for output in cached:
+                        with timer.span("store_output"):
+                            stored = output_sink.store(output.pop("path"), job_id=job.get("id"))
+                        results.append({**output, **stored})
+                    response = {
+                        "status": "success",
+                        "outputs": results,
+                        "result_cache": {"status": cache_status, **result_cache.snapshot()}
+                    }
+                    if variants:
+                        response["variants"] = summarize_variants(variants, results)
+                    return response
+        
+        # Bring ComfyUI back first if it died since the last job
+        if supervisor.managed and not supervisor.ensure_running():
+            return comfy_error("ComfyUI is not running and could not be restarted")
+        
+        # Never queue behind a cancelled prompt ComfyUI hasn't let go of yet
+        if not canceller.confirm():
+            return comfy_error("ComfyUI is still busy with a cancelled job, try again shortly")
         
-        # Queue the workflow
-        print("Queueing workflow in ComfyUI...")
+        # Upload image to ComfyUI, holding it before the write so no cleanup can race us
         try:
-            queue_result = queue_prompt(workflow)
-            
-            if "error" in queue_result:
-                return {"error": f"Failed to queue workflow: {queue_result['error']}"}
-            
-            prompt_id = queue_result.get("prompt_id")
-            if not prompt_id:
-                return {"error": "No prompt_id returned from ComfyUI"}
-                
-            print(f"Workflow queued with ID: {prompt_id}")
+            input_path = os.path.join(COMFYUI_PATH, "input", input_filename)
+            retention.acquire(input_path)
+            job_files.append(input_path)
+            with timer.span("upload"):
+                upload_image(image_bytes, input_filename)
+            print(f"Uploaded image: {input_filename}")
         except Exception as e:
-            return {"error": f"Failed to queue workflow: {str(e)}"}
+            return {"error": f"Failed to upload image: {str(e)}"}
         
-        # Wait for completion
-        print("Waiting for workflow to complete...")
+        # Subscribe to ComfyUI events before queueing so completion is pushed to us
+        request_stats = RequestStats()
+        tracker = CompletionTracker(comfy.base_url, functools.partial(comfy.get_history, stats=request_stats))
+        tracker.connect()
+        job_key = job.get("id") or uuid.uuid4().hex
+        prompt_id = None
+        prompt_done = False
+        progress = None
+        execute_seconds = None
+        unet = workflow_unet(workflow)
+        scheduled = None
         try:
-            history_entry = wait_for_completion(prompt_id, timeout=600)
-        except TimeoutError as e:
-            return {"error": f"Workflow execution timed out: {str(e)}"}
-        except Exception as e:
-            return {"error": f"Error during workflow execution: {str(e)}"}
+            # Wait for our model's turn so jobs on one model aren't interleaved with another's
+            if unet:
+                with timer.span("schedule"):
+                    scheduled = model_scheduler.acquire(unet)
+                if scheduled["switched"]:
+                    print(f"Switching diffusion model to {unet}")
+            
+            # Queue the workflow
+            print("Queueing workflow in ComfyUI...")
+            try:
+                with timer.span("queue"):
+                    queue_result = comfy.queue_prompt(workflow, client_id=tracker.client_id, stats=request_stats)
+                
+                if "error" in queue_result:
+                    return comfy_error(f"Failed to queue workflow: {queue_result['error']}")
+                
+                prompt_id = queue_result.get("prompt_id")
+                if not prompt_id:
+                    return {"error": "No prompt_id returned from ComfyUI"}
+                    
+                print(f"Workflow queued with ID: {prompt_id}")
+                canceller.track(job_key, prompt_id)
+            except Exception as e:
+                return comfy_error(f"Failed to queue workflow: {str(e)}")
+            
+            yield {"type": "queued", "prompt_id": prompt_id}
+            
+            # Wait for completion, relaying ComfyUI progress as it arrives
+            print("Waiting for workflow to complete...")
+            progress = ProgressReporter(workflow, prompt_id)
+            failure = None
+            # Queue time runs until ComfyUI's first event for the prompt; without
+            # the socket there are none, so everything after the POST counts as execution
+            waiting_from = time.perf_counter()
+            started_at = None
+            try:
+                for event in tracker.events(prompt_id, timeout=job_timeout):
+                    if started_at is None and event["type"] != "completed":
+                        started_at = time.perf_counter()
+                        timer.add("queue", started_at - waiting_from)
+                    if event["type"] == "completed":
+                        history_entry = event["data"]["history"]
+                        prompt_done = True
+                    else:
+                        update = progress.update(event)
+                        if update:
+                            yield update
+            except TimeoutError as e:
+                return comfy_error(f"Workflow execution timed out: {str(e)}")
+            except WorkflowError as e:
+                prompt_done = True
+                if not variants:
+                    return comfy_error(f"Error during workflow execution: {str(e)}")
+                # Keep whatever the other variants rendered before the failure
+                print(f"Variant workflow failed at node {e.node_id}: {str(e)}")
+                failure = e
+                history_entry = comfy.get_history(prompt_id, stats=request_stats).get(prompt_id, {})
+            except Exception as e:
+                return comfy_error(f"Error during workflow execution: {str(e)}")
+        finally:
+            if progress is not None:
+                execute_seconds = time.perf_counter() - (started_at or waiting_from)
+                timer.add("execute", execute_seconds)
+                timer.add_nodes(progress.finish(), workflow)
+            tracker.close()
+            if scheduled is not None:
+                model_scheduler.release()
+            canceller.untrack(job_key)
+            if prompt_id and not prompt_done:
+                # Timed out, errored or the job was cancelled: don't leave it rendering
+                canceller.cancel(prompt_id, "job ended before its prompt finished")
+        
+        # Wall-clock render time: node timings only exist with the websocket, and
+        # cached steps would make the work units look cheaper than they are
+        if estimate is not None and failure is None and not accel and execute_seconds:
+            cost_model.record(gpu, units, execute_seconds)
         
         # Get output files
         try:
-            output_files = get_output_files(history_entry)
+            with timer.span("collect"):
+                output_files = get_output_files(history_entry)
             print(f"Generated {len(output_files)} output files")
             
             if not output_files:
+                if failure is not None:
+                    response = comfy_error(f"Error during workflow execution: {str(failure)}")
+                    response["variants"] = summarize_variants(variants, [], failure, variant_nodes)
+                    return response
                 return {"error": "No output files generated"}
         except Exception as e:
             return {"error": f"Failed to get output files: {str(e)}"}
         
         # Prepare results
         results = []
+        cacheable = []
         for output in output_files:
             try:
-                file_data = get_file_as_base64(
+                filepath = get_output_path(
                     output["filename"],
                     output["subfolder"],
                     output["type_name"]
                 )
                 
-                if file_data:
-                    results.append({
-                        "type": output["type"],
-                        "filename": output["filename"],
-                        "data": file_data
-                    })
+                if os.path.exists(filepath):
+                    retention.acquire(filepath)
+                    job_files.append(filepath)
+                    result = {"type": output["type"], "filename": output["filename"]}
+                    if variants:
+                        result["variant"] = variant_of(output["node_id"])
+                    cacheable.append({**result, "path": filepath})
+                    with timer.span("store_output"):
+                        stored = output_sink.store(filepath, job_id=job.get("id"))
+                    results.append({**result, **stored})
                 else:
                     print(f"Warning: Could not read file {output['filename']}")
             except Exception as e:
@@ -489,17 +1253,50 @@ def handler(job):
         if not results:
             return {"error": "Failed to read any output files"}
         
-        return {
+        if cache_key and failure is None and len(cacheable) == len(output_files):
+            try:
+                result_cache.put(cache_key, cacheable)
+            except OSError as e:
+                print(f"Warning: could not store result in cache: {str(e)}")
+        
+        response = {
             "status": "success",
             "prompt_id": prompt_id,
-            "outputs": results
+            "outputs": results,
+            "comfyui_requests": request_stats.snapshot()
         }
+        if estimate is not None:
+            response["estimated_seconds"] = round(estimate, 1)
+        if fetch_info:
+            response["image_fetch"] = fetch_info
+        if decode_plan is not None:
+            response["vae_decode"] = decode_plan
+        if accel:
+            response["accel"] = accel
+        if scheduled is not None:
+            response["model"] = {
+                "variant": model_catalog.key_for(unet),
+                "unet": unet,
+                **scheduled,
+                "scheduler": model_scheduler.snapshot()
+            }
+        if variants:
+            response["variants"] = summarize_variants(variants, results, failure, variant_nodes)
+            if any(variant["status"] == "error" for variant in response["variants"]):
+                response["status"] = "partial"
+        if result_cache is not None:
+            response["result_cache"] = {"status": cache_status, **result_cache.snapshot()}
+        return response
         
     except Exception as e:
         print(f"Unhandled error in handler: {str(e)}")
         import traceback
         traceback.print_exc()
         return {"error": f"Internal error: {str(e)}"}
+    finally:
+        retention.finish(job_files)
+        if estimate is not None:
+            cost_model.end(estimate)
 
 
 if __name__ == "__main__":
@@ -508,16 +1305,52 @@ if __name__ == "__main__":
     print("=" * 60)
     
     # Start ComfyUI server
+    boot_started = time.time()
     if not start_comfyui():
         print("Failed to start ComfyUI. Exiting.")
         sys.exit(1)
+    record_cold_start_phase("comfyui_start", time.time() - boot_started)
+    
+    # Load models before taking jobs so the worker only reports ready once warm
+    if WARMUP:
+        warmup_started = time.time()
+        warm_up()
+        record_cold_start_phase("warmup", time.time() - warmup_started)
+    report_cold_start()
+    
+    # Fetches /object_info once, so the first custom workflow is validated from cache
+    check_templates()
+    if CONDITIONING_CACHE and not conditioning_cache_available():
+        print("ComfyUI has no CachedCLIPTextEncode node, encoding prompts with plain CLIPTextEncode")
+    
+    # Age/size limits for ComfyUI's input and output folders on long-lived workers
+    retention.start()
+    
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+    
+    # Samples memory during jobs and unloads models after RESIDENCY_IDLE_SECONDS if configured
+    residency.start()
+    
+    # On shutdown, stop whatever we were rendering rather than leaving it to run out
+    def handle_sigterm(signum, frame):
+        print("SIGTERM received, cancelling running prompts")
+        canceller.cancel_all("worker shutting down")
+        residency.stop()
+        stop_comfyui()
+        sys.exit(0)
+    
+    signal.signal(signal.SIGTERM, handle_sigterm)
     
     try:
         # Start RunPod serverless worker
         print("Starting RunPod serverless worker...")
-        print(f"Handler function: {handler}")
-        print(f"Handler callable: {callable(handler)}")
-        runpod.serverless.start({"handler": handler})
+        config = worker_config()
+        if MAX_CONCURRENCY > 1:
+            print(f"Running up to {MAX_CONCURRENCY} jobs concurrently")
+        print(f"Handler function: {config['handler']}")
+        print(f"Handler callable: {callable(config['handler'])}")
+        runpod.serverless.start(config)
     except KeyboardInterrupt:
         print("Received shutdown signal")
     except Exception as e:
@@ -0,0 +1,193 @@
+"""
+Image URL fetcher
+Streams input images over a pooled session with a size cap, and keeps an
+on-disk LRU cache revalidated with ETag / Last-Modified, so clients that
+resubmit the same URL usually only pay for a 304
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+IMAGE_FETCH_MAX_BYTES = int(os.environ.get("IMAGE_FETCH_MAX_BYTES", str(50 * 1024 * 1024)))
+IMAGE_FETCH_TIMEOUT = float(os.environ.get("IMAGE_FETCH_TIMEOUT", "30"))
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", "/tmp/image_cache")
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+READ_BLOCK = 64 * 1024
+
+
+class FetchError(Exception):
+    """The image URL couldn't be fetched or broke a limit"""
+
+
+class ImageFetcher:
+    """Download image URLs with a byte limit and a conditional-request disk cache"""
+
+    def __init__(self, cache_dir=IMAGE_CACHE_DIR, max_bytes=IMAGE_FETCH_MAX_BYTES,
+                 cache_max_bytes=IMAGE_CACHE_MAX_BYTES, timeout=IMAGE_FETCH_TIMEOUT, pool_size=8):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.cache_max_bytes = cache_max_bytes
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self.fetches = 0
+        self.revalidated = 0
+        self.bytes_downloaded = 0
+        self.total_ms = 0.0
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.body", f"{base}.json"
+
+    def _cached(self, url):
+        """(meta, body_path) for a cached copy of url, or (None, None)"""
+        if not self.cache_dir:
+            return None, None
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get("url") != url or os.path.getsize(body_path) != meta.get("size"):
+                return None, None
+        except (OSError, ValueError):
+            return None, None
+        return meta, body_path
+
+    def fetch(self, url):
+        """Return (image bytes, info) where info has source, bytes and ms"""
+        started = time.perf_counter()
+        meta, body_path = self._cached(url)
+
+        try:
+            data, source = self._get(url, meta, body_path)
+        except OSError as e:
+            # The body was evicted or replaced between the lookup and the 304
+            print(f"Cached image for {url} is gone ({str(e)}), downloading it again")
+            data, source = self._get(url, None, None)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.fetches += 1
+            self.total_ms += elapsed_ms
+            if source == "cache":
+                self.revalidated += 1
+            else:
+                self.bytes_downloaded += len(data)
+
+        return data, {"source": source, "bytes": len(data), "ms": round(elapsed_ms, 1)}
+
+    def _get(self, url, meta, body_path):
+        """(data, source), revalidating the cached copy described by meta if there is one"""
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                if response.status_code == 304 and meta:
+                    with open(body_path, "rb") as f:
+                        data = f.read()
+                    if len(data) != meta.get("size"):
+                        raise OSError(f"cached body is {len(data)} bytes, expected {meta.get('size')}")
+                    # Body mtime doubles as the LRU timestamp
+                    os.utime(body_path)
+                    return data, "cache"
+                response.raise_for_status()
+                data = self._read_limited(url, response)
+                self._store(url, response, data)
+                return data, "network"
+        except requests.RequestException as e:
+            raise FetchError(f"Failed to download image from URL: {str(e)}") from e
+
+    def _read_limited(self, url, response):
+        """Read the body, failing as soon as it is known to exceed max_bytes"""
+        length = response.headers.get("Content-Length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            raise FetchError(f"Image at {url} is {int(length)} bytes, over the {self.max_bytes} byte limit")
+
+        chunks = []
+        received = 0
+        for chunk in response.iter_content(READ_BLOCK):
+            received += len(chunk)
+            if received > self.max_bytes:
+                raise FetchError(f"Image at {url} is over the {self.max_bytes} byte limit")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def _store(self, url, response, data):
+        """Cache the body if the server gave us a validator to revalidate it with"""
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not self.cache_dir or not (etag or last_modified):
+            return
+        if "no-store" in response.headers.get("Cache-Control", ""):
+            return
+
+        body_path, meta_path = self._paths(url)
+        meta = {"url": url, "etag": etag, "last_modified": last_modified, "size": len(data)}
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            suffix = uuid.uuid4().hex
+            with open(f"{body_path}.{suffix}.tmp", "wb") as f:
+                f.write(data)
+            with open(f"{meta_path}.{suffix}.tmp", "w") as f:
+                json.dump(meta, f)
+            os.replace(f"{body_path}.{suffix}.tmp", body_path)
+            os.replace(f"{meta_path}.{suffix}.tmp", meta_path)
+        except OSError as e:
+            print(f"Warning: could not cache image from {url}: {str(e)}")
+            return
+        self.evict()
+
+    def evict(self):
+        """Drop least-recently-used bodies until the cache fits in cache_max_bytes"""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(".body"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.cache_max_bytes:
+                break
+            for stale in (path, f"{path[:-len('.body')]}.json"):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+            total -= size
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "fetches": self.fetches,
+                "revalidated": self.revalidated,
+                "bytes_downloaded": self.bytes_downloaded,
+                "total_ms": round(self.total_ms, 1),
+            }
+
+    def close(self):
+        self.session.close()
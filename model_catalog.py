@@ -0,0 +1,153 @@
+"""
+Diffusion model variants and model-aware job scheduling
+The catalog in models_manifest.json names each UNet variant with its render
+defaults; requests pick one by key. ModelScheduler orders concurrent jobs'
+prompts so jobs for the same model run back to back instead of swapping UNets
+"""
+
+import collections
+import json
+import os
+import threading
+import time
+
+DEFAULT_MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models_manifest.json")
+# Variants this worker provisions and serves: comma-separated keys or "all"; the default variant is always on
+MODEL_VARIANTS = os.environ.get("MODEL_VARIANTS", "")
+# Longest a job waits for other models' jobs before its own model gets a turn (seconds)
+SCHEDULER_MAX_WAIT = float(os.environ.get("SCHEDULER_MAX_WAIT", "120"))
+# Diffusion models assumed to stay resident in ComfyUI at once; switching to one of them isn't a reload
+MODEL_LRU_SIZE = int(os.environ.get("MODEL_LRU_SIZE", "1"))
+
+RENDER_DEFAULTS = ("width", "height", "steps", "cfg", "shift")
+
+
+class ModelError(ValueError):
+    """Unknown or disabled model variant"""
+
+
+def enabled_variants(manifest, selection=MODEL_VARIANTS):
+    """Keys of the variants turned on by selection, default variant first"""
+    variants = manifest.get("variants", {})
+    default = manifest.get("default_variant")
+    if selection.strip() == "all":
+        keys = list(variants)
+    else:
+        keys = [key.strip() for key in selection.split(",") if key.strip()]
+    unknown = [key for key in keys if key not in variants]
+    if unknown:
+        raise ModelError(f"Unknown model variant(s) {', '.join(unknown)}; available: {', '.join(variants)}")
+    return [default] + [key for key in keys if key != default] if default else keys
+
+
+def workflow_unet(workflow):
+    """unet_name of the workflow's diffusion model loader, or None if it has none"""
+    for node in workflow.values():
+        if node.get("class_type") == "UNETLoader":
+            return node.get("inputs", {}).get("unet_name")
+    return None
+
+
+class ModelCatalog:
+    """Enabled model variants by key"""
+
+    def __init__(self, manifest_path=DEFAULT_MANIFEST, selection=MODEL_VARIANTS):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        self.variants = manifest.get("variants", {})
+        self.default = manifest.get("default_variant")
+        self.enabled = enabled_variants(manifest, selection)
+
+    def get(self, key=None):
+        """The variant's entry (with its key), the default one if key is None"""
+        key = key or self.default
+        if key not in self.variants:
+            raise ModelError(f"Unknown model '{key}'; available: {', '.join(self.enabled)}")
+        if key not in self.enabled:
+            raise ModelError(f"Model '{key}' is not provisioned on this worker; available: {', '.join(self.enabled)}")
+        return {"key": key, **self.variants[key]}
+
+    def key_for(self, unet):
+        """Key of the variant that loads this UNet file, or None"""
+        for key, variant in self.variants.items():
+            if variant.get("unet") == unet:
+                return key
+        return None
+
+
+class ModelScheduler:
+    """
+    Decide when a job may queue its prompt in ComfyUI
+
+    Jobs for the model ComfyUI last ran go straight through. A job for another
+    model waits until this worker's prompts have drained and nobody is waiting
+    for the current model, then its model becomes current. A job that has
+    waited max_wait seconds stops further jobs for the current model, so it
+    can't starve.
+    """
+
+    def __init__(self, max_wait=SCHEDULER_MAX_WAIT, lru_size=MODEL_LRU_SIZE):
+        self.max_wait = max_wait
+        self.lru_size = lru_size
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._in_flight = 0
+        self._resident = collections.OrderedDict()
+        self.current = None
+        self.jobs = 0
+        self.switches = 0
+        self.loads = 0
+
+    def acquire(self, model):
+        """Block until a job for model may queue its prompt; returns how the model was reached"""
+        ticket = (time.monotonic(), model)
+        with self._cond:
+            self._waiting.append(ticket)
+            while not self._may_go(ticket):
+                self._cond.wait(timeout=max(min(self.max_wait, 1.0), 0.01))
+            self._waiting.remove(ticket)
+
+            switched = self.current is not None and model != self.current
+            loaded = model not in self._resident
+            self.jobs += 1
+            self.switches += int(switched)
+            self.loads += int(loaded and self.current is not None)
+            self.current = model
+            self._resident[model] = True
+            self._resident.move_to_end(model)
+            while len(self._resident) > max(self.lru_size, 1):
+                self._resident.popitem(last=False)
+            self._in_flight += 1
+            self._cond.notify_all()
+            return {"switched": switched, "loaded": loaded}
+
+    def release(self):
+        """The job's prompt finished or was dropped"""
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def _may_go(self, ticket):
+        now = time.monotonic()
+        starving = [t for t in self._waiting if t[1] != self.current and now - t[0] >= self.max_wait]
+
+        if self.current is None:
+            return ticket[1] == self._waiting[0][1]
+        if ticket[1] == self.current:
+            return not starving
+        if self._in_flight:
+            return False
+        if not starving and any(t[1] == self.current for t in self._waiting):
+            return False
+        # Next model: the longest-starved job's, else the oldest waiter's
+        return ticket[1] == (starving or self._waiting)[0][1]
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                "current": self.current,
+                "jobs": self.jobs,
+                "switches": self.switches,
+                "loads": self.loads,
+                "waiting": len(self._waiting),
+            }
@@ -0,0 +1,133 @@
+"""
+Output sinks: where rendered files go once ComfyUI has written them
+Small files can be inlined as base64; large ones are streamed to S3-compatible
+storage with multipart upload and returned as presigned URLs
+"""
+
+import base64
+import mimetypes
+import os
+
+# "inline", "s3" or "auto" (S3 for large files when a bucket is configured)
+OUTPUT_SINK = os.environ.get("OUTPUT_SINK", "auto")
+INLINE_MAX_BYTES = int(os.environ.get("INLINE_MAX_BYTES", str(10 * 1024 * 1024)))
+
+S3_BUCKET = os.environ.get("S3_BUCKET", "")
+S3_PREFIX = os.environ.get("S3_PREFIX", "hunyuan-outputs/")
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL") or None
+S3_REGION = os.environ.get("S3_REGION") or None
+S3_PRESIGN_SECONDS = int(os.environ.get("S3_PRESIGN_SECONDS", "3600"))
+S3_PART_SIZE_MB = int(os.environ.get("S3_PART_SIZE_MB", "16"))
+S3_MAX_CONCURRENCY = int(os.environ.get("S3_MAX_CONCURRENCY", "4"))
+
+# Read size for base64 encoding; a multiple of 3 so chunks encode independently
+B64_CHUNK_BYTES = 3 * 1024 * 1024
+
+
+class InlineSink:
+    """Return file contents base64-encoded in the job response"""
+
+    name = "inline"
+
+    def store(self, filepath, job_id=None):
+        chunks = []
+        with open(filepath, "rb") as f:
+            while True:
+                chunk = f.read(B64_CHUNK_BYTES)
+                if not chunk:
+                    break
+                chunks.append(base64.b64encode(chunk).decode("ascii"))
+        return {"data": "".join(chunks)}
+
+
+class S3Sink:
+    """Stream files to an S3-compatible bucket and return presigned URLs"""
+
+    name = "s3"
+
+    def __init__(self, bucket, prefix="", endpoint_url=None, region=None,
+                 presign_seconds=3600, part_size_mb=16, max_concurrency=4):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self.presign_seconds = presign_seconds
+        self.part_size = part_size_mb * 1024 * 1024
+        self.max_concurrency = max_concurrency
+        self._client = None
+        self._transfer_config = None
+
+    def _get_client(self):
+        if self._client is None:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+
+            self._client = boto3.client("s3", endpoint_url=self.endpoint_url, region_name=self.region)
+            # Memory use is bounded by part size x concurrency, not file size
+            self._transfer_config = TransferConfig(
+                multipart_threshold=self.part_size,
+                multipart_chunksize=self.part_size,
+                max_concurrency=self.max_concurrency,
+                use_threads=self.max_concurrency > 1,
+            )
+        return self._client
+
+    def store(self, filepath, job_id=None):
+        client = self._get_client()
+        filename = os.path.basename(filepath)
+        key = f"{self.prefix}{job_id}/{filename}" if job_id else f"{self.prefix}{filename}"
+        content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+        client.upload_file(
+            filepath, self.bucket, key,
+            ExtraArgs={"ContentType": content_type},
+            Config=self._transfer_config,
+        )
+        url = client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=self.presign_seconds,
+        )
+        return {"url": url, "bucket": self.bucket, "key": key, "size": os.path.getsize(filepath)}
+
+
+class AutoSink:
+    """Inline small files, upload anything bigger than inline_max_bytes"""
+
+    name = "auto"
+
+    def __init__(self, upload_sink, inline_max_bytes=INLINE_MAX_BYTES):
+        self.inline = InlineSink()
+        self.upload = upload_sink
+        self.inline_max_bytes = inline_max_bytes
+
+    def store(self, filepath, job_id=None):
+        if os.path.getsize(filepath) <= self.inline_max_bytes:
+            return self.inline.store(filepath, job_id)
+        return self.upload.store(filepath, job_id)
+
+
+def create_output_sink(mode=None):
+    """Build the sink selected by OUTPUT_SINK and the S3_* environment variables"""
+    mode = (mode or OUTPUT_SINK).lower()
+
+    if mode == "inline" or (mode == "auto" and not S3_BUCKET):
+        return InlineSink()
+
+    if not S3_BUCKET:
+        raise ValueError("OUTPUT_SINK=s3 requires S3_BUCKET")
+
+    s3 = S3Sink(
+        S3_BUCKET,
+        prefix=S3_PREFIX,
+        endpoint_url=S3_ENDPOINT_URL,
+        region=S3_REGION,
+        presign_seconds=S3_PRESIGN_SECONDS,
+        part_size_mb=S3_PART_SIZE_MB,
+        max_concurrency=S3_MAX_CONCURRENCY,
+    )
+    if mode == "s3":
+        return s3
+    if mode == "auto":
+        return AutoSink(s3)
+    raise ValueError(f"Unknown OUTPUT_SINK: {mode}")
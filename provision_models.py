@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Model provisioning tool
+Downloads every model in models_manifest.json concurrently, using ranged
+multi-connection transfers that resume after interruptions, then verifies
+size and SHA256 (pinned in the manifest, else as published by the server)
+before atomically moving each file into place
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from model_catalog import MODEL_VARIANTS, enabled_variants
+
+DEFAULT_MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models_manifest.json")
+DEFAULT_CONNECTIONS = 4
+DEFAULT_CHUNK_MB = 64
+DEFAULT_RETRIES = 5
+READ_BLOCK = 1024 * 1024
+HASH_BLOCK = 8 * 1024 * 1024
+SHA256_HEX = set("0123456789abcdef")
+
+
+class ProvisionError(Exception):
+    """Raised when a model can't be downloaded or fails verification"""
+
+
+def load_manifest(path=DEFAULT_MANIFEST, variants=MODEL_VARIANTS):
+    """Load manifest entries, applying any *_URL environment overrides
+
+    Models tied to a diffusion model variant are only included when that
+    variant is enabled (see model_catalog.enabled_variants)
+    """
+    with open(path) as f:
+        manifest = json.load(f)
+
+    enabled = set(enabled_variants(manifest, variants))
+    models = [entry for entry in manifest["models"] if entry.get("variant") in enabled or "variant" not in entry]
+
+    for entry in models:
+        override = os.environ.get(entry.get("url_env") or "")
+        if override:
+            entry["url"] = override
+    return models
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(HASH_BLOCK)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def verify_file(path, size=None, sha256=None):
+    """Raise ProvisionError unless the file matches the expected size and hash"""
+    actual_size = os.path.getsize(path)
+    if size is not None and actual_size != size:
+        raise ProvisionError(f"{path}: expected {size} bytes, got {actual_size}")
+    if sha256:
+        actual = sha256_file(path)
+        if actual != sha256.lower():
+            raise ProvisionError(f"{path}: sha256 mismatch (expected {sha256}, got {actual})")
+
+
+def published_checksum(response):
+    """(size, sha256) Hugging Face publishes for an LFS file, from the resolve redirect's X-Linked-* headers"""
+    size = sha256 = None
+    for hop in [*response.history, response]:
+        linked_size = hop.headers.get("X-Linked-Size")
+        if linked_size and linked_size.isdigit():
+            size = int(linked_size)
+        etag = hop.headers.get("X-Linked-Etag", "").removeprefix("W/").strip('"').lower()
+        if len(etag) == 64 and set(etag) <= SHA256_HEX:
+            sha256 = etag
+    return size, sha256
+
+
+def _make_session(connections):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(connections, 4))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class ChunkState:
+    """Which chunks of a .part file are complete, persisted next to it"""
+
+    def __init__(self, path, url, size, chunk_size):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = {"url": url, "size": size, "chunk_size": chunk_size, "done": []}
+
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    saved = json.load(f)
+                # Only resume if the file being fetched hasn't changed shape
+                if saved.get("size") == size and saved.get("chunk_size") == chunk_size:
+                    self.data["done"] = saved.get("done", [])
+            except ValueError:
+                pass
+
+    def is_done(self, index):
+        return index in self.data["done"]
+
+    def mark_done(self, index):
+        with self.lock:
+            self.data["done"].append(index)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.data, f)
+            os.replace(tmp, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Downloader:
+    """Download one URL to a .part file with ranged, resumable requests"""
+
+    def __init__(self, session, connections=DEFAULT_CONNECTIONS, chunk_size=DEFAULT_CHUNK_MB * 1024 * 1024,
+                 retries=DEFAULT_RETRIES, backoff=1.0, timeout=(10, 60)):
+        self.session = session
+        self.connections = connections
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+    def probe(self, url):
+        """
+        Resolve redirects; returns {"url", "size", "ranges", "published_size", "sha256"},
+        the last two being what the server publishes for verification (or None)
+        """
+        response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+        response.raise_for_status()
+        size = response.headers.get("Content-Length")
+        published_size, sha256 = published_checksum(response)
+        return {
+            "url": response.url,
+            "size": int(size) if size is not None else None,
+            "ranges": response.headers.get("Accept-Ranges", "").lower() == "bytes",
+            "published_size": published_size,
+            "sha256": sha256,
+        }
+
+    def download(self, url, part_path, expected_size=None, probed=None):
+        """Fill part_path with the full contents of url; returns the byte count"""
+        probed = probed or self.probe(url)
+        final_url, size, ranges = probed["url"], probed["size"], probed["ranges"]
+        if expected_size is not None and size is not None and size != expected_size:
+            raise ProvisionError(f"{url}: server reports {size} bytes, expected {expected_size}")
+
+        if not ranges or size is None:
+            self._download_whole(final_url, part_path)
+            return os.path.getsize(part_path)
+
+        state = ChunkState(f"{part_path}.json", url, size, self.chunk_size)
+        if not os.path.exists(part_path) or os.path.getsize(part_path) != size:
+            state.data["done"] = []
+            with open(part_path, "wb") as f:
+                f.truncate(size)
+
+        chunks = []
+        for index, start in enumerate(range(0, size, self.chunk_size)):
+            if not state.is_done(index):
+                chunks.append((index, start, min(start + self.chunk_size, size) - 1))
+
+        if chunks:
+            resumed = len(range(0, size, self.chunk_size)) - len(chunks)
+            if resumed:
+                print(f"  Resuming: {resumed} chunk(s) already on disk")
+
+            errors = []
+            fd = os.open(part_path, os.O_RDWR)
+            try:
+                with ThreadPoolExecutor(max_workers=self.connections) as pool:
+                    futures = {pool.submit(self._fetch_range, final_url, fd, *chunk): chunk[0] for chunk in chunks}
+                    # Record every chunk that landed, so a failed run still resumes from them
+                    for future in as_completed(futures):
+                        try:
+                            future.result()
+                            state.mark_done(futures[future])
+                        except ProvisionError as e:
+                            errors.append(e)
+            finally:
+                os.close(fd)
+            if errors:
+                raise errors[0]
+
+        state.remove()
+        return size
+
+    def _fetch_range(self, url, fd, index, start, end):
+        """Write bytes start..end of url at the same offsets in fd, resuming within the chunk on drops"""
+        position = start
+        for attempt in range(self.retries + 1):
+            try:
+                headers = {"Range": f"bytes={position}-{end}"}
+                with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if response.status_code != 206:
+                        raise ProvisionError(f"{url}: expected 206 for range request, got {response.status_code}")
+                    for block in response.iter_content(READ_BLOCK):
+                        os.pwrite(fd, block, position)
+                        position += len(block)
+                if position > end:
+                    return
+            except (requests.RequestException, OSError) as e:
+                if attempt == self.retries:
+                    raise ProvisionError(f"{url}: chunk {index} failed after {attempt + 1} attempts: {e}") from e
+            else:
+                if attempt == self.retries:
+                    raise ProvisionError(f"{url}: chunk {index} ended early at byte {position}")
+            time.sleep(self.backoff * (2 ** attempt))
+
+    def _download_whole(self, url, part_path):
+        """Plain streamed GET for servers without range support"""
+        for attempt in range(self.retries + 1):
+            try:
+                with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                    response.raise_for_status()
+                    with open(part_path, "wb") as f:
+                        for block in response.iter_content(READ_BLOCK):
+                            f.write(block)
+                return
+            except requests.RequestException as e:
+                if attempt == self.retries:
+                    raise ProvisionError(f"{url}: download failed after {attempt + 1} attempts: {e}") from e
+                time.sleep(self.backoff * (2 ** attempt))
+
+
+def provision_model(entry, dest, downloader, verify_existing=False):
+    """Make sure one manifest entry exists under dest; returns a status string"""
+    final_path = os.path.join(dest, entry["subdir"], entry["filename"])
+    part_path = f"{final_path}.part"
+    size = entry.get("size")
+    sha256 = entry.get("sha256")
+    exists = os.path.exists(final_path)
+
+    # Not pinned in the manifest: verify against what the server publishes
+    # (Hugging Face sends the LFS size and sha256 with the resolve redirect)
+    probed = None
+    if entry.get("url") and (size is None or sha256 is None):
+        try:
+            probed = downloader.probe(entry["url"])
+        except requests.RequestException as e:
+            if not exists:
+                raise
+            print(f"⚠ {entry['name']}: could not ask the server for its size ({e}), keeping the file unchecked")
+        if probed:
+            size = size if size is not None else probed["published_size"] or probed["size"]
+            sha256 = sha256 or probed["sha256"]
+
+    if exists:
+        try:
+            verify_file(final_path, size, sha256 if verify_existing else None)
+            return "present"
+        except ProvisionError as e:
+            # e.g. left truncated by an interrupted copy; it can't be resumed safely
+            print(f"✗ {e}; downloading it again")
+            os.remove(final_path)
+
+    if not entry.get("url"):
+        raise ProvisionError(f"{entry['name']}: no URL configured")
+
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    started = time.time()
+    downloaded = downloader.download(entry["url"], part_path, expected_size=size, probed=probed)
+
+    try:
+        verify_file(part_path, size, sha256)
+    except ProvisionError:
+        # A corrupt file can't be resumed into a good one
+        os.remove(part_path)
+        raise
+
+    # Same directory, so this is an atomic rename even on the network volume
+    os.replace(part_path, final_path)
+    elapsed = max(time.time() - started, 0.001)
+    print(f"✓ {entry['name']}: {downloaded / 1e6:.0f}MB in {elapsed:.1f}s ({downloaded / 1e6 / elapsed:.0f} MB/s)")
+    return "downloaded"
+
+
+def provision(models, dest, connections=DEFAULT_CONNECTIONS, chunk_mb=DEFAULT_CHUNK_MB,
+              retries=DEFAULT_RETRIES, backoff=1.0, verify_existing=False):
+    """Provision all models concurrently; returns {filename: status or error}"""
+    session = _make_session(connections * len(models))
+    downloader = Downloader(session, connections=connections, chunk_size=chunk_mb * 1024 * 1024,
+                            retries=retries, backoff=backoff)
+    results = {}
+
+    def run(entry):
+        try:
+            results[entry["filename"]] = provision_model(entry, dest, downloader, verify_existing)
+        except (ProvisionError, requests.RequestException, OSError) as e:
+            print(f"✗ {entry['name']}: {e}")
+            results[entry["filename"]] = f"error: {e}"
+
+    with ThreadPoolExecutor(max_workers=max(len(models), 1)) as pool:
+        list(pool.map(run, models))
+
+    session.close()
+    return results
+
+
+def record_manifest(path, models, dest):
+    """Write size and sha256 of the files under dest back into the manifest"""
+    with open(path) as f:
+        manifest = json.load(f)
+
+    for entry in manifest["models"]:
+        local = os.path.join(dest, entry["subdir"], entry["filename"])
+        if os.path.exists(local):
+            entry["size"] = os.path.getsize(local)
+            entry["sha256"] = sha256_file(local)
+            print(f"Recorded {entry['filename']}: {entry['size']} bytes, sha256 {entry['sha256']}")
+
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download and verify models listed in a manifest")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="Path to models_manifest.json")
+    parser.add_argument("--dest", help="Models root, e.g. /runpod-volume or /app/ComfyUI/models")
+    parser.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS, help="Parallel connections per file")
+    parser.add_argument("--chunk-mb", type=int, default=DEFAULT_CHUNK_MB, help="Range request size")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="Retries per chunk")
+    parser.add_argument("--verify-existing", action="store_true", help="Re-hash files that are already present")
+    parser.add_argument("--record", action="store_true", help="Pin size/sha256 of files under --dest into the manifest")
+    parser.add_argument("--list", action="store_true", help="Print filename|subdir|name per model and exit")
+    parser.add_argument("--variants", default=MODEL_VARIANTS,
+                        help="Model variants to include: comma-separated keys or 'all' (default: MODEL_VARIANTS)")
+    args = parser.parse_args()
+
+    models = load_manifest(args.manifest, args.variants)
+
+    if args.list:
+        for entry in models:
+            print(f"{entry['filename']}|{entry['subdir']}|{entry['name']}")
+        return 0
+
+    if not args.dest:
+        parser.error("--dest is required")
+
+    if args.record:
+        record_manifest(args.manifest, models, args.dest)
+        return 0
+
+    results = provision(models, args.dest, connections=args.connections, chunk_mb=args.chunk_mb,
+                        retries=args.retries, verify_existing=args.verify_existing)
+    failed = [name for name, status in results.items() if status.startswith("error")]
+    if failed:
+        print(f"Failed to provision: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
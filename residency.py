@@ -0,0 +1,191 @@
+"""
+Model residency in ComfyUI's VRAM and RAM
+Samples /system_stats around and during each job, reports per-job peak memory
+and applies a policy through /free: keep models hot, free on memory pressure,
+and/or unload after the worker has been idle for a while
+"""
+
+import os
+import threading
+import time
+
+# Comma-separated: "keep" (never free), "pressure" (free when memory runs low), "idle" (unload after idling)
+RESIDENCY_POLICY = os.environ.get("RESIDENCY_POLICY", "pressure")
+RESIDENCY_MIN_FREE_VRAM_MB = int(os.environ.get("RESIDENCY_MIN_FREE_VRAM_MB", "2048"))
+RESIDENCY_MIN_FREE_RAM_MB = int(os.environ.get("RESIDENCY_MIN_FREE_RAM_MB", "4096"))
+RESIDENCY_IDLE_SECONDS = float(os.environ.get("RESIDENCY_IDLE_SECONDS", "600"))
+# How often to sample memory while jobs run; 0 only samples before and after
+RESIDENCY_SAMPLE_INTERVAL = float(os.environ.get("RESIDENCY_SAMPLE_INTERVAL", "1.0"))
+
+MB = 1024 * 1024
+
+
+def memory_snapshot(system_stats):
+    """VRAM of the first device and system RAM from a /system_stats payload, in MB"""
+    system = system_stats.get("system", {})
+    devices = system_stats.get("devices") or [{}]
+    device = devices[0]
+    return {
+        "vram_total": device.get("vram_total", 0) / MB,
+        "vram_free": device.get("vram_free", 0) / MB,
+        "ram_total": system.get("ram_total", 0) / MB,
+        "ram_free": system.get("ram_free", 0) / MB,
+    }
+
+
+class JobMemory:
+    """Memory seen while one job was running"""
+
+    def __init__(self, before):
+        self.before = before
+        self.after = None
+        self.peak_vram = before["vram_total"] - before["vram_free"]
+        self.peak_ram = before["ram_total"] - before["ram_free"]
+        self.samples = 1
+        self.freed = []
+
+    def observe(self, snapshot):
+        self.peak_vram = max(self.peak_vram, snapshot["vram_total"] - snapshot["vram_free"])
+        self.peak_ram = max(self.peak_ram, snapshot["ram_total"] - snapshot["ram_free"])
+        self.samples += 1
+
+    def report(self):
+        report = {
+            "vram_total_mb": round(self.before["vram_total"]),
+            "vram_used_before_mb": round(self.before["vram_total"] - self.before["vram_free"]),
+            "vram_peak_mb": round(self.peak_vram),
+            "ram_peak_mb": round(self.peak_ram),
+            "samples": self.samples,
+        }
+        if self.after is not None:
+            report["vram_used_after_mb"] = round(self.after["vram_total"] - self.after["vram_free"])
+        if self.freed:
+            report["freed"] = self.freed
+        return report
+
+
+class ResidencyManager:
+    """Decide when ComfyUI should drop models, and measure what each job used"""
+
+    def __init__(self, client, policy=RESIDENCY_POLICY, min_free_vram_mb=RESIDENCY_MIN_FREE_VRAM_MB,
+                 min_free_ram_mb=RESIDENCY_MIN_FREE_RAM_MB, idle_seconds=RESIDENCY_IDLE_SECONDS,
+                 sample_interval=RESIDENCY_SAMPLE_INTERVAL):
+        self.client = client
+        self.policy = {part.strip() for part in policy.split(",") if part.strip()}
+        unknown = self.policy - {"keep", "pressure", "idle"}
+        if unknown:
+            raise ValueError(f"Unknown RESIDENCY_POLICY: {', '.join(sorted(unknown))}")
+        self.min_free_vram_mb = min_free_vram_mb
+        self.min_free_ram_mb = min_free_ram_mb
+        self.idle_seconds = idle_seconds
+        self.sample_interval = sample_interval
+
+        self._lock = threading.Lock()
+        self._active = set()
+        self._idle_since = time.monotonic()
+        self._idle_freed = False
+        self._stop = threading.Event()
+        self._thread = None
+        self.frees = {"pressure": 0, "idle": 0}
+        # Most recent snapshot, for sizing decisions that don't need a fresh one
+        self.last = None
+
+    def sample(self):
+        """Current memory snapshot, or None if ComfyUI didn't answer"""
+        try:
+            self.last = memory_snapshot(self.client.system_stats(timeout=2, retries=0))
+            return self.last
+        except Exception as e:
+            print(f"Could not sample ComfyUI memory: {str(e)}")
+            return None
+
+    def begin(self):
+        """Start measuring a job; returns a JobMemory, or None if memory couldn't be read"""
+        snapshot = self.sample()
+        if snapshot is None:
+            return None
+        job = JobMemory(snapshot)
+        with self._lock:
+            alone = not self._active
+            self._active.add(job)
+            self._idle_freed = False
+        # Too little left to even start: drop cached activations but keep the models
+        if alone and "pressure" in self.policy and self._under_pressure(snapshot):
+            self.free(unload_models=False, reason="pressure", job=job)
+        return job
+
+    def end(self, job):
+        """Stop measuring a job and apply the policy; returns its memory report"""
+        if job is None:
+            return None
+        snapshot = self.sample()
+        with self._lock:
+            self._active.discard(job)
+            alone = not self._active
+            if alone:
+                self._idle_since = time.monotonic()
+        if snapshot is not None:
+            job.after = snapshot
+            job.observe(snapshot)
+            # Another job may need what's loaded, so only unload between jobs
+            if alone and "pressure" in self.policy and self._under_pressure(snapshot):
+                self.free(unload_models=True, reason="pressure", job=job)
+        return job.report()
+
+    def free(self, unload_models, reason, job=None):
+        """POST /free; ComfyUI applies it as soon as no prompt is running"""
+        print(f"Asking ComfyUI to free memory ({reason}, unload_models={unload_models})")
+        try:
+            self.client.free(unload_models=unload_models, free_memory=True)
+        except Exception as e:
+            print(f"Could not free ComfyUI memory: {str(e)}")
+            return False
+        with self._lock:
+            self.frees[reason] += 1
+        if job is not None:
+            job.freed.append({"reason": reason, "unload_models": unload_models})
+        return True
+
+    def _under_pressure(self, snapshot):
+        low_vram = snapshot["vram_total"] and snapshot["vram_free"] < self.min_free_vram_mb
+        low_ram = snapshot["ram_total"] and snapshot["ram_free"] < self.min_free_ram_mb
+        return bool(low_vram or low_ram)
+
+    def tick(self):
+        """Sample running jobs and apply the idle policy; called by the background thread"""
+        with self._lock:
+            active = list(self._active)
+            idle_for = None if active or self._idle_freed else time.monotonic() - self._idle_since
+
+        if active and self.sample_interval:
+            snapshot = self.sample()
+            if snapshot is not None:
+                for job in active:
+                    job.observe(snapshot)
+
+        if "idle" in self.policy and idle_for is not None and idle_for >= self.idle_seconds:
+            with self._lock:
+                self._idle_freed = True
+            self.free(unload_models=True, reason="idle")
+
+    def start(self):
+        """Run tick() in a daemon thread"""
+        if self._thread is not None:
+            return
+        interval = self.sample_interval or 1.0
+        if "idle" in self.policy:
+            interval = min(interval, max(self.idle_seconds / 10, 0.05))
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.tick()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,134 @@
+"""
+Deterministic result cache
+Maps (input image bytes, fully resolved workflow graph) to previously rendered
+outputs on the network volume, so retried or duplicated jobs skip ComfyUI.
+Only safe when the seed is explicit; evicts least-recently-used entries by size
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+_default_dir = "/runpod-volume/cache/results" if os.path.isdir("/runpod-volume") else ""
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", _default_dir)
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(50 * 1024 ** 3)))
+
+META_FILE = "meta.json"
+
+
+def canonical_workflow(workflow):
+    """Stable JSON for a workflow graph; UI-only _meta titles don't affect output"""
+    stripped = {
+        node_id: {key: value for key, value in node.items() if key != "_meta"}
+        for node_id, node in workflow.items()
+    }
+    return json.dumps(stripped, sort_keys=True, separators=(",", ":"))
+
+
+class ResultCache:
+    """On-disk LRU cache of rendered outputs, bounded by total bytes"""
+
+    def __init__(self, root, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(image_bytes, workflow):
+        digest = hashlib.sha256()
+        digest.update(hashlib.sha256(image_bytes).digest())
+        digest.update(canonical_workflow(workflow).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def get(self, key):
+        """Return cached outputs [{"type", "filename", "path"}] or None"""
+        entry_dir = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry_dir, META_FILE)) as f:
+                meta = json.load(f)
+            outputs = [dict(o, path=os.path.join(entry_dir, o["filename"])) for o in meta["outputs"]]
+            if not all(os.path.exists(o["path"]) for o in outputs):
+                raise OSError("cached output missing")
+            # Directory mtime doubles as the LRU timestamp
+            os.utime(entry_dir)
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return outputs
+
+    def put(self, key, outputs):
+        """Store outputs [{"type", "filename", "path", ...}] under key; extra fields are kept"""
+        entry_dir = self._entry_dir(key)
+        if os.path.exists(entry_dir):
+            return
+
+        # Build the entry privately, then rename it into place in one step
+        tmp_dir = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)
+        try:
+            meta = {"created": time.time(), "outputs": []}
+            for output in outputs:
+                shutil.copyfile(output["path"], os.path.join(tmp_dir, output["filename"]))
+                meta["outputs"].append({key: value for key, value in output.items() if key != "path"})
+            with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+                json.dump(meta, f)
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.exists(entry_dir):
+                raise
+            return
+
+        with self._lock:
+            self.stores += 1
+        self.evict()
+
+    def evict(self):
+        """Delete least-recently-used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(".") or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+                entries.append((os.stat(path).st_mtime, size, path))
+            except OSError:
+                continue
+            total += size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "stores": self.stores, "evictions": self.evictions}
+
+
+def create_result_cache():
+    """Cache at RESULT_CACHE_DIR, or None when caching is disabled"""
+    if not RESULT_CACHE_DIR:
+        return None
+    os.makedirs(RESULT_CACHE_DIR, exist_ok=True)
+    return ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_BYTES)
@@ -0,0 +1,117 @@
+"""
+Retention for ComfyUI input/output files
+Deletes each job's files once its response is built, and sweeps the input and
+output directories in the background by age and total size. Files held by a
+running job are reference counted and never deleted underneath it
+"""
+
+import collections
+import os
+import threading
+import time
+
+CLEANUP_JOB_FILES = os.environ.get("CLEANUP_JOB_FILES", "1") == "1"
+RETENTION_MAX_AGE = int(os.environ.get("RETENTION_MAX_AGE", str(6 * 3600)))
+RETENTION_MAX_BYTES = int(os.environ.get("RETENTION_MAX_BYTES", str(20 * 1024 ** 3)))
+RETENTION_SWEEP_INTERVAL = int(os.environ.get("RETENTION_SWEEP_INTERVAL", "300"))
+# Never sweep files this fresh: ComfyUI may still be writing an output we don't know about yet
+RETENTION_GRACE_SECONDS = int(os.environ.get("RETENTION_GRACE_SECONDS", "120"))
+
+
+class RetentionManager:
+    """Reference-counted deletion of job files plus an age/size sweeper"""
+
+    def __init__(self, directories, max_age=RETENTION_MAX_AGE, max_bytes=RETENTION_MAX_BYTES,
+                 interval=RETENTION_SWEEP_INTERVAL, grace=RETENTION_GRACE_SECONDS, cleanup=CLEANUP_JOB_FILES):
+        self.directories = directories
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.grace = grace
+        self.cleanup = cleanup
+
+        self._in_use = collections.Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.deleted_files = 0
+        self.deleted_bytes = 0
+
+    def acquire(self, path):
+        """Mark path as used by a job; call before the job relies on it existing"""
+        with self._lock:
+            self._in_use[os.path.abspath(path)] += 1
+
+    def in_use(self, path):
+        with self._lock:
+            return self._in_use[os.path.abspath(path)] > 0
+
+    def finish(self, paths):
+        """Release a job's files and, with cleanup on, delete those no other job holds"""
+        for path in paths:
+            path = os.path.abspath(path)
+            with self._lock:
+                self._in_use[path] -= 1
+                if self._in_use[path] > 0:
+                    continue
+                del self._in_use[path]
+                if self.cleanup:
+                    self._delete(path)
+
+    def _delete(self, path):
+        """Remove one file; caller holds the lock"""
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        self.deleted_files += 1
+        self.deleted_bytes += size
+
+    def sweep(self):
+        """Delete unused files older than max_age, then the oldest until under max_bytes"""
+        now = time.time()
+        files = []
+        for directory in self.directories:
+            for root, _, names in os.walk(directory):
+                for name in names:
+                    path = os.path.abspath(os.path.join(root, name))
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for mtime, size, path in sorted(files):
+            expired = now - mtime > self.max_age
+            if not expired and total <= self.max_bytes:
+                break
+            if now - mtime < self.grace:
+                continue
+            with self._lock:
+                if self._in_use[path] > 0:
+                    continue
+                self._delete(path)
+            total -= size
+
+    def start(self):
+        """Run sweep() every interval seconds in a daemon thread"""
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Retention sweep failed: {str(e)}")
+
+    def snapshot(self):
+        with self._lock:
+            return {"deleted_files": self.deleted_files, "deleted_bytes": self.deleted_bytes}
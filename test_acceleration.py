@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Launch profile and accel mode tests
+"""
+
+import pytest
+
+import handler
+from acceleration import LaunchProfile, accel_mode, apply_accel
+from fake_comfyui import object_info
+from workflow_validation import validate_workflow
+
+
+def test_profile_flags_and_overrides():
+    assert LaunchProfile("default", "", "", "", "").args == []
+    assert LaunchProfile("max", "", "", "", "").args == ["--use-sage-attention", "--fast", "--highvram"]
+
+    profile = LaunchProfile("fast", attention="flash", fast="0", vram="low", extra_args="--reserve-vram 2")
+    assert profile.args == ["--use-flash-attention", "--lowvram", "--reserve-vram", "2"]
+    assert profile.label == "attention=flash,vram=low,--reserve-vram 2"
+
+    with pytest.raises(ValueError):
+        LaunchProfile("turbo", "", "", "", "")
+    with pytest.raises(ValueError):
+        LaunchProfile("default", attention="xformers")
+
+
+def test_accel_mode_validation():
+    assert accel_mode(None) is None
+    assert accel_mode("off") is None
+    assert accel_mode("easycache") == "easycache"
+    with pytest.raises(ValueError):
+        accel_mode("teacache")
+
+
+def test_cache_node_sits_between_model_sampling_and_guider():
+    workflow = handler.create_default_workflow("in.png", seed=1)
+
+    assert apply_accel(workflow, "easycache") == 1
+    assert workflow["129"]["inputs"]["model"] == ["130_accel", 0]
+    assert workflow["130_accel"]["inputs"]["model"] == ["130", 0]
+    assert workflow["130_accel"]["class_type"] == "EasyCache"
+    assert validate_workflow(workflow, object_info()) == {}
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Fake ComfyUI latency/failure injection and the handler load benchmark
+"""
+
+import time
+
+import requests
+
+import bench_handler
+import handler
+from fake_comfyui import FakeComfyUI
+
+
+def test_fake_node_latency_and_rejection():
+    server = FakeComfyUI(render_seconds=0, node_seconds={"SlowNode": 0.3}, reject_rate=1.0, seed=1)
+    server.start()
+    try:
+        refused = requests.post(f"{server.url}/prompt", json={"prompt": {}}, timeout=5)
+        server.reject_rate = 0.0
+        prompt = {"1": {"class_type": "SlowNode", "inputs": {}}, "2": {"class_type": "Other", "inputs": {}}}
+        started = time.time()
+        prompt_id = requests.post(f"{server.url}/prompt", json={"prompt": prompt}, timeout=5).json()["prompt_id"]
+        while prompt_id not in server.history:
+            time.sleep(0.01)
+        elapsed = server.finished_at[prompt_id] - started
+    finally:
+        server.stop()
+
+    assert refused.status_code == 400
+    assert server.rejected == 1
+    assert server.history[prompt_id]["status"]["completed"]
+    assert 0.3 <= elapsed < 1
+
+
+def test_benchmark_reports_latency_and_overhead(monkeypatch):
+    for name in ("comfy", "COMFYUI_PATH", "result_cache", "cost_model", "gpu_name", "canceller", "metrics", "residency",
+                 "model_scheduler", "object_info"):
+        monkeypatch.setattr(handler, name, getattr(handler, name))
+
+    summary = bench_handler.run_benchmark(jobs=6, concurrency=3, render_seconds=0.1, fail_rate=0.5, seed=3)
+
+    assert summary["succeeded"] + summary["failed"] == 6
+    assert 0 < summary["failed"] < 6
+    assert summary["latency"]["p50"] <= summary["latency"]["p95"] <= summary["latency"]["p99"]
+    assert summary["throughput"] > 0
+    assert summary["overhead"]["mean"] is not None
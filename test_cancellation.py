@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Prompt cancellation tests against the fake ComfyUI server
+"""
+
+import time
+
+from cancellation import PromptCanceller
+from comfy_client import ComfyUIClient
+from fake_comfyui import FakeComfyUI
+
+WORKFLOW = {"1": {"class_type": "SamplerCustomAdvanced", "inputs": {}}}
+
+
+def test_cancel_running_and_pending_prompts():
+    server = FakeComfyUI(render_seconds=5, sampler_steps=50)
+    server.start()
+    client = ComfyUIClient(server.url)
+    canceller = PromptCanceller(client, confirm_timeout=5)
+    try:
+        running = client.queue_prompt(WORKFLOW)["prompt_id"]
+        pending = client.queue_prompt(WORKFLOW)["prompt_id"]
+        time.sleep(0.3)
+
+        started = time.time()
+        assert canceller.cancel(pending, "test")
+        assert canceller.cancel(running, "test")
+        elapsed = time.time() - started
+
+        assert canceller.confirm()
+        assert client.get_queue() == {"queue_running": [], "queue_pending": []}
+    finally:
+        server.stop()
+
+    assert elapsed < 2
+    assert server.interrupts == 1
+    assert pending not in server.history
+
+
+def test_unconfirmed_cancel_blocks_until_prompt_is_gone(monkeypatch):
+    server = FakeComfyUI(render_seconds=1.0, sampler_steps=10)
+    server.start()
+    client = ComfyUIClient(server.url)
+    canceller = PromptCanceller(client, confirm_timeout=0.2)
+    # A ComfyUI that ignores interrupts, e.g. stuck inside a custom node
+    monkeypatch.setattr(client, "interrupt", lambda prompt_id=None, stats=None: None)
+    try:
+        prompt_id = client.queue_prompt(WORKFLOW)["prompt_id"]
+        time.sleep(0.1)
+
+        assert not canceller.cancel(prompt_id, "test")
+        assert not canceller.confirm()
+        time.sleep(1.2)
+        assert canceller.confirm()
+    finally:
+        server.stop()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+ComfyUI client tests: retries, timeouts and request accounting
+"""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from comfy_client import AsyncComfyUIClient, ComfyUIClient, ComfyUIError, RequestStats
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Answers 503 for the first `failures` requests, then 200"""
+
+    failures = 0
+    seen = 0
+
+    def _reply(self):
+        FlakyHandler.seen += 1
+        status = 503 if FlakyHandler.seen <= FlakyHandler.failures else 200
+        body = json.dumps({"path": self.path, "prompt_id": "abc"}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._reply()
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(failures):
+    FlakyHandler.failures = failures
+    FlakyHandler.seen = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_retries_transient_errors_and_counts_requests():
+    server, url = serve(failures=2)
+    client = ComfyUIClient(url, backoff=0.01)
+    job_stats = RequestStats()
+    try:
+        history = client.get_history("abc", stats=job_stats)
+    finally:
+        client.close()
+        server.shutdown()
+
+    assert history["path"] == "/history/abc"
+    assert job_stats.snapshot()["requests"] == 3
+    assert job_stats.snapshot()["retries"] == 2
+    assert client.stats.snapshot()["requests"] == 3
+
+
+def test_queue_prompt_is_not_retried_after_reaching_server():
+    server, url = serve(failures=1)
+    client = ComfyUIClient(url, backoff=0.01)
+    try:
+        client.queue_prompt({"1": {}})
+    finally:
+        client.close()
+        server.shutdown()
+
+    # 503 from /prompt is returned as-is rather than re-queued
+    assert FlakyHandler.seen == 1
+
+
+def test_unreachable_server_raises_after_retries():
+    client = ComfyUIClient("http://127.0.0.1:9", retries=2, backoff=0.01, timeout=1)
+    try:
+        client.get_history("abc")
+    except ComfyUIError:
+        pass
+    else:
+        raise AssertionError("expected ComfyUIError")
+    assert client.stats.snapshot()["requests"] == 3
+    assert not client.is_ready(timeout=0.5)
+
+
+def test_async_client_retries():
+    server, url = serve(failures=1)
+
+    async def run():
+        client = AsyncComfyUIClient(url, backoff=0.01)
+        try:
+            return await client.get_history("abc"), client.stats.snapshot()
+        finally:
+            await client.close()
+
+    try:
+        history, stats = asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    assert history["path"] == "/history/abc"
+    assert stats["requests"] == 2
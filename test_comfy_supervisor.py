@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Supervisor tests with a stand-in ComfyUI process that floods its output
+"""
+
+import os
+import signal
+import socket
+import sys
+import time
+
+from comfy_client import ComfyUIClient
+from comfy_supervisor import ComfyUISupervisor
+
+# Writes far more than a pipe buffer before serving /system_stats, like a chatty ComfyUI
+FAKE_MAIN = """
+import http.server, sys
+port = int(sys.argv[1])
+for i in range(5000):
+    print(f"loading custom node {i} " + "x" * 80, flush=True)
+print(f"To see the GUI go to: http://127.0.0.1:{port}", flush=True)
+http.server.ThreadingHTTPServer(("127.0.0.1", port), http.server.SimpleHTTPRequestHandler).serve_forever()
+"""
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_supervisor(tmp_path, script=FAKE_MAIN):
+    (tmp_path / "system_stats").write_text("{}")
+    (tmp_path / "fake_main.py").write_text(script)
+    port = free_port()
+    client = ComfyUIClient(f"http://127.0.0.1:{port}", retries=0)
+    command = [sys.executable, "fake_main.py", str(port)]
+    return ComfyUISupervisor(str(tmp_path), port, client, command=command, ready_timeout=20)
+
+
+def test_ready_despite_output_larger_than_pipe_buffer(tmp_path):
+    supervisor = make_supervisor(tmp_path)
+    try:
+        started = time.time()
+        assert supervisor.start()
+        print(f"ready in {time.time() - started:.2f}s")
+        assert any("loading custom node 4999" in line for line in supervisor.log_tail(10))
+        assert len(supervisor.log_tail(10)) == 10
+    finally:
+        supervisor.stop()
+
+
+def test_restarts_after_crash(tmp_path):
+    supervisor = make_supervisor(tmp_path)
+    try:
+        assert supervisor.start()
+        first_pid = supervisor.pid
+        os.kill(first_pid, signal.SIGKILL)
+
+        # The watcher restarts it in the background; a job start waits for that
+        for _ in range(100):
+            if supervisor.pid != first_pid:
+                break
+            time.sleep(0.05)
+        assert supervisor.ensure_running()
+        assert supervisor.pid != first_pid
+        assert supervisor.client.is_ready()
+        assert len(supervisor.restarts) == 1
+    finally:
+        supervisor.stop()
+
+
+def test_startup_failure_is_reported(tmp_path):
+    supervisor = make_supervisor(tmp_path, script="print('Traceback: model missing'); raise SystemExit(3)")
+    supervisor.max_restarts = 0
+    assert not supervisor.start()
+    assert "Traceback: model missing" in supervisor.log_tail()
+
+
+def test_probes_back_off_after_ready_line(tmp_path):
+    # Logs the ready line 1.5s before the port accepts connections
+    script = FAKE_MAIN.replace("http.server.ThreadingHTTPServer(",
+                               "__import__('time').sleep(1.5); http.server.ThreadingHTTPServer(")
+    supervisor = make_supervisor(tmp_path, script)
+    probes = []
+    is_ready = supervisor.client.is_ready
+    supervisor.client.is_ready = lambda **kwargs: probes.append(1) or is_ready(**kwargs)
+    try:
+        assert supervisor.start()
+        assert len(probes) < 20
+    finally:
+        supervisor.stop()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Completion tracking tests against the fake ComfyUI server
+Measures how long after ComfyUI finishes the tracker returns
+"""
+
+import time
+
+import requests
+
+from comfy_events import CompletionTracker
+from fake_comfyui import FakeComfyUI
+
+WORKFLOW = {
+    "1": {"inputs": {}, "class_type": "LoadImage"},
+    "2": {"inputs": {}, "class_type": "SaveVideo"},
+}
+
+
+def run_prompt(server, connect=True):
+    """Queue WORKFLOW on the fake server and return (history entry, latency after finish)"""
+    def get_history(prompt_id):
+        return requests.get(f"{server.url}/history/{prompt_id}", timeout=5).json()
+
+    tracker = CompletionTracker(server.url, get_history)
+    if connect:
+        assert tracker.connect()
+    try:
+        result = requests.post(
+            f"{server.url}/prompt",
+            json={"prompt": WORKFLOW, "client_id": tracker.client_id},
+            timeout=5,
+        ).json()
+        prompt_id = result["prompt_id"]
+        entry = tracker.wait(prompt_id, timeout=10)
+        latency = time.time() - server.finished_at[prompt_id]
+    finally:
+        tracker.close()
+    return entry, latency
+
+
+def test_websocket_completion_latency():
+    """The websocket path should return almost immediately after ComfyUI finishes"""
+    server = FakeComfyUI(render_seconds=0.5)
+    server.start()
+    try:
+        entry, latency = run_prompt(server)
+    finally:
+        server.stop()
+
+    print(f"websocket completion latency: {latency * 1000:.1f}ms")
+    assert entry["status"]["completed"]
+    assert "2" in entry["outputs"]
+    assert latency < 0.2
+
+
+def test_falls_back_to_polling_when_socket_drops():
+    """A dropped socket should still complete via adaptive polling"""
+    server = FakeComfyUI(render_seconds=0.5, drop_websocket=True)
+    server.start()
+    try:
+        entry, latency = run_prompt(server)
+    finally:
+        server.stop()
+
+    print(f"polling fallback completion latency: {latency * 1000:.1f}ms")
+    assert entry["status"]["completed"]
+    assert latency < 1.0
+
+
+def test_polls_without_websocket():
+    """Trackers that never connected should poll history"""
+    server = FakeComfyUI(render_seconds=0.3)
+    server.start()
+    try:
+        entry, _ = run_prompt(server, connect=False)
+    finally:
+        server.stop()
+
+    assert entry["status"]["completed"]
+
+
+def test_execution_error_raises():
+    """execution_error for our prompt should surface immediately"""
+    server = FakeComfyUI(render_seconds=0.2, fail_node="2")
+    server.start()
+    try:
+        run_prompt(server)
+    except Exception as e:
+        assert "fake failure in node 2" in str(e)
+    else:
+        raise AssertionError("expected workflow failure")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    test_websocket_completion_latency()
+    test_falls_back_to_polling_when_socket_drops()
+    test_polls_without_websocket()
+    test_execution_error_raises()
+    print("All completion tracking tests passed")
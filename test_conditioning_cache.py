@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Conditioning cache node tests; need torch, so they only run inside the image
+"""
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+import conditioning_cache  # noqa: E402
+
+
+class CountingClip:
+    """Stands in for a loaded CLIP model and counts encodes"""
+
+    def __init__(self):
+        self.encodes = 0
+
+    def tokenize(self, text):
+        return text
+
+    def encode_from_tokens_scheduled(self, tokens):
+        self.encodes += 1
+        return [[torch.full((1, 4, 8), float(len(tokens))), {"pooled_output": torch.ones(1, 8)}]]
+
+
+def test_second_encode_skips_clip(monkeypatch, tmp_path):
+    monkeypatch.setattr(conditioning_cache, "store", conditioning_cache.ConditioningStore(str(tmp_path)))
+    node = conditioning_cache.CachedCLIPTextEncode()
+    clip = CountingClip()
+
+    assert node.check_lazy_status("a cat", "qwen|byt5") == ["clip"]
+    (first,) = node.encode("a cat", "qwen|byt5", clip=clip)
+    assert node.check_lazy_status("a cat", "qwen|byt5") == []
+    assert node.check_lazy_status("a cat", "other-encoder") == ["clip"]
+
+    # A fresh store (new worker) still finds it on disk
+    monkeypatch.setattr(conditioning_cache, "store", conditioning_cache.ConditioningStore(str(tmp_path)))
+    (second,) = node.encode("a cat", "qwen|byt5")
+
+    assert clip.encodes == 1
+    assert torch.equal(first[0][0], second[0][0])
+    assert torch.equal(first[0][1]["pooled_output"], second[0][1]["pooled_output"])
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Cost model fitting, persistence and timeout tests
+"""
+
+from cost_model import CostModel, gpu_class, work_units
+
+A100 = "NVIDIA A100-SXM4-80GB"
+
+
+def test_fit_per_gpu_class_and_reload(tmp_path):
+    path = str(tmp_path / "runs.jsonl")
+    model = CostModel(path=path, min_samples=3, prior=(30, 1e-6))
+
+    for frames in (16, 33, 49, 81, 129):
+        units = work_units(frames, 720, 1280, 20)
+        model.record(A100, units, 12 + 2e-7 * units)
+    model.record("NVIDIA L4", work_units(25, 720, 1280, 20), 400)
+
+    a, b, source = model.coefficients(A100)
+    assert source == "fitted"
+    assert abs(a - 12) < 0.01 and abs(b - 2e-7) < 1e-10
+    # One run isn't enough to replace the prior for the L4
+    assert model.coefficients("NVIDIA L4")[2] == "prior"
+
+    reloaded = CostModel(path=path, min_samples=3)
+    units = work_units(49, 720, 1280, 20)
+    assert abs(reloaded.estimate(A100, units) - model.estimate(A100, units)) < 0.01
+
+
+def test_timeout_scales_with_estimate_within_bounds():
+    model = CostModel(path="")
+
+    short, long = model.timeout(10), model.timeout(600)
+
+    assert short == 120
+    assert short < long <= 3600
+
+
+def test_gpu_class_from_system_stats():
+    stats = {"devices": [{"name": "cuda:0 NVIDIA A100-SXM4-80GB : cudaMallocAsync", "type": "cuda"}]}
+
+    assert gpu_class(stats) == A100
+    assert gpu_class({"devices": []}) == "unknown"
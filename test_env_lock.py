@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Environment lock tests using throwaway git repos
+"""
+
+import json
+import subprocess
+
+import pytest
+
+import env_lock
+
+
+def make_repo(path):
+    path.mkdir(parents=True)
+    subprocess.run(["git", "init", "-q", str(path)], check=True)
+    subprocess.run(["git", "-C", str(path), "-c", "user.name=t", "-c", "user.email=t@t",
+                    "commit", "-q", "--allow-empty", "-m", "init"], check=True)
+    return subprocess.run(["git", "-C", str(path), "rev-parse", "HEAD"],
+                          check=True, capture_output=True, text=True).stdout.strip()
+
+
+def test_lock_round_trip_and_drift(tmp_path):
+    comfyui = tmp_path / "ComfyUI"
+    comfy_commit = make_repo(comfyui)
+    node_commit = make_repo(comfyui / "custom_nodes" / "SomeNode")
+    lock_path = str(tmp_path / "env.lock.json")
+
+    lock = env_lock.write_lock(lock_path, str(comfyui))
+    assert lock["repos"] == {"ComfyUI": comfy_commit, "SomeNode": node_commit}
+    assert env_lock.check_lock(lock_path, str(comfyui)) == []
+
+    # Simulate a start-time `git pull` and an unexpected package upgrade
+    data = json.loads(open(lock_path).read())
+    data["repos"]["SomeNode"] = "0" * 40
+    data["packages"]["requests"] = "0.0.1"
+    with open(lock_path, "w") as f:
+        json.dump(data, f)
+
+    problems = env_lock.check_lock(lock_path, str(comfyui))
+    assert any("SomeNode" in p for p in problems)
+    assert any("requests" in p for p in problems)
+
+
+def test_clone_checks_out_pinned_commits(tmp_path):
+    comfy_commit = make_repo(tmp_path / "upstream" / "ComfyUI")
+    node_repo = tmp_path / "upstream" / "SomeNode"
+    pinned = make_repo(node_repo)
+    subprocess.run(["git", "-C", str(node_repo), "-c", "user.name=t", "-c", "user.email=t@t",
+                    "commit", "-q", "--allow-empty", "-m", "newer"], check=True)
+    sources = {
+        "SomeNode": {"url": str(node_repo), "ref": "HEAD", "commit": pinned},
+        "ComfyUI": {"url": str(tmp_path / "upstream" / "ComfyUI"), "ref": "HEAD", "commit": comfy_commit},
+    }
+    comfyui = str(tmp_path / "build" / "ComfyUI")
+
+    env_lock.clone_sources(sources, comfyui)
+    assert env_lock.git_head(f"{comfyui}/custom_nodes/SomeNode") == pinned
+    assert env_lock.check_sources(sources, comfyui) == []
+
+    sources["SomeNode"]["commit"] = "0" * 40
+    assert any("SomeNode" in p for p in env_lock.check_sources(sources, comfyui))
+
+
+def test_unpinned_sources_build_from_ref_unless_pins_are_required(tmp_path):
+    upstream = tmp_path / "upstream" / "ComfyUI"
+    head = make_repo(upstream)
+    sources = {"ComfyUI": {"url": str(upstream), "ref": "HEAD", "commit": None}}
+    with pytest.raises(RuntimeError, match="Unpinned sources: ComfyUI"):
+        env_lock.clone_sources(sources, str(tmp_path / "strict"), require_pinned=True)
+
+    comfyui = str(tmp_path / "ComfyUI")
+    env_lock.clone_sources(sources, comfyui)
+    assert env_lock.git_head(comfyui) == head
+    # Nothing to compare against, so no drift is reported at start
+    assert env_lock.check_sources(sources, comfyui) == []
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+End-to-end handler tests against the fake ComfyUI server
+"""
+
+import asyncio
+import json
+import time
+
+import handler
+from cancellation import PromptCanceller
+from comfy_client import ComfyUIClient
+from cost_model import CostModel
+from fake_comfyui import FakeComfyUI, object_info as fake_object_info
+from model_catalog import ModelCatalog, ModelScheduler
+from residency import ResidencyManager
+from result_cache import ResultCache
+from workflow_validation import ObjectInfoCache
+
+SAMPLE_IMAGE = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8DwHwAFBQIAX8jx0gAAAABJRU5ErkJggg=="
+
+TEST_JOB = {
+    "id": "test-job-stream",
+    "input": {
+        "image": SAMPLE_IMAGE,
+        "prompt": "smooth cinematic motion, high quality",
+        "num_frames": 16,
+        "steps": 4,
+        "seed": 42,
+    },
+}
+
+
+def start_fake(monkeypatch, tmp_path, **kwargs):
+    """Point the handler at a fresh fake ComfyUI rooted in tmp_path"""
+    server = FakeComfyUI(output_dir=str(tmp_path / "output"), **kwargs)
+    server.start()
+    monkeypatch.setattr(handler, "comfy", ComfyUIClient(server.url))
+    monkeypatch.setattr(handler, "COMFYUI_PATH", str(tmp_path))
+    monkeypatch.setattr(handler, "result_cache", None)
+    monkeypatch.setattr(handler, "cost_model", CostModel(path=str(tmp_path / "cost_model.jsonl")))
+    monkeypatch.setattr(handler, "gpu_name", None)
+    monkeypatch.setattr(handler, "canceller", PromptCanceller(handler.comfy, confirm_timeout=5))
+    monkeypatch.setattr(handler, "object_info", ObjectInfoCache(handler.comfy))
+    monkeypatch.setattr(handler, "residency", ResidencyManager(handler.comfy, sample_interval=0))
+    monkeypatch.setattr(handler, "model_scheduler", ModelScheduler())
+    return server
+
+
+def test_stream_handler_yields_progress_then_result(monkeypatch, tmp_path):
+    server = start_fake(monkeypatch, tmp_path, render_seconds=0.4, sampler_steps=4)
+    try:
+        events = list(handler.stream_handler(TEST_JOB))
+    finally:
+        server.stop()
+
+    result = events[-1]
+    assert result["status"] == "success", result
+    assert result["outputs"]
+
+    progress = [e for e in events[:-1] if e.get("type") == "progress"]
+    steps = [e["step"] for e in progress if e["class_type"] == "SamplerCustomAdvanced" and e["step"]]
+    assert steps == [1, 2, 3, 4]
+    assert all(e["eta"] is not None for e in progress if e["step"])
+    assert events[0]["type"] == "queued"
+
+
+def test_handler_returns_only_final_result(monkeypatch, tmp_path):
+    server = start_fake(monkeypatch, tmp_path, render_seconds=0.2)
+    try:
+        result = handler.handler(TEST_JOB)
+    finally:
+        server.stop()
+
+    assert result["status"] == "success", result
+    assert result["outputs"][0]["data"]
+    assert result["comfyui_requests"]["requests"] >= 2
+    assert result["memory"]["vram_total_mb"] == 24576
+    timings = result["timings"]
+    assert {"decode", "upload", "queue", "execute", "store_output", "total"} <= set(timings)
+    assert timings["nodes"]["125"]["class_type"] == "SamplerCustomAdvanced"
+    # Input and output are cleaned up once the response is built
+    assert not list((tmp_path / "output" / "video").iterdir())
+    assert not list((tmp_path / "input").iterdir())
+
+
+def test_result_cache_skips_comfyui_on_repeat(monkeypatch, tmp_path):
+    server = start_fake(monkeypatch, tmp_path, render_seconds=0.2)
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=10 * 1024 * 1024)
+    (tmp_path / "cache").mkdir()
+    monkeypatch.setattr(handler, "result_cache", cache)
+    try:
+        first = handler.handler(TEST_JOB)
+        # A hit must not need ComfyUI or the input folder
+        touched = []
+        with monkeypatch.context() as m:
+            m.setattr(handler, "upload_image", lambda *args: touched.append("upload"))
+            m.setattr(handler.canceller, "confirm", lambda: touched.append("confirm"))
+            m.setattr(handler.supervisor, "ensure_running", lambda: touched.append("ensure_running"))
+            second = handler.handler(TEST_JOB)
+        bypass = handler.handler({"id": "bypass", "input": {**TEST_JOB["input"], "cache": False}})
+    finally:
+        server.stop()
+
+    assert first["result_cache"]["status"] == "miss"
+    assert second["result_cache"]["status"] == "hit"
+    assert touched == []
+    assert bypass["result_cache"]["status"] == "bypass"
+    assert second["outputs"][0]["data"] == first["outputs"][0]["data"]
+    assert len(server.prompts) == 2
+    assert cache.snapshot() == {"hits": 1, "misses": 1, "stores": 1, "evictions": 0}
+
+
+VARIANT_JOB = {
+    "id": "test-job-variants",
+    "input": {
+        "image": SAMPLE_IMAGE,
+        "num_frames": 16,
+        "steps": 4,
+        "variants": [
+            {"seed": 1, "prompt": "a cat"},
+            {"seed": 2, "prompt": "a cat"},
+            {"seed": 3, "prompt": "a dog"},
+        ],
+    },
+}
+
+
+def test_variants_share_one_graph(monkeypatch, tmp_path):
+    server = start_fake(monkeypatch, tmp_path, render_seconds=0.2)
+    try:
+        result = handler.handler(VARIANT_JOB)
+    finally:
+        server.stop()
+
+    assert result["status"] == "success", result
+    assert sorted(output["variant"] for output in result["outputs"]) == [0, 1, 2]
+    assert [variant["seed"] for variant in result["variants"]] == [1, 2, 3]
+
+    (prompt,) = server.prompts.values()
+    class_types = [node["class_type"] for node in prompt.values()]
+    assert class_types.count("LoadImage") == 1
+    assert class_types.count("CLIPVisionEncode") == 1
+    assert class_types.count("HunyuanVideo15ImageToVideo") == 2
+    assert class_types.count("SaveVideo") == 3
+
+
+def test_failed_variant_reports_its_own_error(monkeypatch, tmp_path):
+    server = start_fake(monkeypatch, tmp_path, render_seconds=0.2, fail_node="v1_125")
+    try:
+        result = handler.handler(VARIANT_JOB)
+    finally:
+        server.stop()
+
+    assert result["status"] == "partial", result
+    assert [output["variant"] for output in result["outputs"]] == [0]
+    statuses = [variant["status"] for variant in result["variants"]]
+    assert statuses == ["success", "error", "error"]
+    assert "fake failure in node v1_125" in result["variants"][1]["error"]
+    assert "another variant failed" in result["variants"][2]["error"]
+
+
+def test_jobs_over_budget_are_rejected_before_queueing(monkeypatch, tmp_path):
+    server = start_fake(monkeypatch, tmp_path, render_seconds=0.2)
+    monkeypatch.setattr(handler, "JOB_BUDGET_SECONDS", 300)
+    try:
+        small = handler.handler(TEST_JOB)
+        large = handler.handler({"id": "large", "input": {**TEST_JOB["input"], "num_frames": 129, "steps": 30}})
+    finally:
+        server.stop()
+
+    assert small["status"] == "success", small
+    assert 0 < small["estimated_seconds"] <= 300
+    assert "over the 300s budget" in large["error"]
+    assert large["estimated_seconds"] > 300
+    assert len(server.prompts) == 1
+    assert handler.cost_model.pending == 0
+
+
+def test_cost_model_records_render_time_without_websocket(monkeypatch, tmp_path):
+    server = start_fake(monkeypatch, tmp_path, render_seconds=0.4, drop_websocket=True)
+    try:
+        result = handler.handler(TEST_JOB)
+    finally:
+        server.stop()
+
+    assert result["status"] == "success", result
+    # No node timings arrive over a dropped socket; the wall-clock render time is recorded instead
+    (sample,) = [json.loads(line) for line in (tmp_path / "cost_model.jsonl").read_text().splitlines()]
+    assert sample["seconds"] >= 0.4
+
+
+def test_timed_out_job_is_interrupted_before_the_next_one(monkeypatch, tmp_path):
+    server = start_fake(monkeypatch, tmp_path, render_seconds=5, sampler_steps=50)
+    monkeypatch.setattr(handler.cost_model, "timeout", lambda estimate: 1.0)
+    try:
+        timed_out = handler.handler(TEST_JOB)
+        queue = handler.comfy.get_queue()
+    finally:
+        server.stop()
+
+    assert "timed out" in timed_out["error"]
+    assert server.interrupts == 1
+    assert queue == {"queue_running": [], "queue_pending": []}
+    (prompt_id,) = server.history
+    assert server.history[prompt_id]["status"]["messages"][0][0] == "execution_interrupted"
+
+
+def test_named_template_with_overrides(monkeypatch, tmp_path):
+    server = start_fake(monkeypatch, tmp_path, render_seconds=0.2)
+    job = {"id": "template", "input": {"image": SAMPLE_IMAGE, "template": "hunyuan_i2v",
+                                       "params": {"steps": 3, "num_frames": 9, "seed": 5}}}
+    typo = {"id": "typo", "input": {"image": SAMPLE_IMAGE, "template": "hunyuan_i2v", "params": {"stpes": 3}}}
+    try:
+        result = handler.handler(job)
+        rejected = handler.handler(typo)
+    finally:
+        server.stop()
+
+    assert result["status"] == "success", result
+    (prompt,) = server.prompts.values()
+    assert prompt["126"]["inputs"]["steps"] == 3
+    assert prompt["78"]["inputs"]["length"] == 9
+    assert prompt["127"]["inputs"]["noise_seed"] == 5
+    assert "no parameter(s) stpes" in rejected["error"]
+
+
+def test_model_variant_sets_unet_and_defaults(monkeypatch, tmp_path):
+    server = start_fake(monkeypatch, tmp_path, render_seconds=0.1)
+    monkeypatch.setattr(handler, "model_catalog", ModelCatalog(selection="480p_step_distilled"))
+    defaults = {key: value for key, value in TEST_JOB["input"].items() if key != "steps"}
+    fast = {"id": "fast", "input": {**defaults, "model": "480p_step_distilled"}}
+    disabled = {"id": "disabled", "input": {**TEST_JOB["input"], "model": "480p_cfg_distilled"}}
+    try:
+        first = handler.handler(fast)
+        second = handler.handler(TEST_JOB)
+        rejected = handler.handler(disabled)
+    finally:
+        server.stop()
+
+    assert first["status"] == "success", first
+    assert second["status"] == "success", second
+    prompt = next(iter(server.prompts.values()))
+    assert prompt["12"]["inputs"]["unet_name"] == "hunyuanvideo1.5_480p_i2v_step_distilled_fp8_scaled.safetensors"
+    assert prompt["126"]["inputs"]["steps"] == 8
+    assert (prompt["78"]["inputs"]["width"], prompt["78"]["inputs"]["height"]) == (480, 848)
+    assert first["model"]["variant"] == "480p_step_distilled"
+    assert second["model"]["variant"] == "720p_cfg_distilled"
+    assert second["model"]["switched"] and second["model"]["scheduler"]["switches"] == 1
+    assert "not provisioned" in rejected["error"]
+
+
+def test_long_clip_gets_tiled_vae_decode(monkeypatch, tmp_path):
+    server = start_fake(monkeypatch, tmp_path, render_seconds=0.1)
+    long_clip = {"id": "long", "input": {**TEST_JOB["input"], "num_frames": 121}}
+    try:
+        short = handler.handler(TEST_JOB)
+        long = handler.handler(long_clip)
+    finally:
+        server.stop()
+
+    assert short["vae_decode"]["mode"] == "full", short
+    assert long["status"] == "success", long
+    assert long["vae_decode"]["mode"] == "tiled"
+    assert long["vae_decode"]["budget_mb"] == 24576 - 6144
+    decode = list(server.prompts.values())[-1]["8"]
+    assert decode["class_type"] == "VAEDecodeTiled"
+    assert decode["inputs"]["tile_size"] == long["vae_decode"]["tile_size"]
+
+
+def test_accel_mode_inserts_cache_node(monkeypatch, tmp_path):
+    server = start_fake(monkeypatch, tmp_path, render_seconds=0.1)
+    cached = {"id": "cached", "input": {**TEST_JOB["input"], "accel": "easycache"}}
+    missing = {"id": "missing", "input": {**TEST_JOB["input"], "accel": "fbcache"}}
+    try:
+        result = handler.handler(cached)
+        rejected = handler.handler(missing)
+    finally:
+        server.stop()
+
+    assert result["status"] == "success", result
+    assert result["accel"] == "easycache"
+    (prompt,) = server.prompts.values()
+    assert prompt["130_accel"]["class_type"] == "EasyCache"
+    assert prompt["129"]["inputs"]["model"] == ["130_accel", 0]
+    assert "needs the ApplyFBCacheOnModel node" in rejected["error"]
+
+
+def test_custom_workflow_loads_the_uploaded_image(monkeypatch, tmp_path):
+    server = start_fake(monkeypatch, tmp_path, render_seconds=0.1)
+    with open("example_workflow.json") as f:
+        workflow = json.load(f)["workflow"]
+    try:
+        result = handler.handler({"id": "custom", "input": {"image": SAMPLE_IMAGE, "workflow": workflow}})
+    finally:
+        server.stop()
+
+    assert result["status"] == "success", result
+    (prompt,) = server.prompts.values()
+    (load_image,) = [node for node in prompt.values() if node["class_type"] == "LoadImage"]
+    uploaded = handler.content_filename(handler.decode_image(SAMPLE_IMAGE))
+    assert load_image["inputs"]["image"] == uploaded
+    assert workflow["80"]["inputs"]["image"] == "$INPUT_IMAGE"
+
+
+def test_invalid_custom_workflow_is_rejected_before_queueing(monkeypatch, tmp_path):
+    server = start_fake(monkeypatch, tmp_path, render_seconds=0.2)
+    workflow = handler.create_default_workflow("in.png", seed=1)
+    workflow["12"]["inputs"]["unet_name"] = "missing_model.safetensors"
+    try:
+        result = handler.handler({"id": "bad-graph", "input": {"image": SAMPLE_IMAGE, "workflow": workflow}})
+        # Rejected from the cached /object_info, before the image is even downloaded
+        fetched = []
+        monkeypatch.setattr(handler.image_fetcher, "fetch", lambda url: fetched.append(url))
+        from_url = handler.handler({"id": "bad-graph-url",
+                                    "input": {"image_url": "http://example.invalid/in.png", "workflow": workflow}})
+    finally:
+        server.stop()
+
+    assert result["error"].startswith("Invalid workflow: node 12 (UNETLoader)")
+    assert "unet_name" in result["node_errors"]["12"]["errors"][0]
+    assert from_url["error"] == result["error"]
+    assert fetched == []
+    assert not server.prompts
+
+
+def test_default_workflow_uses_conditioning_cache(monkeypatch):
+    monkeypatch.setattr(handler, "CONDITIONING_CACHE", True)
+    monkeypatch.setattr(handler, "conditioning_cache_available", lambda: True)
+    workflow = handler.create_default_workflow("in.png", prompt="a cat", seed=1)
+
+    for node_id in ("44", "93"):
+        assert workflow[node_id]["class_type"] == "CachedCLIPTextEncode"
+    assert workflow["44"]["inputs"]["encoder"] == workflow["93"]["inputs"]["encoder"]
+
+    # A different text encoder file must not share cached conditioning
+    workflow["11"]["inputs"]["clip_name2"] = "other_byt5.safetensors"
+    for node_id in ("44", "93"):
+        workflow[node_id]["class_type"] = "CLIPTextEncode"
+    encoder = handler.use_conditioning_cache(workflow)["44"]["inputs"]["encoder"]
+    assert encoder != handler.create_default_workflow("in.png", seed=1)["44"]["inputs"]["encoder"]
+
+
+def test_default_workflow_falls_back_without_cache_node(monkeypatch, tmp_path):
+    # e.g. a bind-mounted custom_nodes folder hiding conditioning_cache.py
+    definitions = {key: value for key, value in fake_object_info().items() if key != "CachedCLIPTextEncode"}
+    server = start_fake(monkeypatch, tmp_path, render_seconds=0.1)
+    monkeypatch.setattr(handler, "CONDITIONING_CACHE", True)
+    monkeypatch.setattr(handler.object_info, "get", lambda refresh=False: definitions)
+    try:
+        result = handler.handler(TEST_JOB)
+    finally:
+        server.stop()
+
+    assert result["status"] == "success", result
+    (prompt,) = server.prompts.values()
+    assert {prompt[node_id]["class_type"] for node_id in ("44", "93")} == {"CLIPTextEncode"}
+
+
+def test_conditioning_cache_skips_clip_behind_lora():
+    workflow = {
+        "1": {"class_type": "DualCLIPLoader", "inputs": {"clip_name1": "a.safetensors", "clip_name2": "b.safetensors",
+                                                         "type": "hunyuan_video_15"}},
+        "2": {"class_type": "LoraLoader", "inputs": {"clip": ["1", 0], "model": ["9", 0],
+                                                     "lora_name": "style.safetensors", "strength_clip": 1.0}},
+        "3": {"class_type": "CLIPTextEncode", "inputs": {"clip": ["2", 1], "text": "a cat"}},
+        "4": {"class_type": "CLIPTextEncode", "inputs": {"clip": ["1", 0], "text": "a cat"}},
+    }
+    handler.use_conditioning_cache(workflow)
+
+    assert workflow["3"]["class_type"] == "CLIPTextEncode"
+    assert "encoder" not in workflow["3"]["inputs"]
+    assert workflow["4"]["class_type"] == "CachedCLIPTextEncode"
+
+
+def test_upload_image_is_content_addressed(monkeypatch, tmp_path):
+    monkeypatch.setattr(handler, "COMFYUI_PATH", str(tmp_path))
+
+    first = handler.upload_image(SAMPLE_IMAGE)
+    again = handler.upload_image(f"data:image/png;base64,{SAMPLE_IMAGE}")
+    other = handler.upload_image(b"\xff\xd8\xff\xe0 not really a jpeg")
+
+    assert first == again
+    assert first.endswith(".png")
+    assert other != first and other.endswith(".jpg")
+    assert sorted(p.name for p in (tmp_path / "input").iterdir()) == sorted([first, other])
+
+
+def test_async_handler_runs_jobs_concurrently(monkeypatch, tmp_path):
+    server = start_fake(monkeypatch, tmp_path, render_seconds=0.2)
+
+    jobs = []
+    for i in range(3):
+        job = {"id": f"job-{i}", "input": dict(TEST_JOB["input"], seed=i)}
+        jobs.append(job)
+
+    async def run_all():
+        return await asyncio.gather(*(handler.async_handler(job) for job in jobs))
+
+    try:
+        results = asyncio.run(run_all())
+    finally:
+        server.stop()
+
+    assert all(r["status"] == "success" for r in results), results
+    assert len({r["prompt_id"] for r in results}) == 3
+
+
+def test_runpod_cancellation_interrupts_prompt_with_one_job_at_a_time(monkeypatch, tmp_path):
+    server = start_fake(monkeypatch, tmp_path, render_seconds=5, sampler_steps=50)
+    monkeypatch.setattr(handler, "MAX_CONCURRENCY", 1)
+    config = handler.worker_config()
+    assert "concurrency_modifier" not in config
+
+    async def run_then_cancel():
+        # What RunPod's stop_job does to the job's task
+        task = asyncio.create_task(config["handler"]({"id": "cancel-me", "input": TEST_JOB["input"]}))
+        while not server.prompts:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.3)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    started = time.monotonic()
+    try:
+        asyncio.run(run_then_cancel())
+    finally:
+        server.stop()
+
+    assert server.interrupts == 1
+    assert time.monotonic() - started < 4
+
+
+def test_warm_up_runs_once_per_comfyui_process(monkeypatch, tmp_path):
+    server = start_fake(monkeypatch, tmp_path, render_seconds=0.2)
+    monkeypatch.setattr(handler, "CONDITIONING_CACHE", True)
+    marker = tmp_path / "warm.json"
+    monkeypatch.setattr(handler, "WARMUP_MARKER", str(marker))
+    try:
+        first = handler.warm_up()
+        second = handler.warm_up()
+    finally:
+        server.stop()
+
+    assert first and "12" in first
+    assert second is None
+    # Text encoders must actually load, so the warm-up prompt bypasses the conditioning cache
+    (warm_prompt,) = server.prompts.values()
+    class_types = {node["class_type"] for node in warm_prompt.values()}
+    assert "CLIPTextEncode" in class_types and "CachedCLIPTextEncode" not in class_types
+    assert marker.exists()
+    assert not list((tmp_path / "output" / "video").iterdir())
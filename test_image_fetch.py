@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Image URL fetcher tests against a local HTTP server with ETag support
+"""
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from image_fetch import FetchError, ImageFetcher
+
+IMAGE = b"\x89PNG\r\n\x1a\n" + b"x" * 4096
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    """Serve IMAGE with an ETag; /big has no Content-Length; /nocache has no validators"""
+
+    protocol_version = "HTTP/1.1"
+    requests_seen = []
+
+    def do_GET(self):
+        ImageHandler.requests_seen.append((self.path, self.headers.get("If-None-Match")))
+        path = self.path.split("?")[0]
+        if path == "/big":
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for _ in range(4):
+                self.wfile.write(b"1000\r\n" + b"y" * 4096 + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+            return
+
+        if path == "/image.png" and self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(IMAGE)))
+        if path == "/image.png":
+            self.send_header("ETag", '"v1"')
+        self.end_headers()
+        self.wfile.write(IMAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def url():
+    ImageHandler.requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ImageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_repeat_fetch_revalidates_with_etag(url, tmp_path):
+    fetcher = ImageFetcher(cache_dir=str(tmp_path))
+
+    first, first_info = fetcher.fetch(f"{url}/image.png")
+    second, second_info = fetcher.fetch(f"{url}/image.png")
+
+    assert first == second == IMAGE
+    assert (first_info["source"], second_info["source"]) == ("network", "cache")
+    assert ImageHandler.requests_seen == [("/image.png", None), ("/image.png", '"v1"')]
+    assert fetcher.snapshot()["bytes_downloaded"] == len(IMAGE)
+
+
+def test_responses_without_validators_are_not_cached(url, tmp_path):
+    fetcher = ImageFetcher(cache_dir=str(tmp_path))
+
+    fetcher.fetch(f"{url}/nocache")
+    _, info = fetcher.fetch(f"{url}/nocache")
+
+    assert info["source"] == "network"
+    assert not list(tmp_path.iterdir())
+
+
+def test_size_limit_applies_with_and_without_content_length(url, tmp_path):
+    fetcher = ImageFetcher(cache_dir=str(tmp_path), max_bytes=1024)
+
+    with pytest.raises(FetchError, match="byte limit"):
+        fetcher.fetch(f"{url}/image.png")
+    with pytest.raises(FetchError, match="byte limit"):
+        fetcher.fetch(f"{url}/big")
+
+
+def test_cache_evicts_least_recently_used(url, tmp_path):
+    fetcher = ImageFetcher(cache_dir=str(tmp_path), cache_max_bytes=len(IMAGE))
+
+    fetcher.fetch(f"{url}/image.png?old")
+    (old_body,) = tmp_path.glob("*.body")
+    os.utime(old_body, (1, 1))
+    fetcher.fetch(f"{url}/image.png?new")
+
+    (body,) = tmp_path.glob("*.body")
+    assert body != old_body
+    assert not old_body.with_suffix(".json").exists()
+
+
+def test_body_evicted_after_lookup_is_downloaded_again(url, tmp_path):
+    fetcher = ImageFetcher(cache_dir=str(tmp_path))
+    fetcher.fetch(f"{url}/image.png")
+
+    # Another job evicts the body between the cache lookup and the 304
+    cached = fetcher._cached
+
+    def cached_then_evicted(image_url):
+        meta, body_path = cached(image_url)
+        os.remove(body_path)
+        return meta, body_path
+
+    fetcher._cached = cached_then_evicted
+    data, info = fetcher.fetch(f"{url}/image.png")
+
+    assert data == IMAGE
+    assert info["source"] == "network"
+    assert ImageHandler.requests_seen[1:] == [("/image.png", '"v1"'), ("/image.png", None)]
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Input image preprocessing tests
+"""
+
+import io
+
+import pytest
+from PIL import Image
+
+import image_preprocess
+from image_preprocess import ImageError, preprocess_image, validate_image
+
+
+def jpeg_bytes(width, height, color=(200, 30, 30)):
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(out, format="JPEG")
+    return out.getvalue()
+
+
+def test_crops_and_resizes_to_target():
+    data, info = preprocess_image(jpeg_bytes(4000, 3000), 720, 1280)
+
+    image = Image.open(io.BytesIO(data))
+    assert image.format == "PNG"
+    assert image.size == (720, 1280)
+    assert info["source_size"] == [4000, 3000]
+
+
+def test_applies_exif_orientation():
+    # Stored landscape, displayed portrait: the left half of the stored image is red
+    image = Image.new("RGB", (400, 200), (0, 0, 255))
+    image.paste((255, 0, 0), (0, 0, 200, 200))
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    out = io.BytesIO()
+    image.save(out, format="JPEG", exif=exif)
+
+    data, _ = preprocess_image(out.getvalue(), 100, 200, fmt="webp")
+
+    result = Image.open(io.BytesIO(data))
+    assert (result.format, result.size) == ("WEBP", (100, 200))
+    result = result.convert("RGB")
+    top, bottom = result.getpixel((50, 20)), result.getpixel((50, 180))
+    assert top[0] > 200 and top[2] < 60
+    assert bottom[2] > 200 and bottom[0] < 60
+
+
+@pytest.mark.parametrize("data", [b"", b"definitely not an image", jpeg_bytes(640, 480)[:400]])
+def test_rejects_invalid_images(data):
+    with pytest.raises(ImageError):
+        preprocess_image(data, 720, 1280)
+    with pytest.raises(ImageError):
+        validate_image(data)
+
+
+def test_rejects_oversized_images(monkeypatch):
+    monkeypatch.setattr(image_preprocess, "MAX_INPUT_PIXELS", 1000)
+    with pytest.raises(ImageError, match="pixel limit"):
+        preprocess_image(jpeg_bytes(100, 100), 720, 1280)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Model variant catalog and model-aware scheduling tests
+"""
+
+import threading
+import time
+
+import pytest
+
+from model_catalog import ModelCatalog, ModelError, ModelScheduler, enabled_variants
+
+MANIFEST = {
+    "default_variant": "720p",
+    "variants": {"720p": {"unet": "a.safetensors"}, "480p": {"unet": "b.safetensors"}},
+}
+
+
+def test_default_variant_is_always_enabled():
+    assert enabled_variants(MANIFEST, "") == ["720p"]
+    assert enabled_variants(MANIFEST, "480p") == ["720p", "480p"]
+    assert enabled_variants(MANIFEST, "all") == ["720p", "480p"]
+    with pytest.raises(ModelError):
+        enabled_variants(MANIFEST, "1080p")
+
+
+def test_catalog_rejects_disabled_variants():
+    catalog = ModelCatalog(selection="")
+    assert catalog.get()["key"] == catalog.default
+    assert catalog.key_for(catalog.get()["unet"]) == catalog.default
+    with pytest.raises(ModelError, match="not provisioned"):
+        catalog.get("480p_step_distilled")
+
+
+def run_jobs(scheduler, models, hold=0.05, stagger=0.01):
+    """Start one job per model a little apart; returns the order they were admitted in"""
+    order = []
+    lock = threading.Lock()
+
+    def job(model):
+        scheduler.acquire(model)
+        with lock:
+            order.append(model)
+        time.sleep(hold)
+        scheduler.release()
+
+    threads = []
+    for model in models:
+        thread = threading.Thread(target=job, args=(model,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(stagger)
+    for thread in threads:
+        thread.join(timeout=10)
+    return order
+
+
+def test_same_model_jobs_run_before_switching():
+    scheduler = ModelScheduler(max_wait=10)
+    order = run_jobs(scheduler, ["a", "b", "a", "b", "a"])
+
+    assert order == ["a", "a", "a", "b", "b"]
+    assert scheduler.switches == 1
+
+
+def test_waiting_model_is_not_starved():
+    scheduler = ModelScheduler(max_wait=0.1)
+    order = run_jobs(scheduler, ["a", "b"] + ["a"] * 8, hold=0.1, stagger=0.03)
+
+    assert order.index("b") < len(order) - 1
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Output sink tests: inline fallback and streamed S3 upload against a local moto server
+Requires: pip install "moto[server]" boto3
+"""
+
+import base64
+import os
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pytest
+import requests
+
+from output_sink import AutoSink, InlineSink, S3Sink
+
+MB = 1024 * 1024
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def s3_endpoint():
+    """Run moto's S3 server in a separate process so its memory isn't measured"""
+    pytest.importorskip("boto3")
+    pytest.importorskip("moto.server")
+
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "moto.server", "-H", "127.0.0.1", "-p", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                requests.get(url, timeout=1)
+                break
+            except requests.RequestException:
+                time.sleep(0.1)
+        yield url
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+@pytest.fixture
+def s3_sink(s3_endpoint, monkeypatch):
+    import boto3
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    boto3.client("s3", endpoint_url=s3_endpoint, region_name="us-east-1").create_bucket(Bucket="outputs")
+    return S3Sink("outputs", prefix="videos/", endpoint_url=s3_endpoint, region="us-east-1",
+                  part_size_mb=5, max_concurrency=2)
+
+
+def write_file(path, size):
+    with open(path, "wb") as f:
+        for _ in range(size // MB):
+            f.write(os.urandom(MB))
+    return str(path)
+
+
+def test_inline_sink_matches_plain_base64(tmp_path):
+    path = tmp_path / "clip.mp4"
+    # Not a multiple of the encoder's chunk size, so the tail is padded
+    data = os.urandom(3 * MB + 17)
+    path.write_bytes(data)
+
+    assert InlineSink().store(str(path))["data"] == base64.b64encode(data).decode()
+
+
+def test_s3_upload_returns_working_presigned_url(s3_sink, tmp_path):
+    path = write_file(tmp_path / "clip.mp4", 12 * MB)
+
+    stored = s3_sink.store(path, job_id="job-1")
+
+    assert stored["key"] == "videos/job-1/clip.mp4"
+    assert stored["size"] == 12 * MB
+    downloaded = requests.get(stored["url"], timeout=30)
+    assert downloaded.status_code == 200
+    assert downloaded.content == open(path, "rb").read()
+
+
+def test_s3_upload_memory_is_flat(s3_sink, tmp_path):
+    """Peak allocations should track part size x concurrency, not file size"""
+    peaks = {}
+    for size_mb in (10, 60):
+        path = write_file(tmp_path / f"clip_{size_mb}.mp4", size_mb * MB)
+        tracemalloc.start()
+        s3_sink.store(path, job_id="job-mem")
+        peaks[size_mb] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    print({k: f"{v / MB:.1f}MB" for k, v in peaks.items()})
+    assert peaks[60] < 25 * MB
+    assert peaks[60] < peaks[10] * 2.5
+
+
+def test_auto_sink_only_uploads_large_files(s3_sink, tmp_path):
+    sink = AutoSink(s3_sink, inline_max_bytes=2 * MB)
+    small = write_file(tmp_path / "small.mp4", 1 * MB)
+    large = write_file(tmp_path / "large.mp4", 3 * MB)
+
+    assert "data" in sink.store(small, job_id="job-2")
+    assert "url" in sink.store(large, job_id="job-2")
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Model provisioning tests against a local HTTP server that serves fixture files,
+supports Range requests and drops connections partway through
+"""
+
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import provision_models
+
+KB = 1024
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """
+    Serve FILES by path; the first `drops` GETs are cut off after `drop_after` bytes.
+    HEAD sends the X-Linked-* headers in `linked` like a Hugging Face resolve URL
+    """
+
+    protocol_version = "HTTP/1.1"
+    files = {}
+    linked = {}
+    drops = 0
+    drop_after = 0
+    ranges_seen = []
+    lock = threading.Lock()
+
+    def _headers(self, status, length, extra=None):
+        self.send_response(status)
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        for key, value in (extra or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+
+    def do_HEAD(self):
+        data = self.files.get(self.path)
+        if data is None:
+            self._headers(404, 0)
+            return
+        self._headers(200, len(data), self.linked.get(self.path))
+
+    def do_GET(self):
+        data = self.files.get(self.path)
+        if data is None:
+            self._headers(404, 0)
+            return
+
+        start, end = 0, len(data) - 1
+        status = 200
+        header = self.headers.get("Range")
+        if header:
+            first, last = header.split("=", 1)[1].split("-")
+            start, end = int(first), int(last or len(data) - 1)
+            status = 206
+
+        with FixtureHandler.lock:
+            FixtureHandler.ranges_seen.append((self.path, start, end))
+            drop = FixtureHandler.drops > 0
+            if drop:
+                FixtureHandler.drops -= 1
+
+        body = data[start:end + 1]
+        self._headers(status, len(body), {"Content-Range": f"bytes {start}-{end}/{len(data)}"})
+        if drop:
+            self.wfile.write(body[:self.drop_after])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(files, drops=0, drop_after=100 * KB, linked=None):
+    FixtureHandler.files = files
+    FixtureHandler.linked = linked or {}
+    FixtureHandler.drops = drops
+    FixtureHandler.drop_after = drop_after
+    FixtureHandler.ranges_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def make_models(url, files, corrupt_hash=False):
+    models = []
+    for i, (path, data) in enumerate(files.items()):
+        digest = hashlib.sha256(data).hexdigest()
+        models.append({
+            "name": f"model {i}",
+            "filename": path.strip("/"),
+            "subdir": "diffusion_models",
+            "url": f"{url}{path}",
+            "size": len(data),
+            "sha256": "0" * 64 if corrupt_hash else digest,
+        })
+    return models
+
+
+def fixture_files():
+    return {
+        "/unet.safetensors": os.urandom(1500 * KB + 7),
+        "/vae.safetensors": os.urandom(900 * KB),
+    }
+
+
+def test_concurrent_download_survives_dropped_connections(tmp_path):
+    files = fixture_files()
+    server, url = serve(files, drops=4)
+    try:
+        results = provision_models.provision(make_models(url, files), str(tmp_path),
+                                             connections=3, chunk_mb=1, retries=3, backoff=0.01)
+    finally:
+        server.shutdown()
+
+    assert set(results.values()) == {"downloaded"}, results
+    for path, data in files.items():
+        assert (tmp_path / "diffusion_models" / path.strip("/")).read_bytes() == data
+    assert not list((tmp_path / "diffusion_models").glob("*.part*"))
+
+
+def test_resumes_from_completed_chunks(tmp_path):
+    data = os.urandom(3 * 1024 * KB)
+    files = {"/unet.safetensors": data}
+
+    # First run: every request dies and retries are exhausted on some chunks
+    server, url = serve(files, drops=2, drop_after=10 * KB)
+    try:
+        first = provision_models.provision(make_models(url, files), str(tmp_path),
+                                           connections=1, chunk_mb=1, retries=0, backoff=0.01)
+    finally:
+        server.shutdown()
+    assert first["unet.safetensors"].startswith("error")
+    state = json.loads((tmp_path / "diffusion_models" / "unet.safetensors.part.json").read_text())
+    assert state["done"]
+
+    # Second run only fetches the chunks that didn't finish
+    server, url = serve(files)
+    try:
+        second = provision_models.provision(make_models(url, files), str(tmp_path),
+                                            connections=2, chunk_mb=1, backoff=0.01)
+    finally:
+        server.shutdown()
+
+    assert second["unet.safetensors"] == "downloaded"
+    assert (tmp_path / "diffusion_models" / "unet.safetensors").read_bytes() == data
+    fetched_starts = {start for _, start, _ in FixtureHandler.ranges_seen}
+    assert not fetched_starts & {i * 1024 * KB for i in state["done"]}
+
+
+def test_checksum_mismatch_leaves_no_file(tmp_path):
+    files = {"/vae.safetensors": os.urandom(300 * KB)}
+    server, url = serve(files)
+    try:
+        results = provision_models.provision(make_models(url, files, corrupt_hash=True), str(tmp_path),
+                                             chunk_mb=1, backoff=0.01)
+    finally:
+        server.shutdown()
+
+    assert "sha256 mismatch" in results["vae.safetensors"]
+    assert not list((tmp_path / "diffusion_models").iterdir())
+
+
+def test_existing_files_are_skipped(tmp_path):
+    files = {"/vae.safetensors": os.urandom(200 * KB)}
+    target = tmp_path / "diffusion_models" / "vae.safetensors"
+    target.parent.mkdir()
+    target.write_bytes(files["/vae.safetensors"])
+
+    server, url = serve(files)
+    try:
+        results = provision_models.provision(make_models(url, files), str(tmp_path), verify_existing=True)
+    finally:
+        server.shutdown()
+
+    assert results["vae.safetensors"] == "present"
+    assert FixtureHandler.ranges_seen == []
+
+
+def unpinned(models):
+    return [{**entry, "size": None, "sha256": None} for entry in models]
+
+
+def linked_headers(data):
+    return {"X-Linked-Size": str(len(data)), "X-Linked-Etag": f'"{hashlib.sha256(data).hexdigest()}"'}
+
+
+def test_unpinned_models_use_published_checksum(tmp_path):
+    good = os.urandom(300 * KB)
+    files = {"/vae.safetensors": good}
+    # The server publishes the checksum of different content than it serves
+    server, url = serve(files, linked={"/vae.safetensors": linked_headers(os.urandom(300 * KB))})
+    try:
+        results = provision_models.provision(unpinned(make_models(url, files)), str(tmp_path), backoff=0.01)
+    finally:
+        server.shutdown()
+
+    assert "sha256 mismatch" in results["vae.safetensors"]
+    assert not list((tmp_path / "diffusion_models").iterdir())
+
+
+def test_truncated_existing_file_is_downloaded_again(tmp_path):
+    data = os.urandom(500 * KB)
+    files = {"/unet.safetensors": data}
+    target = tmp_path / "diffusion_models" / "unet.safetensors"
+    target.parent.mkdir()
+    # Left behind by an interrupted `wget -c` or copy
+    target.write_bytes(data[:200 * KB])
+
+    server, url = serve(files, linked={"/unet.safetensors": linked_headers(data)})
+    try:
+        results = provision_models.provision(unpinned(make_models(url, files)), str(tmp_path),
+                                             chunk_mb=1, backoff=0.01)
+        again = provision_models.provision(unpinned(make_models(url, files)), str(tmp_path), verify_existing=True)
+    finally:
+        server.shutdown()
+
+    assert results["unet.safetensors"] == "downloaded"
+    assert again["unet.safetensors"] == "present"
+    assert target.read_bytes() == data
+
+
+def test_manifest_only_includes_enabled_variants(tmp_path):
+    manifest = tmp_path / "models_manifest.json"
+    manifest.write_text(json.dumps({
+        "default_variant": "720p",
+        "variants": {"720p": {"unet": "unet_720p.safetensors"}, "480p": {"unet": "unet_480p.safetensors"}},
+        "models": [
+            {"name": "UNet 720p", "filename": "unet_720p.safetensors", "subdir": "diffusion_models", "variant": "720p"},
+            {"name": "UNet 480p", "filename": "unet_480p.safetensors", "subdir": "diffusion_models", "variant": "480p"},
+            {"name": "VAE", "filename": "vae.safetensors", "subdir": "vae"},
+        ],
+    }))
+
+    default = [entry["filename"] for entry in provision_models.load_manifest(str(manifest), "")]
+    everything = [entry["filename"] for entry in provision_models.load_manifest(str(manifest), "all")]
+
+    assert default == ["unet_720p.safetensors", "vae.safetensors"]
+    assert everything == ["unet_720p.safetensors", "unet_480p.safetensors", "vae.safetensors"]
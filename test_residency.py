@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Residency policies and per-job memory reports against the fake ComfyUI's memory figures
+"""
+
+import time
+
+import requests
+
+from comfy_client import ComfyUIClient
+from fake_comfyui import FakeComfyUI
+from residency import ResidencyManager
+
+
+def run_prompt(server):
+    """Queue a one-node prompt and wait for it to finish"""
+    prompt = {"1": {"class_type": "SamplerCustomAdvanced", "inputs": {}}}
+    prompt_id = requests.post(f"{server.url}/prompt", json={"prompt": prompt}, timeout=5).json()["prompt_id"]
+    while prompt_id not in server.history:
+        time.sleep(0.01)
+
+
+def test_peak_memory_is_sampled_during_the_job():
+    server = FakeComfyUI(render_seconds=0.4, model_vram_mb=12000, job_vram_mb=6000)
+    server.start()
+    manager = ResidencyManager(ComfyUIClient(server.url), policy="keep", sample_interval=0.05)
+    manager.start()
+    try:
+        job = manager.begin()
+        run_prompt(server)
+        report = manager.end(job)
+    finally:
+        manager.stop()
+        server.stop()
+
+    assert report["vram_used_before_mb"] == 0
+    assert report["vram_peak_mb"] == 18000
+    assert report["vram_used_after_mb"] == 12000
+    assert report["samples"] > 2
+    assert "freed" not in report
+    assert server.frees == []
+
+
+def test_pressure_unloads_only_when_memory_runs_low():
+    server = FakeComfyUI(render_seconds=0.1, vram_total_mb=16384, model_vram_mb=13000)
+    server.start()
+    manager = ResidencyManager(ComfyUIClient(server.url), policy="pressure", min_free_vram_mb=4096, sample_interval=0)
+    roomy = ResidencyManager(ComfyUIClient(server.url), policy="pressure", min_free_vram_mb=1024, sample_interval=0)
+    try:
+        job = roomy.begin()
+        run_prompt(server)
+        kept = roomy.end(job)
+        loaded_after_roomy = server.models_loaded
+
+        job = manager.begin()
+        run_prompt(server)
+        freed = manager.end(job)
+    finally:
+        server.stop()
+
+    assert "freed" not in kept and loaded_after_roomy
+    # Low before the job: only cached memory is released; low after it: models are unloaded
+    assert freed["freed"] == [
+        {"reason": "pressure", "unload_models": False},
+        {"reason": "pressure", "unload_models": True},
+    ]
+    assert server.frees == [
+        {"unload_models": False, "free_memory": True},
+        {"unload_models": True, "free_memory": True},
+    ]
+    assert not server.models_loaded
+    assert manager.frees["pressure"] == 2
+
+
+def test_idle_policy_unloads_once_after_idle_period():
+    server = FakeComfyUI(render_seconds=0.1, model_vram_mb=12000)
+    server.start()
+    manager = ResidencyManager(ComfyUIClient(server.url), policy="idle", idle_seconds=0.3, sample_interval=0)
+    manager.start()
+    try:
+        job = manager.begin()
+        run_prompt(server)
+        manager.end(job)
+        assert server.models_loaded
+        time.sleep(0.8)
+    finally:
+        manager.stop()
+        server.stop()
+
+    assert not server.models_loaded
+    assert manager.frees["idle"] == 1
+    assert len(server.frees) == 1
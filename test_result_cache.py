@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Result cache keying and LRU eviction tests
+"""
+
+import os
+import time
+
+from result_cache import ResultCache
+
+WORKFLOW = {
+    "3": {"class_type": "RandomNoise", "inputs": {"noise_seed": 42}, "_meta": {"title": "Noise"}},
+}
+
+
+def make_output(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(os.urandom(size))
+    return {"type": "video", "filename": name, "path": str(path)}
+
+
+def test_key_ignores_meta_and_key_order():
+    reordered = {"3": {"inputs": {"noise_seed": 42}, "class_type": "RandomNoise"}}
+    reseeded = {"3": {"class_type": "RandomNoise", "inputs": {"noise_seed": 43}}}
+
+    assert ResultCache.key(b"img", WORKFLOW) == ResultCache.key(b"img", reordered)
+    assert ResultCache.key(b"img", WORKFLOW) != ResultCache.key(b"img", reseeded)
+    assert ResultCache.key(b"img", WORKFLOW) != ResultCache.key(b"other", WORKFLOW)
+
+
+def test_evicts_least_recently_used_by_bytes(tmp_path):
+    root = tmp_path / "cache"
+    root.mkdir()
+    cache = ResultCache(str(root), max_bytes=250 * 1024)
+
+    cache.put("a", [make_output(tmp_path, "a.mp4", 100 * 1024)])
+    cache.put("b", [make_output(tmp_path, "b.mp4", 100 * 1024)])
+    old = time.time() - 60
+    os.utime(root / "a", (old, old))
+    os.utime(root / "b", (old - 60, old - 60))
+    assert cache.get("b") is not None  # b becomes most recent
+
+    cache.put("c", [make_output(tmp_path, "c.mp4", 100 * 1024)])
+
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+    assert cache.get("c") is not None
+    assert cache.snapshot()["evictions"] == 1
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Retention manager tests: per-job cleanup, sweeping and in-use protection
+"""
+
+import os
+import time
+
+from retention import RetentionManager
+
+
+def make_file(path, size=1024, age=0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"\0" * size)
+    if age:
+        then = time.time() - age
+        os.utime(path, (then, then))
+    return str(path)
+
+
+def test_shared_file_survives_until_last_job_finishes(tmp_path):
+    retention = RetentionManager([str(tmp_path)])
+    shared = make_file(tmp_path / "input" / "image.png")
+
+    retention.acquire(shared)
+    retention.acquire(shared)
+    retention.finish([shared])
+    assert os.path.exists(shared)
+
+    retention.finish([shared])
+    assert not os.path.exists(shared)
+
+
+def test_sweep_applies_age_and_size_limits(tmp_path):
+    retention = RetentionManager([str(tmp_path)], max_age=3600, max_bytes=7000, grace=60)
+    expired = make_file(tmp_path / "output" / "expired.mp4", age=7200)
+    oldest = make_file(tmp_path / "output" / "oldest.mp4", age=600)
+    newer = make_file(tmp_path / "output" / "newer.mp4", age=300)
+    newest = make_file(tmp_path / "output" / "newest.mp4", age=200)
+    fresh = make_file(tmp_path / "output" / "fresh.mp4", size=4096)
+
+    retention.sweep()
+
+    # expired goes on age, oldest to get under max_bytes; fresh is inside the grace period
+    assert not os.path.exists(expired)
+    assert not os.path.exists(oldest)
+    assert all(os.path.exists(p) for p in (newer, newest, fresh))
+
+
+def test_sweep_skips_files_in_use(tmp_path):
+    retention = RetentionManager([str(tmp_path)], max_age=60, grace=0)
+    busy = make_file(tmp_path / "input" / "busy.png", age=600)
+    idle = make_file(tmp_path / "input" / "idle.png", age=600)
+
+    retention.acquire(busy)
+    retention.sweep()
+
+    assert os.path.exists(busy)
+    assert not os.path.exists(idle)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Job timing spans, metrics aggregation and the /metrics endpoint
+"""
+
+import json
+
+import requests
+
+from timings import JobTimer, Metrics
+
+
+def test_spans_add_up_and_snapshot_in_ms():
+    timer = JobTimer()
+    timer.add("queue", 0.25)
+    timer.add("queue", 0.5)
+    with timer.span("decode"):
+        pass
+    timer.add_nodes({"125": 1.5}, {"125": {"class_type": "SamplerCustomAdvanced"}})
+    timer.finish()
+
+    snapshot = timer.snapshot()
+    assert snapshot["queue"] == 750.0
+    assert "decode" in snapshot
+    assert snapshot["nodes"] == {"125": {"class_type": "SamplerCustomAdvanced", "ms": 1500.0}}
+    assert snapshot["total"] >= 0
+
+
+def test_metrics_histograms_and_jsonl(tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    metrics = Metrics(jsonl_path=str(path))
+    for seconds in (0.02, 3.0):
+        timer = JobTimer()
+        timer.add("execute", seconds)
+        timer.add_nodes({"8": seconds}, {"8": {"class_type": "VAEDecode"}})
+        timer.finish()
+        metrics.observe(timer, "success", job_id="job")
+
+    text = metrics.render()
+    assert 'hunyuan_jobs_total{status="success"} 2' in text
+    assert 'hunyuan_stage_seconds_bucket{stage="execute",le="0.025"} 1' in text
+    assert 'hunyuan_stage_seconds_bucket{stage="execute",le="5"} 2' in text
+    assert 'hunyuan_stage_seconds_count{stage="execute"} 2' in text
+    assert 'hunyuan_node_seconds_count{class_type="VAEDecode"} 2' in text
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["timings"]["execute"] for line in lines] == [20.0, 3000.0]
+
+
+def test_metrics_endpoint():
+    metrics = Metrics(jsonl_path="")
+    port = metrics.serve(0)
+    try:
+        response = requests.get(f"http://127.0.0.1:{port}/metrics", timeout=5)
+        missing = requests.get(f"http://127.0.0.1:{port}/other", timeout=5)
+    finally:
+        metrics.stop()
+
+    assert response.status_code == 200
+    assert "hunyuan_jobs_total" in response.text
+    assert missing.status_code == 404
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+VAE decode planning tests
+"""
+
+import pytest
+
+from vae_tiling import apply_decode_plan, plan_decode, tiled_decode_mb
+
+
+def test_short_clips_decode_in_one_pass():
+    plan = plan_decode(720, 1280, 25, vram_total_mb=24576)
+    assert plan["mode"] == "full"
+    assert plan["estimated_mb"] < plan["budget_mb"]
+
+
+def test_tiles_shrink_to_fit_the_budget():
+    roomy = plan_decode(720, 1280, 121, budget_mb=8000)
+    tight = plan_decode(720, 1280, 121, budget_mb=1000)
+
+    assert roomy["mode"] == tight["mode"] == "tiled"
+    assert (roomy["tile_size"], roomy["temporal_size"]) == (512, 64)
+    assert tight["tile_size"] < 512 or tight["temporal_size"] < 64
+    assert tiled_decode_mb(720, 1280, 121, tight["tile_size"], tight["temporal_size"]) <= 1000
+    assert "fits" not in tight
+
+
+def test_modes_and_unknown_memory():
+    assert plan_decode(720, 1280, 241)["mode"] == "full"
+    assert plan_decode(720, 1280, 241, vram_total_mb=24576, mode="never")["mode"] == "full"
+    assert plan_decode(480, 848, 9, mode="always")["tile_size"] == 512
+    with pytest.raises(ValueError):
+        plan_decode(720, 1280, 25, mode="sometimes")
+
+
+def test_apply_rewrites_every_decode_node():
+    workflow = {
+        "v0_8": {"class_type": "VAEDecode", "inputs": {"samples": ["125", 0], "vae": ["10", 0]}},
+        "v1_8": {"class_type": "VAEDecode", "inputs": {"samples": ["126", 0], "vae": ["10", 0]}},
+        "10": {"class_type": "VAELoader", "inputs": {"vae_name": "vae.safetensors"}},
+    }
+    plan = plan_decode(720, 1280, 121, budget_mb=4000)
+
+    assert apply_decode_plan(workflow, plan) == 2
+    assert workflow["v1_8"]["class_type"] == "VAEDecodeTiled"
+    assert workflow["v1_8"]["inputs"]["temporal_overlap"] == plan["temporal_overlap"]
+    assert workflow["v1_8"]["inputs"]["samples"] == ["126", 0]
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Workflow template registry: compilation, overrides and versions
+"""
+
+import json
+
+import pytest
+
+from workflow_templates import TemplateError, TemplateRegistry, WorkflowTemplate
+
+GRAPH = {
+    "1": {"class_type": "LoadImage", "inputs": {"image": ""}},
+    "2": {"class_type": "RandomNoise", "inputs": {"noise_seed": 0}},
+    "3": {"class_type": "BasicScheduler", "inputs": {"steps": 20, "scheduler": "simple"}},
+}
+PARAMS = {
+    "image": {"inputs": [["1", "image"]]},
+    "seed": {"default": 7, "inputs": [["2", "noise_seed"]]},
+    "steps": {"default": 20, "inputs": [["3", "steps"]]},
+}
+
+
+def test_render_applies_overrides_without_touching_the_template():
+    template = WorkflowTemplate("t", 1, GRAPH, PARAMS)
+
+    first = template.render({"image": "a.png", "steps": 4})
+    second = template.render({"image": "b.png"})
+
+    assert first["1"]["inputs"]["image"] == "a.png"
+    assert first["3"]["inputs"]["steps"] == 4
+    assert first["2"]["inputs"]["noise_seed"] == 7
+    assert second["3"]["inputs"]["steps"] == 20
+    assert template.base_workflow() == GRAPH
+
+
+def test_bad_overrides_and_bindings_are_rejected():
+    template = WorkflowTemplate("t", 1, GRAPH, PARAMS)
+
+    with pytest.raises(TemplateError, match="requires parameter 'image'"):
+        template.render({})
+    with pytest.raises(TemplateError, match="no parameter"):
+        template.render({"image": "a.png", "stpes": 4})
+    with pytest.raises(TemplateError, match="missing node 9"):
+        WorkflowTemplate("bad", 1, GRAPH, {"x": {"inputs": [["9", "steps"]]}})
+    with pytest.raises(TemplateError, match="no input 'cfg'"):
+        WorkflowTemplate("bad", 1, GRAPH, {"x": {"inputs": [["3", "cfg"]]}})
+
+
+def test_registry_versions_and_directory(tmp_path):
+    registry = TemplateRegistry()
+    registry.register(WorkflowTemplate("t", 1, GRAPH, PARAMS))
+    (tmp_path / "t2.json").write_text(json.dumps({"name": "t", "version": 2, "workflow": GRAPH, "params": PARAMS}))
+    (tmp_path / "broken.json").write_text("{not json")
+
+    loaded = registry.load_directory(str(tmp_path))
+
+    assert [template.key for template in loaded] == ["t@2"]
+    assert registry.get("t").version == 2
+    assert registry.get("t", 1).version == 1
+    with pytest.raises(TemplateError, match="no version 3"):
+        registry.get("t", 3)
+    with pytest.raises(TemplateError, match="Unknown workflow template"):
+        registry.get("missing")
+    with pytest.raises(TemplateError, match="already registered"):
+        registry.register(WorkflowTemplate("t", 1, GRAPH, PARAMS))
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Workflow validation against /object_info
+"""
+
+import copy
+
+import handler
+from fake_comfyui import object_info
+from workflow_validation import ObjectInfoCache, validate_workflow
+
+
+def default_graph():
+    return handler.create_default_workflow("in.png", prompt="a cat", seed=1)
+
+
+def test_default_workflow_is_valid():
+    assert validate_workflow(default_graph(), object_info()) == {}
+
+
+def test_broken_graph_reports_each_node():
+    workflow = copy.deepcopy(default_graph())
+    workflow["128"]["inputs"]["sampler_name"] = "eulr"
+    workflow["126"]["inputs"].pop("steps")
+    workflow["8"]["inputs"]["samples"] = ["999", 0]
+    workflow["129"]["inputs"]["model"] = ["10", 0]
+    workflow["130"]["class_type"] = "ModelSamplingSD4"
+
+    errors = validate_workflow(workflow, object_info())
+
+    assert set(errors) == {"128", "126", "8", "129", "130"}
+    assert "'eulr' is not one of" in errors["128"]["errors"][0]
+    assert errors["126"]["errors"] == ["missing required input 'steps'"]
+    assert "missing node 999" in errors["8"]["errors"][0]
+    assert "expects MODEL but node 10 output 0 is VAE" in errors["129"]["errors"][0]
+    assert errors["130"]["errors"] == ["unknown node type 'ModelSamplingSD4'"]
+
+
+class CountingClient:
+    def __init__(self):
+        self.calls = 0
+
+    def object_info(self):
+        self.calls += 1
+        return object_info()
+
+
+def test_object_info_is_fetched_once():
+    client = CountingClient()
+    cache = ObjectInfoCache(client, ttl=0, refresh_interval=3600)
+
+    for _ in range(3):
+        assert cache.validate(default_graph()) == {}
+    # An unknown node type may re-fetch, but only once per refresh interval
+    cache.validate({"1": {"class_type": "Nope", "inputs": {}}})
+    cache.validate({"1": {"class_type": "Nope", "inputs": {}}})
+
+    assert client.calls == 1
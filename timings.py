@@ -0,0 +1,163 @@
+"""
+Per-job stage timings and aggregated metrics
+JobTimer records spans for one job; Metrics folds them into Prometheus-style
+histograms, served on a local /metrics endpoint and/or appended as JSON lines.
+Only perf_counter calls and dict updates on the job path
+"""
+
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Serve /metrics on this port; 0 disables the endpoint
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+# Append one JSON line of timings per job to this file; empty disables
+METRICS_JSONL = os.environ.get("METRICS_JSONL", "")
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200)
+
+
+class JobTimer:
+    """Stage durations for a single job"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.nodes = {}
+        self.total = None
+
+    @contextlib.contextmanager
+    def span(self, stage):
+        """Time a block; repeated spans of the same stage add up"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_nodes(self, node_seconds, workflow):
+        """Per-node execution times from ComfyUI events, labelled with their class_type"""
+        for node_id, seconds in node_seconds.items():
+            class_type = workflow.get(node_id, {}).get("class_type", "unknown")
+            self.nodes[node_id] = (class_type, seconds)
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def snapshot(self):
+        """Milliseconds per stage, per node and in total, for the job response"""
+        timings = {stage: round(seconds * 1000, 1) for stage, seconds in self.stages.items()}
+        if self.nodes:
+            timings["nodes"] = {
+                node_id: {"class_type": class_type, "ms": round(seconds * 1000, 1)}
+                for node_id, (class_type, seconds) in self.nodes.items()
+            }
+        if self.total is not None:
+            timings["total"] = round(self.total * 1000, 1)
+        return timings
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class Metrics:
+    """Aggregate JobTimers across jobs"""
+
+    def __init__(self, jsonl_path=METRICS_JSONL):
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._nodes = {}
+        self._jobs = {}
+        self._server = None
+
+    def observe(self, timer, status, job_id=None):
+        with self._lock:
+            self._jobs[status] = self._jobs.get(status, 0) + 1
+            for stage, seconds in timer.stages.items():
+                self._stages.setdefault(stage, Histogram()).observe(seconds)
+            if timer.total is not None:
+                self._stages.setdefault("total", Histogram()).observe(timer.total)
+            for class_type, seconds in timer.nodes.values():
+                self._nodes.setdefault(class_type, Histogram()).observe(seconds)
+
+        if self.jsonl_path:
+            line = json.dumps({"time": time.time(), "job_id": job_id, "status": status, "timings": timer.snapshot()})
+            try:
+                with open(self.jsonl_path, "a") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                print(f"Warning: could not write metrics: {str(e)}")
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = ["# TYPE hunyuan_jobs_total counter"]
+        with self._lock:
+            for status, count in sorted(self._jobs.items()):
+                lines.append(f'hunyuan_jobs_total{{status="{status}"}} {count}')
+            lines.append("# TYPE hunyuan_stage_seconds histogram")
+            for stage, histogram in sorted(self._stages.items()):
+                lines.extend(_histogram_lines("hunyuan_stage_seconds", f'stage="{stage}"', histogram))
+            lines.append("# TYPE hunyuan_node_seconds histogram")
+            for class_type, histogram in sorted(self._nodes.items()):
+                lines.extend(_histogram_lines("hunyuan_node_seconds", f'class_type="{class_type}"', histogram))
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=METRICS_PORT):
+        """Serve render() at http://0.0.0.0:port/metrics in a daemon thread"""
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"Metrics available on :{self._server.server_address[1]}/metrics")
+        return self._server.server_address[1]
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+
+def _histogram_lines(name, labels, histogram):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(BUCKETS, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
@@ -0,0 +1,90 @@
+"""
+Memory-aware VAE decode selection
+Estimates the VAE decode's peak memory from the output size and frame count,
+and switches the workflow's VAEDecode nodes to ComfyUI's VAEDecodeTiled with
+the largest spatial/temporal tiles that fit the GPU when a full decode won't
+"""
+
+import os
+
+# "auto" (tile when the estimate exceeds the budget), "always" or "never"
+VAE_TILING = os.environ.get("VAE_TILING", "auto")
+# Peak decode memory per output pixel per frame; a conservative figure for the Hunyuan 1.5 VAE in fp16
+VAE_DECODE_BYTES_PER_PIXEL = float(os.environ.get("VAE_DECODE_BYTES_PER_PIXEL", "384"))
+# Memory the decode may use (MB); 0 means the GPU's total VRAM minus VAE_DECODE_RESERVE_MB
+VAE_DECODE_BUDGET_MB = float(os.environ.get("VAE_DECODE_BUDGET_MB", "0"))
+# VRAM kept back for the VAE weights, workspace and fragmentation (MB)
+VAE_DECODE_RESERVE_MB = float(os.environ.get("VAE_DECODE_RESERVE_MB", "6144"))
+
+MB = 1024 * 1024
+
+# Candidate tiles, preferred first: shrinking spatial tiles before temporal
+# ones, since temporal seams show up as flicker between frame groups
+TEMPORAL_SIZES = (64, 32, 16, 8)
+SPATIAL_SIZES = (512, 384, 256, 192, 128)
+
+
+def decode_mb(width, height, frames, bytes_per_pixel=VAE_DECODE_BYTES_PER_PIXEL):
+    """Estimated peak memory of decoding width x height x frames in one pass"""
+    return width * height * frames * bytes_per_pixel / MB
+
+
+def tiled_decode_mb(width, height, frames, tile_size, temporal_size, bytes_per_pixel=VAE_DECODE_BYTES_PER_PIXEL):
+    """Estimated peak memory of a tiled decode, which decodes one tile (overlap included) at a time"""
+    return decode_mb(min(tile_size, width), min(tile_size, height), min(temporal_size, frames), bytes_per_pixel)
+
+
+def plan_decode(width, height, frames, vram_total_mb=None, mode=VAE_TILING, budget_mb=VAE_DECODE_BUDGET_MB,
+                reserve_mb=VAE_DECODE_RESERVE_MB, bytes_per_pixel=VAE_DECODE_BYTES_PER_PIXEL):
+    """
+    How to decode a clip: {"mode": "full"} or {"mode": "tiled", "tile_size", "overlap",
+    "temporal_size", "temporal_overlap"}, with the estimate and budget it was based on
+    """
+    if mode not in ("auto", "always", "never"):
+        raise ValueError(f"Unknown VAE_TILING mode '{mode}'; expected auto, always or never")
+
+    estimate = decode_mb(width, height, frames, bytes_per_pixel)
+    budget = budget_mb or (vram_total_mb - reserve_mb if vram_total_mb else None)
+    plan = {"mode": "full", "estimated_mb": round(estimate)}
+    if budget is not None:
+        plan["budget_mb"] = round(budget)
+
+    # Without a budget there's nothing to size tiles against; ComfyUI retries tiled on OOM itself
+    if mode == "never" or (mode == "auto" and (budget is None or estimate <= budget)):
+        return plan
+
+    candidates = [(tile, temporal) for temporal in TEMPORAL_SIZES for tile in SPATIAL_SIZES]
+    tile_size, temporal_size = candidates[0]
+    if budget is not None:
+        fitting = [(tile, temporal) for tile, temporal in candidates
+                   if tiled_decode_mb(width, height, frames, tile, temporal, bytes_per_pixel) <= budget]
+        # Nothing fits: the smallest tiles are the best we can do
+        tile_size, temporal_size = fitting[0] if fitting else candidates[-1]
+
+    tiled_estimate = tiled_decode_mb(width, height, frames, tile_size, temporal_size, bytes_per_pixel)
+    plan.update({
+        "mode": "tiled",
+        "tile_size": tile_size,
+        "overlap": tile_size // 8,
+        "temporal_size": temporal_size,
+        "temporal_overlap": max(temporal_size // 8, 4),
+        "tiled_estimated_mb": round(tiled_estimate),
+    })
+    if budget is not None and tiled_estimate > budget:
+        plan["fits"] = False
+    return plan
+
+
+def apply_decode_plan(workflow, plan):
+    """Rewrite every VAEDecode node per plan; returns how many were changed"""
+    if plan["mode"] != "tiled":
+        return 0
+    changed = 0
+    for node in workflow.values():
+        if node.get("class_type") != "VAEDecode":
+            continue
+        node["class_type"] = "VAEDecodeTiled"
+        node["inputs"].update({key: plan[key] for key in ("tile_size", "overlap", "temporal_size", "temporal_overlap")})
+        node.setdefault("_meta", {})["title"] = "VAE Decode (Tiled)"
+        changed += 1
+    return changed
@@ -0,0 +1,128 @@
+"""
+Named, versioned workflow templates
+A template is a node graph plus named parameters bound to node inputs. Graphs
+are compiled once at startup; requests send a template name and overrides
+instead of the whole graph
+"""
+
+import glob
+import json
+import os
+
+# Extra templates, one JSON file each: {"name", "version", "description", "params", "workflow"}
+WORKFLOW_TEMPLATE_DIR = os.environ.get("WORKFLOW_TEMPLATE_DIR", "/app/workflows")
+
+# Marks a parameter the request must supply
+REQUIRED = object()
+
+
+class TemplateError(ValueError):
+    """Unknown template, bad parameter binding or bad request overrides"""
+
+
+class WorkflowTemplate:
+    """
+    A compiled workflow template
+
+    params maps each parameter name to {"default": value, "inputs": [[node_id, input_name], ...]};
+    a parameter without "default" is required.
+    """
+
+    def __init__(self, name, version, workflow, params, description=""):
+        self.name = name
+        self.version = int(version)
+        self.description = description
+        self.params = {}
+
+        for param, spec in params.items():
+            bindings = [tuple(binding) for binding in spec.get("inputs", [])]
+            if not bindings:
+                raise TemplateError(f"{self.key}: parameter '{param}' is not bound to any node input")
+            for node_id, input_name in bindings:
+                if node_id not in workflow:
+                    raise TemplateError(f"{self.key}: parameter '{param}' is bound to missing node {node_id}")
+                if input_name not in workflow[node_id].get("inputs", {}):
+                    raise TemplateError(f"{self.key}: node {node_id} has no input '{input_name}' for parameter '{param}'")
+            self.params[param] = {"default": spec.get("default", REQUIRED), "inputs": bindings}
+
+        # Parsing the serialized graph is cheaper than deep-copying the dict for every render
+        self._compiled = json.dumps(workflow)
+        self.node_count = len(workflow)
+
+    @property
+    def key(self):
+        return f"{self.name}@{self.version}"
+
+    def resolve(self, overrides=None):
+        """Every parameter's value: the override if given, else the default"""
+        overrides = overrides or {}
+        unknown = sorted(set(overrides) - set(self.params))
+        if unknown:
+            raise TemplateError(f"{self.key} has no parameter(s) {', '.join(unknown)}; "
+                                f"expected some of {', '.join(sorted(self.params))}")
+
+        values = {}
+        for param, spec in self.params.items():
+            value = overrides.get(param, spec["default"])
+            if value is REQUIRED:
+                raise TemplateError(f"{self.key} requires parameter '{param}'")
+            values[param] = value
+        return values
+
+    def render(self, overrides=None):
+        """A fresh workflow with parameters written into their node inputs"""
+        values = self.resolve(overrides)
+        workflow = json.loads(self._compiled)
+        for param, spec in self.params.items():
+            for node_id, input_name in spec["inputs"]:
+                workflow[node_id]["inputs"][input_name] = values[param]
+        return workflow
+
+    def base_workflow(self):
+        """The graph as registered, before any parameters are applied"""
+        return json.loads(self._compiled)
+
+
+class TemplateRegistry:
+    """Templates by name and version; the highest version is the default"""
+
+    def __init__(self):
+        self._templates = {}
+
+    def register(self, template):
+        versions = self._templates.setdefault(template.name, {})
+        if template.version in versions:
+            raise TemplateError(f"Template {template.key} is already registered")
+        versions[template.version] = template
+        return template
+
+    def get(self, name, version=None):
+        versions = self._templates.get(name)
+        if not versions:
+            raise TemplateError(f"Unknown workflow template '{name}'; available: {', '.join(sorted(self._templates))}")
+        if version is None:
+            return versions[max(versions)]
+        try:
+            return versions[int(version)]
+        except (KeyError, TypeError, ValueError):
+            raise TemplateError(f"Template '{name}' has no version {version}; "
+                                f"available: {', '.join(str(v) for v in sorted(versions))}")
+
+    def templates(self):
+        return [template for versions in self._templates.values() for template in versions.values()]
+
+    def load_directory(self, path=WORKFLOW_TEMPLATE_DIR):
+        """Register every *.json template in path; bad files are reported and skipped"""
+        loaded = []
+        for filename in sorted(glob.glob(os.path.join(path, "*.json"))):
+            try:
+                with open(filename) as f:
+                    spec = json.load(f)
+                template = WorkflowTemplate(
+                    spec["name"], spec.get("version", 1), spec["workflow"],
+                    spec.get("params", {}), spec.get("description", "")
+                )
+                loaded.append(self.register(template))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Skipping workflow template {filename}: {str(e)}")
+        return loaded
@@ -0,0 +1,140 @@
+"""
+Check workflow graphs against ComfyUI's /object_info before queueing
+Catches unknown node types, missing inputs, dangling links, type mismatches
+and invalid choices in milliseconds instead of after the prompt is queued
+"""
+
+import os
+import threading
+import time
+
+# Re-fetch /object_info this often (seconds); 0 keeps the first copy for the process lifetime
+OBJECT_INFO_TTL = int(os.environ.get("OBJECT_INFO_TTL", "0"))
+# An unknown node type may just be a node ComfyUI loaded after we fetched; re-fetch at most this often
+OBJECT_INFO_REFRESH_INTERVAL = int(os.environ.get("OBJECT_INFO_REFRESH_INTERVAL", "60"))
+
+
+class ObjectInfoCache:
+    """Lazily fetched, shared copy of ComfyUI's node definitions"""
+
+    def __init__(self, comfy, ttl=OBJECT_INFO_TTL, refresh_interval=OBJECT_INFO_REFRESH_INTERVAL):
+        self.comfy = comfy
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._info = None
+        self._fetched_at = 0.0
+
+    def get(self, refresh=False):
+        """Node definitions by class_type; refresh asks for a re-fetch, rate-limited"""
+        with self._lock:
+            age = time.monotonic() - self._fetched_at
+            stale = self._info is None or (self.ttl and age > self.ttl)
+            if stale or (refresh and age > self.refresh_interval):
+                self._info = self.comfy.object_info()
+                self._fetched_at = time.monotonic()
+            return self._info
+
+    def validate(self, workflow):
+        """node_errors for workflow, re-fetching once if it names node types we haven't seen"""
+        info = self.get()
+        if any(node.get("class_type") not in info for node in workflow.values() if isinstance(node, dict)):
+            info = self.get(refresh=True)
+        return validate_workflow(workflow, info)
+
+
+def _input_specs(definition):
+    """{input_name: (spec, required)} for a node definition"""
+    specs = {}
+    inputs = definition.get("input", {})
+    for section, required in (("required", True), ("optional", False)):
+        for name, spec in inputs.get(section, {}).items():
+            specs[name] = (spec, required)
+    return specs
+
+
+def _choices(spec):
+    """Allowed values of a combo input, or None if it isn't one"""
+    kind = spec[0] if spec else None
+    options = spec[1] if len(spec) > 1 and isinstance(spec[1], dict) else {}
+    # File pickers like LoadImage's list whatever was on disk when /object_info was fetched
+    if options.get("image_upload") or options.get("video_upload"):
+        return None
+    if isinstance(kind, list):
+        return kind
+    if kind == "COMBO":
+        return options.get("options")
+    return None
+
+
+def _types_match(expected, actual):
+    expected = "COMBO" if isinstance(expected, list) else expected
+    actual = "COMBO" if isinstance(actual, list) else actual
+    if "*" in (expected, actual):
+        return True
+    return bool(set(str(expected).split(",")) & set(str(actual).split(",")))
+
+
+def validate_workflow(workflow, object_info):
+    """
+    Check a workflow in API format against node definitions
+
+    Returns {node_id: {"class_type": str, "errors": [str]}} like ComfyUI's
+    node_errors; empty when the graph is valid.
+    """
+    if not isinstance(workflow, dict) or not workflow:
+        return {"workflow": {"class_type": None, "errors": ["workflow must be a non-empty object of nodes"]}}
+
+    node_errors = {}
+    for node_id, node in workflow.items():
+        errors = []
+        class_type = node.get("class_type") if isinstance(node, dict) else None
+        definition = object_info.get(class_type)
+
+        if not isinstance(node, dict) or not class_type:
+            errors.append("node has no class_type")
+        elif definition is None:
+            errors.append(f"unknown node type '{class_type}'")
+        else:
+            inputs = node.get("inputs", {})
+            specs = _input_specs(definition)
+
+            for name, (spec, required) in specs.items():
+                if required and name not in inputs:
+                    errors.append(f"missing required input '{name}'")
+
+            for name, value in inputs.items():
+                spec = specs.get(name, (None, False))[0]
+                if isinstance(value, list) and len(value) == 2 and isinstance(value[1], int):
+                    source = workflow.get(str(value[0]))
+                    if not isinstance(source, dict):
+                        errors.append(f"input '{name}' links to missing node {value[0]}")
+                        continue
+                    outputs = object_info.get(source.get("class_type"), {}).get("output")
+                    if outputs is None:
+                        continue  # the source node's own errors cover it
+                    if not 0 <= value[1] < len(outputs):
+                        errors.append(f"input '{name}' links to output {value[1]} of node {value[0]}, "
+                                      f"which has {len(outputs)} outputs")
+                    elif spec and not _types_match(spec[0], outputs[value[1]]):
+                        errors.append(f"input '{name}' expects {spec[0]} but node {value[0]} "
+                                      f"output {value[1]} is {outputs[value[1]]}")
+                elif spec:
+                    choices = _choices(spec)
+                    if choices is not None and value not in choices:
+                        errors.append(f"input '{name}' value {value!r} is not one of {choices[:10]}")
+
+        if errors:
+            node_errors[node_id] = {"class_type": class_type, "errors": errors}
+    return node_errors
+
+
+def summarize_errors(node_errors, limit=5):
+    """One-line description of the first few node errors"""
+    parts = []
+    for node_id, entry in list(node_errors.items())[:limit]:
+        parts.append(f"node {node_id} ({entry['class_type']}): {'; '.join(entry['errors'])}")
+    more = len(node_errors) - limit
+    if more > 0:
+        parts.append(f"and {more} more")
+    return ", ".join(parts)